@@ -6,10 +6,12 @@ from sqlalchemy import pool
 from alembic import context
 
 from app.models import Base, LearningPath, Module, LearningResource, Schedule, ResourceProgress, QuizQuestion, QuizAttempt
+from app.services.config.settings import settings
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
+config.set_main_option("sqlalchemy.url", settings.DATABASE_URL)
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
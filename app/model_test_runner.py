@@ -1,9 +1,74 @@
+import json
+import time
+import asyncio
+import hashlib
+import tempfile
+import threading
 import traceback
-from sqlalchemy import create_engine
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from contextlib import contextmanager
+from types import SimpleNamespace
+from sqlalchemy import create_engine, event, inspect, text, select
 from sqlalchemy.orm import sessionmaker
-from datetime import datetime
+from sqlalchemy.pool import StaticPool
+from datetime import datetime, date, timedelta
+import os
 import sys
-from models import Base, LearningPath, Module, LearningResource
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import Base, LearningPath, Module, LearningResource, ResourceProgress, Schedule, QuizQuestion, ProgressRollup, QuizAttempt, QuestionReviewState
+from app.models.learning_resource_model import compute_content_hash
+from app.models.base import build_engine
+from app.services.config.settings import settings
+from app.services.path_stats_service import get_path_stats, serialize_paths
+from app.services.progress_rollup_service import get_module_progress, get_path_progress, rebuild_rollups
+from app.services.claude_service import ClaudeService, ClaudeServiceError, cached_text_block, resource_system_blocks
+from app.services.rate_limit import RateLimiter, CircuitBreaker, CircuitOpenError, TokenBucket
+from app.services.metrics import MetricsRegistry
+from app.services.response_cache import LRUResponseCache, SQLiteResponseCache, TieredResponseCache
+from app.services.enrichment import ResourceEnricher
+from app.services import enrichment_store
+from app.services.summarization import MapReduceSummarizer
+from app.services.blob_store import BlobStore, store_resource_body, prune_blobs, load_resource_text, blob_digest
+from app.services.schedule_service import create_schedule
+from app.services.bulk_loader import BulkLoader
+from app.services.json_stream import JSONArrayStreamParser
+from app.services.spaced_repetition import ReviewState, compute_reviews, MIN_EASE
+from app.services.prerequisite_graph import PrerequisiteCycleError, default_cache, get_prerequisite_graph
+from app.services.question_dedup import QuestionSimilarityIndex
+from app.services.quiz_pipeline import QuizGenerationPipeline
+from app.services.resource_fetcher import ResourceFetcher, refresh_resources, arefresh_resources
+from app.services.resource_view_service import list_module_resources, get_resource_detail
+from app.services.delivery_service import get_due_deliveries, mark_delivered
+from app.services.review_state_service import get_due_questions, count_due_questions
+from app.services.search_service import search_resources
+from app.services import client_registry
+from app.services.client_registry import get_async_client, run_sync
+from anthropic import APIConnectionError
+
+def fake_response(text):
+    """Minimal stand-in for an Anthropic Message"""
+    return SimpleNamespace(
+        content=[SimpleNamespace(text=text)],
+        usage=SimpleNamespace(input_tokens=10, output_tokens=5),
+    )
+
+
+def fake_claude(create=None, breaker=None, cache=None):
+    """ClaudeService whose sync client calls create(**params) instead of the API"""
+    service = ClaudeService(
+        api_key="test",
+        cache=cache,
+        rate_limiter=RateLimiter(requests_per_minute=60_000, tokens_per_minute=10_000_000),
+        circuit_breaker=breaker or CircuitBreaker(),
+        metrics=MetricsRegistry(),
+    )
+    service.backoff_base = service.backoff_cap = 0.001
+    service.client = SimpleNamespace(messages=SimpleNamespace(create=create))
+    return service
+
 
 def create_test_db():
     """Create an in-memory test database."""
@@ -13,6 +78,21 @@ def create_test_db():
     return engine, Session()
 
 
+@contextmanager
+def recorded_statements(engine):
+    """List that collects the SQL the engine runs inside the block"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
 def test_learning_path_creation():
     """Test: Can we create a learning path?"""
     print("Testing learning path creation...", end=" ")
@@ -197,6 +277,1457 @@ def test_learning_path_relationships():
         traceback.print_exc()
         return False
 
+def test_learning_path_stats():
+    """Test: Are path stats computed in one grouped query?"""
+    print("Testing path stats...", end=" ")
+    try:
+        engine, session = create_test_db()
+
+        path = LearningPath.create(name="Path with Progress")
+        empty_path = LearningPath.create(name="Empty Path")
+        session.add_all([path, empty_path])
+        session.commit()
+
+        mod1 = Module.create(learning_path_id=path.id, name="Module 1", order_index=1)
+        mod2 = Module.create(learning_path_id=path.id, name="Module 2", order_index=2)
+        session.add_all([mod1, mod2])
+        session.commit()
+
+        resources = [
+            LearningResource.create(module_id=mod.id, order_index=i, title=f"{mod.name} {i}", resource_type="article")
+            for mod in (mod1, mod2) for i in range(2)
+        ]
+        session.add_all(resources)
+        session.commit()
+
+        session.add_all([
+            ResourceProgress.create(learning_resource_id=resources[0].id, status="completed"),
+            ResourceProgress.create(learning_resource_id=resources[1].id, status="in_progress"),
+        ])
+        session.commit()
+
+        stats = get_path_stats(session, [path.id, empty_path.id])
+        assert stats[path.id].module_count == 2
+        assert stats[path.id].total_resources == 4
+        assert stats[path.id].percent_complete == 25.0
+        assert stats[empty_path.id].total_resources == 0
+        assert path.total_resources == 4
+        assert path.percent_complete == 25.0
+
+        page = serialize_paths(session, [path, empty_path])
+        assert page[0]['module_count'] == 2
+        assert page[1]['percent_complete'] == 0.0
+
+        print("PASSED")
+        session.close()
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+
+def test_progress_rollups():
+    """Test: Do rollups follow progress changes and match a rebuild?"""
+    print("Testing progress rollups...", end=" ")
+    try:
+        engine, session = create_test_db()
+
+        path = LearningPath.create(name="Rollup Path")
+        session.add(path)
+        session.commit()
+        module = Module.create(learning_path_id=path.id, name="Module 1", order_index=1)
+        session.add(module)
+        session.commit()
+        resources = [
+            LearningResource.create(module_id=module.id, order_index=i, title=f"Resource {i}", resource_type="article")
+            for i in range(3)
+        ]
+        session.add_all(resources)
+        session.commit()
+
+        progress = ResourceProgress.create(learning_resource_id=resources[0].id, status="in_progress")
+        progress.time_spent_mins = 5
+        session.add(progress)
+        session.commit()
+        assert get_module_progress(session, module.id).in_progress_count == 1
+
+        progress.status = "completed"
+        progress.time_spent_mins = 12
+        session.commit()
+        rollup = get_path_progress(session, path.id)
+        assert (rollup.total_count, rollup.completed_count, rollup.in_progress_count) == (3, 1, 0)
+        assert rollup.time_spent_mins == 12
+        assert rollup.percent_complete == 33.33
+
+        incremental = rollup.to_dict()
+        rebuild_rollups(session)
+        session.commit()
+        assert get_path_progress(session, path.id).to_dict() == incremental
+
+        print("PASSED")
+        session.close()
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+
+def test_rollup_moves_and_duplicates():
+    """Test: Do rollups survive resource moves, duplicate progress rows and module deletes?"""
+    print("Testing rollup moves and duplicates...", end=" ")
+    try:
+        engine, session = create_test_db()
+
+        def snapshot():
+            return {(rollup.scope, rollup.scope_id): rollup.to_dict() for rollup in session.query(ProgressRollup)}
+
+        def matches_rebuild():
+            incremental = snapshot()
+            rebuild_rollups(session)
+            session.commit()
+            rebuilt = snapshot()
+            # A rebuild also writes zero rows for modules nothing touched yet
+            return all(rebuilt.get(key) == value for key, value in incremental.items())
+
+        path = LearningPath.create(name="Rollup Path")
+        session.add(path)
+        session.commit()
+        first = Module.create(learning_path_id=path.id, name="First", order_index=1)
+        second = Module.create(learning_path_id=path.id, name="Second", order_index=2)
+        session.add_all([first, second])
+        session.commit()
+        resources = [
+            LearningResource.create(module_id=first.id, order_index=i, title=f"Resource {i}", resource_type="article")
+            for i in range(3)
+        ]
+        session.add_all(resources)
+        session.commit()
+
+        # Two progress rows for one resource still count it once
+        for minutes in (5, 7):
+            progress = ResourceProgress.create(learning_resource_id=resources[0].id, status="completed")
+            progress.time_spent_mins = minutes
+            session.add(progress)
+        session.commit()
+        assert get_module_progress(session, first.id).completed_count == 1
+        assert get_path_progress(session, path.id).completed_count == 1
+        assert matches_rebuild()
+
+        resources[0].module_id = second.id
+        session.commit()
+        assert (get_module_progress(session, first.id).total_count, get_module_progress(session, first.id).completed_count) == (2, 0)
+        assert (get_module_progress(session, second.id).total_count, get_module_progress(session, second.id).completed_count) == (1, 1)
+        assert get_module_progress(session, second.id).time_spent_mins == 12
+        assert get_path_progress(session, path.id).total_count == 3
+        assert matches_rebuild()
+
+        resources[1].module = second
+        session.commit()
+        assert get_module_progress(session, first.id).total_count == 1
+        assert get_module_progress(session, second.id).total_count == 2
+        assert matches_rebuild()
+
+        session.delete(second)
+        session.commit()
+        rollup = get_path_progress(session, path.id)
+        assert (rollup.total_count, rollup.completed_count, rollup.time_spent_mins) == (1, 0, 0)
+        assert get_module_progress(session, second.id) is None
+        assert matches_rebuild()
+
+        print("PASSED")
+        session.close()
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+
+def test_claude_connection_reset_retry():
+    """Test: Is a reset pooled connection retried by ClaudeService with SDK retries off?"""
+    print("Testing connection reset retry...", end=" ")
+    try:
+        calls = []
+
+        def create(**params):
+            calls.append(params)
+            if len(calls) == 1:
+                raise APIConnectionError(request=None)
+            return fake_response("ok")
+
+        service = fake_claude(create)
+        assert service.generate("hello", use_cache=False) == "ok"
+        assert len(calls) == 2
+        assert service.circuit_breaker.state == CircuitBreaker.CLOSED
+
+        print("PASSED")
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+
+def test_token_bucket():
+    """Test: Does the token bucket hand out bursts, go into debt and refund?"""
+    print("Testing token bucket...", end=" ")
+    try:
+        bucket = TokenBucket(rate=10, capacity=5)
+        assert bucket.reserve(5) == 0.0
+        wait = bucket.reserve(2)
+        assert 0.15 < wait <= 0.2
+        bucket.refund(2)
+        assert bucket.reserve(0) == 0.0
+
+        limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=600)
+        limiter.pause(1.0)
+        assert limiter._reserve(0) > 0.9
+
+        print("PASSED")
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+
+def half_open_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    return breaker
+
+def test_circuit_breaker_trial_release():
+    """Test: Does a cancelled or abandoned half-open trial let the next call through?"""
+    print("Testing circuit breaker trial release...", end=" ")
+    try:
+        breaker = half_open_breaker()
+        assert breaker.before_call() is True
+        try:
+            breaker.before_call()
+            raise AssertionError("second call during the trial was let through")
+        except CircuitOpenError:
+            pass
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+        # Cancelled agenerate trial
+        breaker = half_open_breaker()
+        service = fake_claude(breaker=breaker)
+
+        async def hang(**params):
+            await asyncio.sleep(10)
+
+        async def cancel_trial():
+            service._async_client = SimpleNamespace(messages=SimpleNamespace(create=hang))
+            task = asyncio.create_task(service.agenerate("hello", use_cache=False))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+        asyncio.run(cancel_trial())
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.before_call() is True
+        breaker.release_trial()
+
+        # Stream consumer that stops after the first delta
+        @contextmanager
+        def stream(**params):
+            yield SimpleNamespace(text_stream=iter(["a", "b"]), get_final_message=lambda: fake_response("ab"))
+
+        service.client = SimpleNamespace(messages=SimpleNamespace(stream=stream))
+        deltas = service.generate_stream("hello", use_cache=False)
+        assert next(deltas) == "a"
+        deltas.close()
+        assert breaker.before_call() is True
+
+        print("PASSED")
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+
+class PageHandler(BaseHTTPRequestHandler):
+    """Serves /big as a 5000 byte page and anything else as a small page with an ETag"""
+    protocol_version = "HTTP/1.1"
+    version = 1
+
+    def do_GET(self):
+        body = b"x" * 5000 if self.path == "/big" else f"{self.path} v{PageHandler.version}".encode()
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def test_resource_refresh():
+    """Test: Does refresh use conditional requests, cap body size and survive store errors?"""
+    print("Testing resource refresh...", end=" ")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        engine, session = create_test_db()
+        path = LearningPath.create(name="Fetch Path")
+        session.add(path)
+        session.commit()
+        module = Module.create(learning_path_id=path.id, name="Module 1", order_index=1)
+        session.add(module)
+        session.commit()
+        page = LearningResource.create(module_id=module.id, order_index=0, title="Page", resource_type="article", url=f"{base}/page")
+        big = LearningResource.create(module_id=module.id, order_index=1, title="Big", resource_type="article", url=f"{base}/big")
+        session.add_all([page, big])
+        session.commit()
+
+        def fetcher(**kwargs):
+            return ResourceFetcher(max_concurrency=4, max_bytes=1000, timeout=5, **kwargs)
+
+        report = refresh_resources(session, learning_path_id=path.id, fetcher=fetcher())
+        assert report.fetched == 1 and report.not_modified == 0
+        assert "exceeds 1000" in report.failed[big.id]
+        session.refresh(page)
+        assert page.content == "/page v1"
+        assert page.source_metadata_json["etag"]
+        fetched_at = page.source_metadata_json["fetched_at"]
+
+        report = refresh_resources(session, resource_ids=[page.id], fetcher=fetcher())
+        assert (report.fetched, report.not_modified) == (0, 1)
+        session.refresh(page)
+        assert page.source_metadata_json["fetched_at"] == fetched_at
+
+        # Unchanged content keeps its enrichment; resources are read a page at a time
+        page.update_learning_resource(summary="About v1", key_concepts=["v1"], difficulty="beginner")
+        session.commit()
+        page.source_metadata_json = {}
+        session.commit()
+        batch_size, settings.BULK_BATCH_SIZE = settings.BULK_BATCH_SIZE, 1
+        try:
+            report = refresh_resources(session, learning_path_id=path.id, fetcher=fetcher())
+        finally:
+            settings.BULK_BATCH_SIZE = batch_size
+        assert report.fetched == 1 and big.id in report.failed
+        session.refresh(page)
+        assert (page.summary, page.key_concepts, page.difficulty) == ("About v1", ["v1"], "beginner")
+
+        PageHandler.version = 2
+        # The async variant runs inside an existing event loop
+        report = asyncio.run(arefresh_resources(session, resource_ids=[page.id], fetcher=fetcher()))
+        assert report.fetched == 1
+        session.refresh(page)
+        assert page.content == "/page v2"
+        # Changed content drops the old enrichment in the same write
+        assert (page.summary, page.key_concepts, page.difficulty) == (None, None, None)
+
+        # Content enriched before gets its stored enrichment back
+        enrichment_store.save_enrichment(session, compute_content_hash("/page v1"),
+                                         {"summary": "About v1 again", "key_concepts": ["v1"], "difficulty": "advanced"})
+        session.commit()
+        PageHandler.version = 1
+        report = refresh_resources(session, resource_ids=[page.id], fetcher=fetcher())
+        assert report.fetched == 1
+        session.refresh(page)
+        assert (page.content, page.summary, page.difficulty) == ("/page v1", "About v1 again", "advanced")
+
+        def full_disk():
+            raise OSError(28, "No space left on device")
+
+        PageHandler.version = 3
+        broken_store = SimpleNamespace(writer=full_disk)
+        report = refresh_resources(session, fetcher=fetcher(blob_store=broken_store, blob_threshold=4))
+        assert "No space left" in report.failed[page.id]
+
+        # Spilled bodies are written and fsynced off the event loop thread
+        with tempfile.TemporaryDirectory() as root:
+            store = BlobStore(root)
+            write_threads = []
+
+            def recording_writer():
+                writer = store.writer()
+                write = writer.write
+
+                def record(data):
+                    write_threads.append(threading.get_ident())
+                    write(data)
+
+                writer.write = record
+                return writer
+
+            PageHandler.version = 4
+            report = refresh_resources(session, resource_ids=[page.id],
+                                       fetcher=fetcher(blob_store=SimpleNamespace(writer=recording_writer), blob_threshold=4))
+            assert report.fetched == 1
+            session.refresh(page)
+            assert page.file_path.startswith("blob:") and page.content is None
+            assert store.path(blob_digest(page.file_path)).read_bytes() == b"/page v4"
+            assert write_threads and threading.get_ident() not in write_threads
+
+        print("PASSED")
+        session.close()
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+    finally:
+        PageHandler.version = 1
+        server.shutdown()
+        server.server_close()
+
+def test_blob_store():
+    """Test: Do blob-stored bodies keep their digest and survive a concurrent prune?"""
+    print("Testing blob store...", end=" ")
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            store = BlobStore(root)
+            engine, session = create_test_db()
+            path = LearningPath.create(name="Blob Path")
+            session.add(path)
+            session.commit()
+            module = Module.create(learning_path_id=path.id, name="Module 1", order_index=1)
+            session.add(module)
+            session.commit()
+            resource = LearningResource.create(module_id=module.id, order_index=0, title="Big", resource_type="article", url="https://example.com/a")
+            body = "é" * 1_000_000
+            store_resource_body(resource, body, store)
+            session.add(resource)
+            session.commit()
+            digest = blob_digest(resource.file_path)
+            assert resource.content is None
+            assert resource.content_hash == digest
+            assert load_resource_text(resource, store) == body
+
+            resource.url = "https://example.com/b"
+            session.commit()
+            assert resource.content_hash == digest
+
+            # Written but not referenced by a committed row yet
+            pending = store.put(b"pending body")
+            assert prune_blobs(session, store) == 0
+            assert store.exists(pending)
+            assert prune_blobs(session, store, grace_secs=0) == 1
+            assert not store.exists(pending)
+            assert store.exists(resource.file_path)
+
+        print("PASSED")
+        session.close()
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+
+def test_schedule_rerun():
+    """Test: Does rescheduling a path skip scheduled resources and keep empty modules' days?"""
+    print("Testing schedule rerun...", end=" ")
+    try:
+        engine, session = create_test_db()
+        path = LearningPath.create(name="Schedule Path")
+        session.add(path)
+        session.commit()
+        first = Module.create(learning_path_id=path.id, name="First", order_index=1, duration_days=2)
+        empty = Module.create(learning_path_id=path.id, name="Empty", order_index=2, duration_days=3)
+        last = Module.create(learning_path_id=path.id, name="Last", order_index=3)
+        session.add_all([first, empty, last])
+        session.commit()
+        resources = [
+            LearningResource.create(module_id=first.id, order_index=0, title="A", resource_type="article"),
+            LearningResource.create(module_id=first.id, order_index=1, title="B", resource_type="article"),
+            LearningResource.create(module_id=last.id, order_index=0, title="C", resource_type="article"),
+        ]
+        session.add_all(resources)
+        session.commit()
+
+        start = date(2026, 1, 5)
+        assert create_schedule(session, path.id, start) == 3
+        session.commit()
+        dates = {schedule.learning_resource_id: schedule.scheduled_date.date() for schedule in session.query(Schedule)}
+        # First takes days 0-1, the empty module days 2-4, so Last starts on day 5
+        assert dates[resources[2].id] == date(2026, 1, 10)
+
+        delivered = session.query(Schedule).filter_by(learning_resource_id=resources[0].id).one()
+        delivered.delivered = True
+        session.commit()
+        assert create_schedule(session, path.id, date(2026, 2, 1)) == 0
+
+        extra = LearningResource.create(module_id=last.id, order_index=1, title="D", resource_type="article")
+        session.add(extra)
+        session.commit()
+        assert create_schedule(session, path.id, start) == 1
+        session.commit()
+        assert session.query(Schedule).count() == 4
+        assert session.query(Schedule).filter_by(learning_resource_id=extra.id).one().scheduled_date.date() == date(2026, 1, 11)
+
+        print("PASSED")
+        session.close()
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+
+def test_question_dedup():
+    """Test: Does the similarity index catch reworded questions as it grows?"""
+    print("Testing question dedup...", end=" ")
+    try:
+        index = QuestionSimilarityIndex()
+        for number in range(40):
+            index.add(number, 1, "recursion", f"What is the base case number {number} of a recursive factorial function")
+        assert len(index) == 40
+        match = index.find_duplicate(1, "Recursion", "What is the base case number 7 of a recursive factorial function?")
+        assert match is not None and match.question_id == 7
+        assert index.find_duplicate(2, "recursion", "What is the base case number 7 of a recursive factorial function") is None
+        assert index.find_duplicate(1, "recursion", "Which sorting algorithm is stable and runs in n log n time") is None
+
+        # A duplicate within the batch is merged into the kept question, and ids go by slot
+        batch = [
+            {"learning_resource_id": 3, "concept_tested": "sorting", "question_text": "Which sorting algorithm is stable and runs in n log n time",
+             "correct_answer": "merge sort", "explanation": "", "options_json": None},
+            {"learning_resource_id": 3, "concept_tested": "sorting", "question_text": "Which sorting algorithm is stable and runs in n log n time?",
+             "correct_answer": "merge sort", "explanation": "Merge sort keeps equal keys in order", "options_json": ["merge sort", "heap sort"]},
+            {"learning_resource_id": 3, "concept_tested": "sorting", "question_text": "What is the worst case of quicksort",
+             "correct_answer": "n^2", "explanation": "Bad pivots", "options_json": None},
+        ]
+        kept, duplicates, slots = index.filter_new(batch)
+        assert kept == [batch[0], batch[2]] and duplicates == [batch[1]]
+        assert kept[0]["explanation"] == "Merge sort keeps equal keys in order"
+        assert kept[0]["options_json"] == ["merge sort", "heap sort"]
+        index.assign_ids(slots, [101, 102])
+        assert index.find_duplicate(3, "sorting", "What is the worst case of quicksort?").question_id == 102
+
+        print("PASSED")
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+
+def test_quiz_pipeline_regenerate():
+    """Test: Does regenerate bypass the checkpoint while dedup drops repeated questions?"""
+    print("Testing quiz pipeline regenerate...", end=" ")
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            engine = create_engine(f"sqlite:///{directory}/quiz.db")
+            Base.metadata.create_all(engine)
+            Session = sessionmaker(bind=engine)
+            session = Session()
+            path = LearningPath.create(name="Quiz Path")
+            session.add(path)
+            session.commit()
+            module = Module.create(learning_path_id=path.id, name="Module 1", order_index=1)
+            session.add(module)
+            session.commit()
+            resources = [
+                LearningResource.create(module_id=module.id, order_index=index, title=f"R{index}", resource_type="article", content=f"Body {index}")
+                for index in range(3)
+            ]
+            session.add_all(resources)
+            session.commit()
+
+            calls = []
+
+            def generator(resource_id, title, content):
+                calls.append(resource_id)
+                return [
+                    {"question_text": f"What does {content} explain about loops", "correct_answer": "x", "concept_tested": "loops"},
+                    {"question_text": f"What does {content} explain about loops?", "correct_answer": "x", "concept_tested": "loops"},
+                ]
+
+            checkpoint = os.path.join(directory, "checkpoint.json")
+            pipeline = QuizGenerationPipeline(generator, session_factory=Session, checkpoint_path=checkpoint, workers=2, batch_size=2)
+            pending = pipeline.pending_resources(session, learning_path_id=path.id, page_size=2)
+            assert [row.id for row in pending] == [resource.id for resource in resources]
+            report = pipeline.run(learning_path_id=path.id)
+            assert (report.resources_processed, report.questions_created, report.duplicates_dropped) == (3, 3, 3)
+            stored = session.query(QuizQuestion).filter_by(learning_resource_id=resources[2].id).one()
+            assert stored.question_text.startswith("What does Body 2")
+            # The RETURNING ids reach the index without loading the rows back
+            assert pipeline.dedup_index.find_duplicate(resources[2].id, "loops", stored.question_text).question_id == stored.id
+
+            calls.clear()
+            pipeline = QuizGenerationPipeline(generator, session_factory=Session, checkpoint_path=checkpoint)
+            report = pipeline.run(learning_path_id=path.id)
+            assert calls == [] and report.skipped == 0 and report.resources_processed == 0
+
+            report = pipeline.run(learning_path_id=path.id, regenerate=True)
+            assert sorted(calls) == [resource.id for resource in resources]
+            assert report.questions_created == 0 and report.duplicates_dropped == 6
+            assert session.query(QuizQuestion).count() == 3
+            session.close()
+            engine.dispose()
+
+        print("PASSED")
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+
+def test_bulk_loader_ids():
+    """Test: Do the ids passed to on_batch line up with the input rows?"""
+    print("Testing bulk loader ids...", end=" ")
+    try:
+        engine, session = create_test_db()
+        path = LearningPath.create(name="Bulk Path")
+        session.add(path)
+        session.commit()
+        module = Module.create(learning_path_id=path.id, name="Module 1", order_index=1)
+        session.add(module)
+        session.commit()
+
+        # Rows with and without url go to different executemany groups
+        rows = [
+            dict(module_id=module.id, order_index=index, title=f"R{index}", resource_type="article",
+                 **({"url": f"https://example.com/{index}"} if index % 3 else {}))
+            for index in range(12)
+        ]
+        batches = []
+        loader = BulkLoader(session, batch_size=5)
+        assert loader.load_learning_resources(rows, on_batch=batches.append) == 12
+        assert [len(batch) for batch in batches] == [5, 5, 2]
+        titles = dict(session.query(LearningResource.id, LearningResource.title))
+        assert [titles[resource_id] for batch in batches for resource_id in batch] == [row["title"] for row in rows]
+
+        batches.clear()
+        renamed = [dict(row, title=row["title"] + "'") for row in reversed(rows)]
+        assert loader.load_learning_resources(renamed, upsert=True, on_batch=batches.append) == 12
+        titles = dict(session.query(LearningResource.id, LearningResource.title))
+        assert len(titles) == 12
+        assert [titles[resource_id] for batch in batches for resource_id in batch] == [row["title"] for row in renamed]
+
+        print("PASSED")
+        session.close()
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+
+def test_prerequisite_cycles():
+    """Test: Are cycles rejected at flush with a cold cache and after in-place edits?"""
+    print("Testing prerequisite cycles...", end=" ")
+    try:
+        engine, session = create_test_db()
+        path = LearningPath.create(name="Prereq Path")
+        session.add(path)
+        session.commit()
+        first = Module.create(learning_path_id=path.id, name="First", order_index=1)
+        second = Module.create(learning_path_id=path.id, name="Second", order_index=2)
+        session.add_all([first, second])
+        session.commit()
+        first.prereqs_json = {"module_ids": []}
+        second.prereqs_json = {"module_ids": [first.id]}
+        session.commit()
+
+        default_cache.invalidate(path.id)
+        first.prereqs_json = {"module_ids": [second.id]}
+        try:
+            session.commit()
+            raise AssertionError("cycle committed with a cold cache")
+        except PrerequisiteCycleError:
+            session.rollback()
+        assert first.prereqs_json == {"module_ids": []}
+
+        assert get_prerequisite_graph(session, path.id).topological_order == [first.id, second.id]
+        first.prereqs_json["module_ids"].append(second.id)
+        try:
+            session.commit()
+            raise AssertionError("in-place cycle committed")
+        except PrerequisiteCycleError:
+            session.rollback()
+
+        third = Module.create(learning_path_id=path.id, name="Third", order_index=3, prereqs_json={"module_ids": []})
+        session.add(third)
+        session.commit()
+        third.prereqs_json["module_ids"].append(second.id)
+        session.commit()
+        assert get_prerequisite_graph(session, path.id).ancestors(third.id) == {first.id, second.id}
+
+        print("PASSED")
+        session.close()
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+
+def test_enrichment_cache():
+    """Test: Is only a complete enrichment response written to the response cache?"""
+    print("Testing enrichment cache...", end=" ")
+    try:
+        full = {"summary": "About loops", "key_concepts": ["loops"], "difficulty": "beginner", "estimated_time_mins": 10}
+        responses = []
+
+        def create(**params):
+            return fake_response(json.dumps(responses.pop(0)))
+
+        enricher = ResourceEnricher(fake_claude(create, cache=LRUResponseCache()))
+
+        # Partial first answer: completed by a follow-up, but not cached
+        responses[:] = [{"summary": "About loops"}, {key: full[key] for key in full if key != "summary"}]
+        assert enricher.enrich("Loops", "Body") == full
+        responses[:] = [full]
+        assert enricher.enrich("Loops", "Body") == full
+        assert responses == []
+
+        # The complete answer was cached, so a repeat makes no call
+        assert enricher.enrich("Loops", "Body") == full
+
+        # agenerate applies cache_if the same way
+        service = fake_claude(cache=LRUResponseCache())
+        replies = ["not json", '{"ok": true}']
+
+        async def acreate(**params):
+            return fake_response(replies.pop(0))
+
+        service._async_client = SimpleNamespace(messages=SimpleNamespace(create=acreate))
+        for expected in ("not json", '{"ok": true}', '{"ok": true}'):
+            assert asyncio.run(service.agenerate("Q", cache_if=lambda text: text.startswith("{"))) == expected
+        assert replies == []
+
+        print("PASSED")
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+
+def test_summarizer():
+    """Test: Is a short body summarized in one call, and are chunk summaries cached per model?"""
+    print("Testing summarizer...", end=" ")
+    try:
+        prompts = []
+
+        async def create(**params):
+            prompt = params["messages"][0]["content"]
+            prompts.append(prompt)
+            if "Return only a JSON object" in prompt:
+                return fake_response(json.dumps({"summary": "Whole", "key_concepts": ["loops"]}))
+            return fake_response("Section summary")
+
+        service = fake_claude()
+        service._async_client = SimpleNamespace(messages=SimpleNamespace(create=create))
+        summarizer = MapReduceSummarizer(service, chunk_cache=LRUResponseCache(), max_chunk_chars=100)
+
+        result = asyncio.run(summarizer.asummarize("A short body.", "Loops"))
+        assert result == {"summary": "Whole", "key_concepts": ["loops"]}
+        assert len(prompts) == 1 and "<resource>" in prompts[0]
+
+        long_body = "\n\n".join(f"Paragraph {index} " + "about loops " * 6 for index in range(3))
+        prompts.clear()
+        assert summarizer.summarize(long_body, "Loops")["summary"] == "Whole"
+        assert len(prompts) == 4
+
+        prompts.clear()
+        summarizer.summarize(long_body, "Loops")
+        assert len(prompts) == 1
+
+        service.model = "another-model"
+        prompts.clear()
+        summarizer.summarize(long_body, "Loops")
+        assert len(prompts) == 4
+
+        # A reply without a summary is an error and is not cached
+        replies = ["not json", json.dumps({"key_concepts": ["x"]}), json.dumps({"summary": "Fixed"})]
+
+        async def flaky(**params):
+            return fake_response(replies.pop(0))
+
+        service = fake_claude(cache=LRUResponseCache())
+        service._async_client = SimpleNamespace(messages=SimpleNamespace(create=flaky))
+        summarizer = MapReduceSummarizer(service)
+        for _ in range(2):
+            try:
+                summarizer.summarize("Body", "Loops")
+                assert False, "a reply without a summary should raise"
+            except ClaudeServiceError:
+                pass
+        assert summarizer.summarize("Body", "Loops") == {"summary": "Fixed", "key_concepts": []}
+        assert summarizer.summarize("Body", "Loops")["summary"] == "Fixed" and replies == []
+
+        print("PASSED")
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+
+def test_sqlite_response_cache():
+    """Test: Does the SQLite cache batch access-time writes and still evict least recently used?"""
+    print("Testing SQLite response cache...", end=" ")
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            cache = SQLiteResponseCache(os.path.join(directory, "cache.db"), max_entries=100, touch_batch=50)
+            for index in range(100):
+                cache.set(f"key{index}", f"value{index}")
+            assert len(cache) == 100
+
+            writes = cache._conn.total_changes
+            for _ in range(3):
+                assert cache.get("key0") == "value0"
+            assert cache._conn.total_changes == writes
+
+            # Over the limit: the buffered hit on key0 keeps it, the oldest others go
+            cache.set("key100", "value100")
+            assert len(cache) == 99
+            assert cache.get("key0") == "value0"
+            assert cache.get("key1") is None and cache.get("key2") is None
+            assert cache.get("key100") == "value100"
+            cache.close()
+
+            reopened = SQLiteResponseCache(os.path.join(directory, "cache.db"), max_entries=100)
+            assert len(reopened) == 99 and reopened.get("key50") == "value50"
+            reopened.close()
+
+            # A disk hit promoted to memory keeps its age and expires with it
+            disk = SQLiteResponseCache(os.path.join(directory, "tiered.db"), ttl_seconds=60)
+            memory = LRUResponseCache(ttl_seconds=60)
+            tiered = TieredResponseCache([memory, disk])
+            created_at = time.time() - 50
+            disk.set("old", "value", created_at)
+            assert tiered.get("old") == "value"
+            assert memory.get_entry("old") == ("value", created_at)
+            memory.set("old", "value", time.time() - 61)
+            assert memory.get("old") is None
+            disk.close()
+
+        print("PASSED")
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+
+def test_enrichment_store_race():
+    """Test: Does enriching a resource set its hash, merge into a concurrent store and reach later imports?"""
+    print("Testing enrichment store race...", end=" ")
+    get_enrichment = enrichment_store.get_enrichment
+    try:
+        engine, session = create_test_db()
+        full = {"summary": "About loops", "key_concepts": ["loops"], "difficulty": "beginner", "estimated_time_mins": 10}
+        enricher = ResourceEnricher(fake_claude(lambda **params: fake_response(json.dumps(full))))
+
+        path = LearningPath.create(name="Enrich Path")
+        session.add(path)
+        session.commit()
+        module = Module.create(learning_path_id=path.id, name="Module 1", order_index=1)
+        session.add(module)
+        session.commit()
+        resource = LearningResource.create(module_id=module.id, order_index=0, title="Loops", resource_type="article", content="All about loops")
+        enricher.enrich_resource(resource, session=session)
+        assert resource.content_hash is not None
+        assert get_enrichment(session, resource.content_hash).summary == "About loops"
+        session.commit()
+
+        # Another transaction stores the same content between our lookup and our insert
+        lookups = []
+
+        def stale_lookup(session, content_hash):
+            lookups.append(content_hash)
+            return None if len(lookups) == 1 else get_enrichment(session, content_hash)
+
+        enrichment_store.get_enrichment = stale_lookup
+        stored = enrichment_store.save_enrichment(session, resource.content_hash, dict(full, summary="Newer"))
+        session.commit()
+        assert stored.summary == "Newer"
+        assert session.query(enrichment_store.ContentEnrichment).count() == 1
+
+        # A bulk import of known content inherits the enrichment and its questions
+        question = {"question_type": "short_answer", "question_text": "What repeats a block?", "correct_answer": "a loop"}
+        enrichment_store.save_enrichment(session, resource.content_hash, dict(full, quiz_questions=[question]))
+        session.commit()
+        copies = [
+            {"module_id": module.id, "order_index": index, "title": f"Copy {index}", "resource_type": "article", "content": "All  about LOOPS"}
+            for index in (1, 2)
+        ]
+        ids = []
+        BulkLoader(session).load_learning_resources(copies, on_batch=ids.extend)
+        session.expire_all()
+        for copy_id in ids:
+            copy = session.get(LearningResource, copy_id)
+            assert copy.summary == "About loops" and copy.difficulty == "beginner"
+            assert [q.question_text for q in copy.quiz_questions] == ["What repeats a block?"]
+
+        print("PASSED")
+        session.close()
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+    finally:
+        enrichment_store.get_enrichment = get_enrichment
+
+def test_latency_excludes_queueing():
+    """Test: Does per-attempt latency leave out queueing and retries while total latency keeps them?"""
+    print("Testing latency excludes queueing...", end=" ")
+    try:
+        async def create(**params):
+            await asyncio.sleep(0.01)
+            return fake_response("ok")
+
+        service = fake_claude()
+        service.max_concurrency = 1
+        service._async_client = SimpleNamespace(messages=SimpleNamespace(create=create))
+        recorded = []
+        service.metrics.record = recorded.append
+
+        async def main():
+            async with service.semaphore:
+                call = asyncio.create_task(service.agenerate("hello", use_cache=False))
+                await asyncio.sleep(0.3)
+            return await call
+
+        started = time.perf_counter()
+        assert asyncio.run(main()) == "ok"
+        assert time.perf_counter() - started >= 0.3
+        assert len(recorded) == 1 and recorded[0].latency_secs < 0.2
+        # The whole call, queueing included, is recorded as well
+        assert recorded[0].total_latency_secs >= 0.3
+
+        # With a retry, latency is the last attempt and total_latency spans both
+        attempts = []
+
+        def flaky(**params):
+            attempts.append(params)
+            time.sleep(0.05)
+            if len(attempts) == 1:
+                raise APIConnectionError(request=None)
+            return fake_response("ok")
+
+        service = fake_claude(flaky)
+        service.generate("hello", use_cache=False, label="retried")
+        stats = service.metrics.snapshot()["retried"]
+        assert stats["retries"] == 1
+        assert stats["latency_p50_secs"] <= 0.1 and stats["total_latency_p50_secs"] >= 0.1
+        assert 'claude_total_latency_seconds_count{label="retried"} 1' in service.metrics.render_prometheus()
+
+        print("PASSED")
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+
+def test_json_stream_parser():
+    """Test: Does the stream parser emit each element once it is complete, whatever the fragment size?"""
+    print("Testing JSON stream parser...", end=" ")
+    try:
+        elements = [
+            {"question_text": "Is [1, 2] a \"list\"?", "options": ["yes", "no"]},
+            {"nested": {"a": [{"b": "}"}]}},
+            "plain, string",
+            42,
+            None,
+        ]
+        text = "```json\n" + json.dumps(elements, indent=2) + "\n```\nTrailing [text]"
+        for size in (1, 3, 7, len(text)):
+            parser = JSONArrayStreamParser()
+            seen = []
+            for start in range(0, len(text), size):
+                seen.extend(parser.feed(text[start:start + size]))
+            assert seen == elements and parser.finished
+            assert parser.feed("[1]") == []
+
+        # An element is emitted as soon as it is complete, before the array closes
+        parser = JSONArrayStreamParser()
+        assert parser.feed('[{"a": 1}, {"b": ') == [{"a": 1}]
+        try:
+            parser.feed("oops}]")
+            raise AssertionError("invalid element accepted")
+        except ValueError:
+            pass
+
+        print("PASSED")
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+
+def test_sm2_reviews():
+    """Test: Does the vectorized SM-2 replay match reviewing one attempt at a time?"""
+    print("Testing SM-2 reviews...", end=" ")
+    try:
+        start = datetime(2026, 1, 1)
+        state = ReviewState()
+        intervals = []
+        for day in range(3):
+            state = state.review(True, 1.0, start + timedelta(days=day))
+            intervals.append(state.interval_days)
+        assert intervals[:2] == [1, 6] and intervals[2] == round(6 * state.ease_factor)
+        state = state.review(False, 0.0, start + timedelta(days=10))
+        assert (state.repetition_count, state.interval_days) == (0, 1)
+        assert state.next_review_date == start + timedelta(days=11)
+        for _ in range(10):
+            state = state.review(False, 0.0, start)
+        assert state.ease_factor == MIN_EASE
+
+        rng = np.random.default_rng(7)
+        question_ids, attempted_at, correct, confidence = [], [], [], []
+        for question_id in range(1, 40):
+            for attempt in range(int(rng.integers(1, 8))):
+                question_ids.append(question_id)
+                attempted_at.append(start + timedelta(days=3 * attempt))
+                correct.append(bool(rng.random() < 0.7))
+                confidence.append(float(rng.random()))
+        ease, repetitions, interval, next_review = compute_reviews(question_ids, attempted_at, correct, confidence)
+
+        states = {}
+        for row, question_id in enumerate(question_ids):
+            states[question_id] = states.get(question_id, ReviewState()).review(correct[row], confidence[row], attempted_at[row])
+            expected = states[question_id]
+            assert round(float(ease[row]), 2) == expected.ease_factor
+            assert (repetitions[row], interval[row]) == (expected.repetition_count, expected.interval_days)
+            assert next_review[row] == np.datetime64(expected.next_review_date)
+
+        print("PASSED")
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+
+def test_rehash_keeps_detail_deferred():
+    """Test: Does a url change rehash without loading the deferred body?"""
+    print("Testing rehash with deferred content...", end=" ")
+    try:
+        engine, session = create_test_db()
+        path = LearningPath.create(name="Rehash Path")
+        session.add(path)
+        session.commit()
+        module = Module.create(learning_path_id=path.id, name="Module 1", order_index=1)
+        session.add(module)
+        session.commit()
+        with_body = LearningResource.create(module_id=module.id, order_index=1, title="Body", resource_type="article",
+                                            url="https://example.com/a", content="A long body " * 1000)
+        without_body = LearningResource.create(module_id=module.id, order_index=2, title="Link", resource_type="video",
+                                               url="https://example.com/b")
+        session.add_all([with_body, without_body])
+        session.commit()
+        body_hash = with_body.content_hash
+        session.expunge_all()
+
+        with_body, without_body = session.query(LearningResource).order_by(LearningResource.order_index).all()
+        with_body.url = "https://example.com/moved-a"
+        without_body.url = "https://example.com/moved-b"
+        with recorded_statements(engine) as statements:
+            session.commit()
+        assert not any("learning_resources.summary" in statement for statement in statements)
+        assert "content" in inspect(with_body).unloaded
+        assert with_body.content_hash == body_hash
+        assert without_body.content_hash == compute_content_hash(None, "https://example.com/moved-b")
+
+        print("PASSED")
+        session.close()
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+
+def test_deferred_detail_group():
+    """Test: Do listings skip the heavy columns and does one access load the whole group?"""
+    print("Testing deferred detail group...", end=" ")
+    try:
+        engine, session = create_test_db()
+        path = LearningPath.create(name="Deferred Path")
+        session.add(path)
+        session.commit()
+        module = Module.create(learning_path_id=path.id, name="Module 1", order_index=1)
+        session.add(module)
+        session.commit()
+        session.add_all([
+            LearningResource.create(module_id=module.id, order_index=index, title=f"R{index}", resource_type="article",
+                                    url=f"https://example.com/{index}", content=f"Body {index}")
+            for index in (2, 1)
+        ])
+        session.commit()
+        module_id = module.id
+        session.expunge_all()
+
+        with recorded_statements(engine) as statements:
+            summaries = list_module_resources(session, module_id)
+        assert [summary.title for summary in summaries] == ["R1", "R2"]
+        assert summaries[0].url == "https://example.com/1"
+        assert len(statements) == 1 and "content" not in statements[0] and "summary" not in statements[0]
+
+        resource = session.get(LearningResource, summaries[0].id)
+        assert {"content", "summary", "key_concepts", "source_metadata_json"} <= inspect(resource).unloaded
+        with recorded_statements(engine) as statements:
+            assert resource.summary is None
+            assert resource.content == "Body 1"
+            assert resource.source_metadata_json is None
+        assert len(statements) == 1
+
+        session.expunge_all()
+        with recorded_statements(engine) as statements:
+            detail = get_resource_detail(session, summaries[1].id)
+            assert detail.content == "Body 2" and detail.key_concepts is None
+        assert len(statements) == 1
+
+        print("PASSED")
+        session.close()
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+
+def test_due_deliveries():
+    """Test: Do delivery pages walk due items in order and do the hybrids agree in SQL?"""
+    print("Testing due deliveries...", end=" ")
+    try:
+        engine, session = create_test_db()
+        path = LearningPath.create(name="Delivery Path")
+        session.add(path)
+        session.commit()
+        module = Module.create(learning_path_id=path.id, name="Module 1", order_index=1)
+        session.add(module)
+        session.commit()
+        resource = LearningResource.create(module_id=module.id, order_index=1, title="Daily", resource_type="article", url="https://example.com/daily")
+        session.add(resource)
+        session.commit()
+        today = date.today()
+        overdue = Schedule.create(resource.id, today - timedelta(days=2))
+        morning = Schedule.create(resource.id, today, "07:00")
+        evening = Schedule.create(resource.id, today, "19:00")
+        tomorrow = Schedule.create(resource.id, today + timedelta(days=1))
+        session.add_all([evening, tomorrow, morning, overdue])
+        session.commit()
+
+        page = get_due_deliveries(session, today, limit=2)
+        assert [item.schedule_id for item in page.items] == [overdue.id, morning.id]
+        assert [item.is_overdue for item in page.items] == [True, False]
+        assert page.items[0].title == "Daily" and page.items[0].url == "https://example.com/daily"
+        page = get_due_deliveries(session, today, limit=2, after=page.next_cursor)
+        assert [item.schedule_id for item in page.items] == [evening.id] and page.next_cursor is None
+        only_today = get_due_deliveries(session, today, include_overdue=False)
+        assert [item.schedule_id for item in only_today.items] == [morning.id, evening.id]
+
+        for schedule in (overdue, morning, evening, tomorrow):
+            in_sql = session.query(Schedule.is_overdue, Schedule.is_today).filter(Schedule.id == schedule.id).one()
+            assert (bool(in_sql[0]), bool(in_sql[1])) == (schedule.is_overdue, schedule.is_today)
+        assert session.query(Schedule.id).filter(Schedule.is_overdue).all() == [(overdue.id,)]
+        assert sorted(row.id for row in session.query(Schedule.id).filter(Schedule.is_today)) == sorted([morning.id, evening.id])
+
+        assert mark_delivered(session, [overdue.id, morning.id]) == 2
+        assert mark_delivered(session, [overdue.id]) == 0
+        session.commit()
+        session.expire_all()
+        assert overdue.delivered and overdue.delivered_at is not None and not overdue.is_overdue
+        assert session.query(Schedule.id).filter(Schedule.is_overdue).all() == []
+        assert [item.schedule_id for item in get_due_deliveries(session, today).items] == [evening.id]
+
+        print("PASSED")
+        session.close()
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+
+def test_review_states():
+    """Test: Does the flush listener track the latest attempt and does due paging walk every question once?"""
+    print("Testing review states...", end=" ")
+    try:
+        engine, session = create_test_db()
+        path = LearningPath.create(name="Review Path")
+        session.add(path)
+        session.commit()
+        module = Module.create(learning_path_id=path.id, name="Module 1", order_index=1)
+        session.add(module)
+        session.commit()
+        resource = LearningResource.create(module_id=module.id, order_index=1, title="R", resource_type="article")
+        session.add(resource)
+        session.commit()
+        questions = [
+            QuizQuestion.create(resource.id, "short_answer", f"Question {index}", "x", "", "beginner", "c")
+            for index in range(5)
+        ]
+        session.add_all(questions)
+        session.commit()
+
+        start = datetime(2026, 1, 1)
+
+        def attempt(question, day, due_day):
+            return QuizAttempt.create(question.id, "x", True, start + timedelta(days=day), 10, 0.5,
+                                      start + timedelta(days=due_day), 1, "2.5", due_day - day)
+
+        # The later of two attempts in one flush wins
+        session.add_all([attempt(questions[0], 1, 4), attempt(questions[0], 3, 9)])
+        session.commit()
+        state = session.query(QuestionReviewState).filter_by(question_id=questions[0].id).one()
+        assert state.next_review_date == start + timedelta(days=9)
+
+        # A backfilled older attempt never moves the state back
+        session.add(attempt(questions[0], 2, 5))
+        session.commit()
+        session.expire_all()
+        assert state.next_review_date == start + timedelta(days=9)
+        session.add(attempt(questions[0], 6, 12))
+        session.commit()
+        session.expire_all()
+        assert state.next_review_date == start + timedelta(days=12)
+
+        # Questions 1-4 share due dates in pairs, so ties are broken by question id
+        session.add_all([attempt(question, 0, 7 + index // 2) for index, question in enumerate(questions[1:])])
+        session.commit()
+        as_of = start + timedelta(days=10)
+        seen = []
+        cursor = None
+        while True:
+            page = get_due_questions(session, as_of=as_of, limit=3, after=cursor)
+            seen.extend(item.question_id for item in page.items)
+            if page.next_cursor is None:
+                break
+            cursor = page.next_cursor
+        assert seen == [question.id for question in questions[1:]]
+        assert count_due_questions(session, as_of) == 4
+        assert len(get_due_questions(session, as_of=start + timedelta(days=12)).items) == 5
+
+        print("PASSED")
+        session.close()
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+
+def test_search_resources():
+    """Test: Do the FTS triggers follow every write and does search rank, filter and escape?"""
+    print("Testing search resources...", end=" ")
+    try:
+        engine, session = create_test_db()
+        paths = [LearningPath.create(name=f"Search Path {index}") for index in range(2)]
+        session.add_all(paths)
+        session.commit()
+        modules = [Module.create(learning_path_id=path.id, name="Module", order_index=1) for path in paths]
+        session.add_all(modules)
+        session.commit()
+        in_title = LearningResource.create(module_id=modules[0].id, order_index=1, title="Recursion basics", resource_type="article",
+                                           content="Functions that call themselves")
+        in_body = LearningResource.create(module_id=modules[0].id, order_index=2, title="Loops", resource_type="article",
+                                          content="Loops can replace recursion <script>alert(1)</script> in many cases")
+        elsewhere = LearningResource.create(module_id=modules[1].id, order_index=1, title="Recursive descent parsers", resource_type="video")
+        session.add_all([in_title, in_body, elsewhere])
+        session.commit()
+
+        hits = search_resources(session, "recursion", module_id=modules[0].id)
+        assert [hit.resource_id for hit in hits] == [in_title.id, in_body.id]
+        assert hits[0].score > hits[1].score
+        snippet = hits[1].snippet
+        assert "<b>recursion</b>" in snippet and "&lt;script&gt;" in snippet and "<script>" not in snippet
+        # The last word matches as a prefix, every word must match
+        assert {hit.resource_id for hit in search_resources(session, "recu")} == {in_title.id, in_body.id, elsewhere.id}
+        assert [hit.resource_id for hit in search_resources(session, "recursion loops")] == [in_body.id]
+        assert [hit.resource_id for hit in search_resources(session, "recursion", learning_path_id=paths[1].id)] == [elsewhere.id]
+        assert search_resources(session, "  \"*( ") == []
+
+        in_body.content = "Loops repeat a block"
+        in_body.summary = "Iteration with while and for"
+        session.commit()
+        assert [hit.resource_id for hit in search_resources(session, "recursion", module_id=modules[0].id)] == [in_title.id]
+        assert [hit.resource_id for hit in search_resources(session, "iteration")] == [in_body.id]
+        session.delete(in_title)
+        session.commit()
+        assert [hit.resource_id for hit in search_resources(session, "recursion")] == [elsewhere.id]
+        assert session.execute(text("SELECT count(*) FROM learning_resources_fts")).scalar() == 2
+
+        print("PASSED")
+        session.close()
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+
+def test_build_engine():
+    """Test: Does build_engine apply the SQLite pragmas and share one in-memory database?"""
+    print("Testing build_engine...", end=" ")
+    try:
+        def pragma(engine, name):
+            with engine.connect() as connection:
+                return connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+        with tempfile.TemporaryDirectory() as directory:
+            engine = build_engine(f"sqlite:///{directory}/pragmas.db")
+            assert pragma(engine, "journal_mode") == "wal"
+            assert pragma(engine, "synchronous") == 1
+            assert pragma(engine, "foreign_keys") == 1
+            assert pragma(engine, "busy_timeout") == int(settings.SQLITE_BUSY_TIMEOUT_MS)
+            assert not isinstance(engine.pool, StaticPool)
+            engine.dispose()
+
+        engine = build_engine("sqlite://")
+        assert isinstance(engine.pool, StaticPool)
+        assert pragma(engine, "journal_mode") == "memory" and pragma(engine, "foreign_keys") == 1
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        with Session() as session:
+            session.add(LearningPath.create(name="Shared"))
+            session.commit()
+        names = []
+        worker = threading.Thread(target=lambda: names.extend(Session().scalars(select(LearningPath.name))))
+        worker.start()
+        worker.join()
+        assert names == ["Shared"]
+        engine.dispose()
+
+        print("PASSED")
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+
+def test_prompt_cache_tokens():
+    """Test: Is the resource prefix marked cacheable and are cache read/write tokens counted?"""
+    print("Testing prompt cache tokens...", end=" ")
+    try:
+        block = cached_text_block("shared instructions")
+        assert block == {"type": "text", "text": "shared instructions", "cache_control": {"type": "ephemeral"}}
+        system = resource_system_blocks("Body text", instructions="You are a tutor")
+        assert "cache_control" not in system[0] and system[1]["cache_control"] == {"type": "ephemeral"}
+        assert "Body text" in system[1]["text"]
+
+        sent = []
+        usages = [(100, 0), (0, 100)]
+
+        def create(**params):
+            sent.append(params)
+            written, read = usages[len(sent) - 1]
+            return SimpleNamespace(
+                content=[SimpleNamespace(text="ok")],
+                usage=SimpleNamespace(input_tokens=10, output_tokens=5,
+                                      cache_creation_input_tokens=written, cache_read_input_tokens=read),
+            )
+
+        service = fake_claude(create)
+        service.generate("Summarize it", system=system, use_cache=False, label="summary")
+        service.generate("List key concepts", system=system, use_cache=False, label="concepts")
+        assert [params["system"] for params in sent] == [system, system]
+        assert (service.total_cache_write_tokens, service.total_cache_read_tokens) == (100, 100)
+        snapshot = service.metrics.snapshot()
+        assert (snapshot["summary"]["cache_write_tokens"], snapshot["summary"]["cache_read_tokens"]) == (100, 0)
+        assert (snapshot["concepts"]["cache_write_tokens"], snapshot["concepts"]["cache_read_tokens"]) == (0, 100)
+        # Reads are billed below the plain input rate, writes above it
+        assert snapshot["concepts"]["cost_usd"] < snapshot["summary"]["cost_usd"]
+
+        print("PASSED")
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+
+def test_run_sync_closes_clients():
+    """Test: Do the synchronous wrappers close the async clients their event loop created?"""
+    print("Testing run_sync client shutdown...", end=" ")
+    try:
+        async def use_clients():
+            first = get_async_client("test-key")
+            assert get_async_client("test-key") is first
+            return first
+
+        clients = [run_sync(use_clients()) for _ in range(3)]
+        assert len({id(client) for client in clients}) == 3
+        assert all(client.is_closed() for client in clients)
+        assert len(client_registry._async_clients) == 0
+
+        async def fail():
+            get_async_client("test-key")
+            raise ValueError("boom")
+
+        try:
+            run_sync(fail())
+            assert False, "the error should propagate"
+        except ValueError:
+            pass
+        assert len(client_registry._async_clients) == 0
+
+        print("PASSED")
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+
+def test_rollup_module_moves_and_bulk_loads():
+    """Test: Do both paths' rollups follow a moved module, and do bulk loads update rollups?"""
+    print("Testing rollup module moves and bulk loads...", end=" ")
+    try:
+        engine, session = create_test_db()
+
+        def counts(rollup):
+            return (rollup.total_count, rollup.completed_count, rollup.time_spent_mins)
+
+        old_path = LearningPath.create(name="Old Path")
+        new_path = LearningPath.create(name="New Path")
+        session.add_all([old_path, new_path])
+        session.commit()
+        staying = Module.create(learning_path_id=old_path.id, name="Staying", order_index=1)
+        moving = Module.create(learning_path_id=old_path.id, name="Moving", order_index=2)
+        session.add_all([staying, moving])
+        session.commit()
+        moved = LearningResource.create(module_id=moving.id, order_index=0, title="Moves", resource_type="article")
+        session.add_all([
+            LearningResource.create(module_id=staying.id, order_index=0, title="Stays", resource_type="article"),
+            moved,
+        ])
+        session.commit()
+        progress = ResourceProgress.create(learning_resource_id=moved.id, status="completed")
+        progress.time_spent_mins = 9
+        session.add(progress)
+        session.commit()
+        assert counts(get_path_progress(session, old_path.id)) == (2, 1, 9)
+
+        moving.learning_path_id = new_path.id
+        session.commit()
+        assert counts(get_path_progress(session, old_path.id)) == (1, 0, 0)
+        assert counts(get_path_progress(session, new_path.id)) == (1, 1, 9)
+
+        # Moving through the relationship instead of the column
+        moving.learning_path = old_path
+        session.commit()
+        assert counts(get_path_progress(session, old_path.id)) == (2, 1, 9)
+        assert counts(get_path_progress(session, new_path.id)) == (0, 0, 0)
+
+        # Core inserts skip the flush listener; the loader refreshes rollups itself
+        rows = [
+            {"module_id": moving.id, "order_index": i, "title": f"Bulk {i}", "resource_type": "article"}
+            for i in range(1, 6)
+        ]
+        BulkLoader(session, batch_size=2).load_learning_resources(rows)
+        session.expire_all()
+        assert get_module_progress(session, moving.id).total_count == 6
+        assert counts(get_path_progress(session, old_path.id)) == (7, 1, 9)
+
+        BulkLoader(session, batch_size=2).load_learning_resources(
+            [dict(row, title=row["title"] + " v2") for row in rows], upsert=True
+        )
+        session.expire_all()
+        assert get_module_progress(session, moving.id).total_count == 6
+        assert counts(get_path_progress(session, old_path.id)) == (7, 1, 9)
+
+        print("PASSED")
+        session.close()
+        return True
+    except Exception as e:
+        print(f"FAILED: {e}")
+        traceback.print_exc()
+        return False
+
 def run_all_tests():
     """Run all test functions."""
     print("=" * 60)
@@ -211,6 +1742,35 @@ def run_all_tests():
         test_learning_path_update,
         test_learning_path_to_dict,
         test_learning_path_relationships,
+        test_learning_path_stats,
+        test_progress_rollups,
+        test_claude_connection_reset_retry,
+        test_token_bucket,
+        test_circuit_breaker_trial_release,
+        test_resource_refresh,
+        test_blob_store,
+        test_schedule_rerun,
+        test_question_dedup,
+        test_quiz_pipeline_regenerate,
+        test_bulk_loader_ids,
+        test_rollup_moves_and_duplicates,
+        test_prerequisite_cycles,
+        test_enrichment_cache,
+        test_summarizer,
+        test_sqlite_response_cache,
+        test_enrichment_store_race,
+        test_latency_excludes_queueing,
+        test_json_stream_parser,
+        test_sm2_reviews,
+        test_rehash_keeps_detail_deferred,
+        test_deferred_detail_group,
+        test_due_deliveries,
+        test_review_states,
+        test_search_resources,
+        test_build_engine,
+        test_prompt_cache_tokens,
+        test_run_sync_closes_clients,
+        test_rollup_module_moves_and_bulk_loads,
     ]
     
     results = []
@@ -6,6 +6,10 @@ from .schedule_model import Schedule
 from .resource_progress_model import ResourceProgress
 from .quiz_question_model import QuizQuestion
 from .quiz_attempt_model import QuizAttempt
+from .progress_rollup_model import ProgressRollup
+from .question_review_state_model import QuestionReviewState
+from .content_enrichment_model import ContentEnrichment
+from . import search_index
 
 __all__ = [
     "Base",
@@ -15,5 +19,8 @@ __all__ = [
     "Schedule",
     "ResourceProgress",
     "QuizQuestion",
-    "QuizAttempt"
+    "QuizAttempt",
+    "ProgressRollup",
+    "QuestionReviewState",
+    "ContentEnrichment"
 ]
\ No newline at end of file
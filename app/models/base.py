@@ -1,9 +1,68 @@
-from sqlalchemy import create_engine, MetaData
-from sqlalchemy.orm import declarative_base, sessionmaker
+from contextlib import contextmanager
+from typing import Optional
+from sqlalchemy import create_engine, event, MetaData
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import declarative_base, sessionmaker, scoped_session
+from sqlalchemy.pool import StaticPool
+from ..services.config.settings import settings
 
-DATABASE_URL = "sqlite:///:memory:"
 
-engine = create_engine(DATABASE_URL, echo=True)
+def _configure_sqlite(engine: Engine, in_memory: bool) -> None:
+    """Apply per-connection pragmas; WAL and mmap only make sense for file databases"""
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        if not in_memory:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.close()
+
+
+def build_engine(url: Optional[str]=None, echo: Optional[bool]=None, **engine_kwargs) -> Engine:
+    """
+    Create an engine configured for the database in url.
+
+    SQLite files get WAL, synchronous=NORMAL, mmap and a busy timeout on
+    every connection. In-memory SQLite uses a single shared connection so
+    every session sees the same database. Other databases, such as
+    PostgreSQL, get a sized connection pool with pre-ping.
+
+    Args:
+        url: Database URL, defaults to DATABASE_URL
+        echo: Log every statement, defaults to DATABASE_ECHO
+        **engine_kwargs: Passed to create_engine, overriding the defaults
+
+    Returns:
+        Engine: A new SQLAlchemy engine
+    """
+    url = make_url(url or settings.DATABASE_URL)
+    options = {"echo": settings.DATABASE_ECHO if echo is None else echo}
+
+    if url.get_backend_name() == "sqlite":
+        in_memory = url.database in (None, "", ":memory:")
+        options["connect_args"] = {"check_same_thread": False}
+        if in_memory:
+            options["poolclass"] = StaticPool
+        options.update(engine_kwargs)
+        engine = create_engine(url, **options)
+        _configure_sqlite(engine, in_memory)
+        return engine
+
+    options.update(
+        pool_size=settings.DATABASE_POOL_SIZE,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW,
+        pool_pre_ping=settings.DATABASE_POOL_PRE_PING,
+        pool_recycle=settings.DATABASE_POOL_RECYCLE_SECONDS,
+    )
+    options.update(engine_kwargs)
+    return create_engine(url, **options)
+
+
+engine = build_engine()
 
 SessionLocal = sessionmaker(
     bind=engine,
@@ -12,5 +71,27 @@ SessionLocal = sessionmaker(
     future=True
 )
 
+# Thread-local sessions for worker threads; call ScopedSession.remove() when a unit of work ends
+ScopedSession = scoped_session(SessionLocal)
+
+
+@contextmanager
+def session_scope(session_factory=SessionLocal):
+    """
+    Provide a transactional scope around a series of operations.
+
+    Commits on success, rolls back on error and always closes the session.
+    """
+    session = session_factory()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
 metadata = MetaData()
-Base = declarative_base(metadata=metadata)
\ No newline at end of file
+Base = declarative_base(metadata=metadata)
@@ -0,0 +1,65 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import String, JSON, func
+from sqlalchemy.orm import Mapped, mapped_column
+from .base import Base
+
+
+class ContentEnrichment(Base):
+    """
+    Enrichment results shared by every resource with the same content.
+
+    Keyed by LearningResource.content_hash, so a copy of an article or
+    video imported into another module or path reuses the summary, key
+    concepts, difficulty, time estimate and quiz questions generated for
+    the first copy instead of calling the model again.
+    """
+
+    __tablename__ = "content_enrichments"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    content_hash: Mapped[str] = mapped_column(String(64), unique=True)
+    summary: Mapped[Optional[str]]
+    key_concepts: Mapped[Optional[list]] = mapped_column(JSON)
+    difficulty: Mapped[Optional[str]]
+    estimated_time_mins: Mapped[Optional[int]]
+    quiz_questions_json: Mapped[Optional[list]] = mapped_column(JSON)
+    created_at: Mapped[datetime] = mapped_column(insert_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(insert_default=func.now(), onupdate=func.now())
+
+    def __repr__(self) -> str:
+        return f"<ContentEnrichment(content_hash={self.content_hash[:12]}, questions={self.question_count})>"
+
+    @property
+    def question_count(self) -> int:
+        return len(self.quiz_questions_json or [])
+
+    @classmethod
+    def create(
+        cls,
+        content_hash: str,
+        summary: Optional[str]=None,
+        key_concepts: Optional[list]=None,
+        difficulty: Optional[str]=None,
+        estimated_time_mins: Optional[int]=None,
+        quiz_questions_json: Optional[list]=None,
+    ) -> "ContentEnrichment":
+        """
+        Store the enrichment generated for one piece of content.
+
+        Args:
+            content_hash: LearningResource.content_hash of the enriched resource
+            summary: LLM generated summary
+            key_concepts: array of main concepts
+            difficulty: beginner, intermediate, advanced
+            estimated_time_mins: Estimated reading/viewing time
+            quiz_questions_json: Generated question dicts, as returned by the model
+        """
+        return cls(
+            content_hash=content_hash,
+            summary=summary,
+            key_concepts=key_concepts,
+            difficulty=difficulty,
+            estimated_time_mins=estimated_time_mins,
+            quiz_questions_json=quiz_questions_json,
+        )
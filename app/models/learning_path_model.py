@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Optional, List
 from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, func
-from sqlalchemy.orm import DeclarativeBase, mapped_column, Mapped, relationship
+from sqlalchemy.orm import DeclarativeBase, mapped_column, Mapped, relationship, object_session
 from .base import Base
 
 class LearningPath(Base):
@@ -48,8 +48,7 @@ class LearningPath(Base):
     @property
     def total_resources(self):
         """Get the total number of resources across all modules"""
-        #Complete after resource model finish
-        return 0 
+        return self.stats().total_resources
 
     @property
     def percent_complete(self):
@@ -57,11 +56,30 @@ class LearningPath(Base):
         Calculate percent complete based on completed resources
         Returns float between 0 and 100
         """
-        #Complete after resource model finish
-        return 0
+        return self.stats().percent_complete
 
-    def to_dict(self):
-        """Convert model to dictionary for JSON serialization"""
+    def stats(self):
+        """
+        Module, resource and completion counts from one aggregate query.
+        Use path_stats_service.get_path_stats to load stats for many paths at once.
+        """
+        from ..services.path_stats_service import PathStats, get_path_stats
+
+        session = object_session(self)
+        if session is None or self.id is None:
+            return PathStats()
+        return get_path_stats(session, [self.id])[self.id]
+
+    def to_dict(self, stats=None):
+        """
+        Convert model to dictionary for JSON serialization
+
+        Args:
+            stats (PathStats, optional): Preloaded stats, avoids a query per path
+                when serializing many paths (see path_stats_service.serialize_paths)
+        """
+        if stats is None:
+            stats = self.stats()
         return {
             'id': self.id,
             'name': self.name,
@@ -71,7 +89,9 @@ class LearningPath(Base):
             'is_active': self.is_active,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'module_count': self.module_count,
+            'module_count': stats.module_count,
+            'total_resources': stats.total_resources,
+            'percent_complete': stats.percent_complete,
         }
 
     @classmethod
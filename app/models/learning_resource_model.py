@@ -1,9 +1,74 @@
+import hashlib
+import re
+import unicodedata
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 from sqlalchemy.orm import Mapped, mapped_column,relationship
-from sqlalchemy import Integer, ForeignKey, JSON, func
+from sqlalchemy import Integer, String, ForeignKey, JSON, func, UniqueConstraint, event, inspect, select
 from .base import Base
 
+_WHITESPACE = re.compile(r"\s+")
+# Query parameters that only track where a link was shared from
+_TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid"}
+# Deferred group of the large columns; load it with undefer_group(DETAIL_GROUP)
+DETAIL_GROUP = "detail"
+# file_path prefix of bodies kept in the blob store, followed by their SHA-256
+BLOB_PREFIX = "blob:"
+
+
+def _is_tracking_param(key: str) -> bool:
+    key = key.lower()
+    return key.startswith("utm_") or key in _TRACKING_PARAMS
+
+
+def normalize_content(content: str) -> str:
+    """Unicode-normalized, case-folded text with whitespace collapsed"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", content)).strip().casefold()
+
+
+def normalize_url(url: str) -> str:
+    """Lowercase scheme and host, no fragment, trailing slash or tracking parameters, sorted query"""
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking_param(key)
+    )
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return urlunsplit((parts.scheme.lower() or "https", host, parts.path.rstrip("/"), urlencode(query), ""))
+
+
+def compute_content_hash(content: Optional[str], url: Optional[str]=None) -> Optional[str]:
+    """
+    SHA-256 identifying a resource's material, from its content or else its URL.
+
+    Copies of the same article get the same hash even when whitespace,
+    case or tracking parameters differ.
+
+    Only for bodies kept in the row. A body in the blob store is identified
+    by the SHA-256 of its raw bytes (the digest in file_path), since
+    normalizing it would mean extracting the whole file; see
+    stored_content_hash. A body that moves between the row and the store
+    therefore changes hash and gets a fresh enrichment.
+    """
+    if content and content.strip():
+        key = "content:" + normalize_content(content)
+    elif url and url.strip():
+        key = "url:" + normalize_url(url)
+    else:
+        return None
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def stored_content_hash(content: Optional[str], url: Optional[str], file_path: Optional[str]) -> Optional[str]:
+    """content_hash for a resource as stored: the blob digest when its body is in the blob store"""
+    if content is None and file_path and file_path.startswith(BLOB_PREFIX):
+        return file_path[len(BLOB_PREFIX):]
+    return compute_content_hash(content, url)
+
+
 class LearningResource(Base):
     """
     Individual learning resources
@@ -12,22 +77,28 @@ class LearningResource(Base):
     -professional journal articles
 
     A module contains multiple learning resources
+
+    content, summary, key_concepts and source_metadata_json are deferred
+    in the DETAIL_GROUP group: listings load only the light columns, and
+    the first access to any heavy column loads all four in one query.
     """
     __tablename__= 'learning_resources'
 
     id: Mapped[int] = mapped_column(primary_key = True, autoincrement=True)
-    module_id: Mapped[int] = mapped_column(ForeignKey("modules.id", ondelete="CASCADE"), index=True)
+    # active_history keeps the previous module available to the progress rollup listener
+    module_id: Mapped[int] = mapped_column(ForeignKey("modules.id", ondelete="CASCADE"), index=True, active_history=True)
     title: Mapped[str]
     order_index: Mapped[int] = mapped_column(index=True)
     resource_type: Mapped[str]
     url: Mapped[Optional[str]]
     file_path: Mapped[Optional[str]]
-    content: Mapped[Optional[str]]
-    summary: Mapped[Optional[str]]
-    key_concepts: Mapped[Optional[str]] = mapped_column(JSON)
+    content: Mapped[Optional[str]] = mapped_column(deferred=True, deferred_group=DETAIL_GROUP)
+    summary: Mapped[Optional[str]] = mapped_column(deferred=True, deferred_group=DETAIL_GROUP)
+    key_concepts: Mapped[Optional[str]] = mapped_column(JSON, deferred=True, deferred_group=DETAIL_GROUP)
     difficulty: Mapped[Optional[str]]
     estimated_time_mins: Mapped[Optional[int]]
-    source_metadata_json: Mapped[Optional[dict]] = mapped_column(JSON)
+    source_metadata_json: Mapped[Optional[dict]] = mapped_column(JSON, deferred=True, deferred_group=DETAIL_GROUP)
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64), index=True)
     created_at: Mapped[datetime] = mapped_column(insert_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(insert_default=func.now(), onupdate=func.now())
 
@@ -50,6 +121,10 @@ class LearningResource(Base):
         back_populates="learning_resource",
         cascade="all, delete-orphan"
         )
+
+    __table_args__ = (
+        UniqueConstraint('module_id', 'order_index', name='uq_module_order'),
+    )
     
     def __repr__(self) -> str:
         return f"<Module(id={self.id}, title='{self.title}', order_index={self.order_index})>"
@@ -77,7 +152,7 @@ class LearningResource(Base):
         summary: Optional[str] = None,
         key_concepts: Optional[JSON] = None,
         difficulty: Optional[str] = None,
-        estimated_time_mins: Optional[str] = None,
+        estimated_time_mins: Optional[int] = None,
         source_metadata_json: Optional[JSON] = None
     ) -> "LearningResource":
         """
@@ -112,7 +187,7 @@ class LearningResource(Base):
             summary=summary,
             key_concepts=key_concepts,
             difficulty=difficulty,
-            estimated_time_mins=destimated_time_mins,
+            estimated_time_mins=estimated_time_mins,
             source_metadata_json=source_metadata_json
         )
     
@@ -127,8 +202,8 @@ class LearningResource(Base):
         summary: Optional[str] = None,
         key_concepts: Optional[JSON] = None,
         difficulty: Optional[str] = None,
-        estimated_time_mins: Optional[str] = None,
-        source_metadata_json: Option[JSON] = None
+        estimated_time_mins: Optional[int] = None,
+        source_metadata_json: Optional[JSON] = None
     ) -> None:
         """ Update learning resource infomration"""
         if order_index is not None:
@@ -154,3 +229,32 @@ class LearningResource(Base):
         if source_metadata_json is not None:
             self.source_metadata_json = source_metadata_json
 
+
+@event.listens_for(LearningResource, "before_insert")
+def _hash_new_content(mapper, connection, target):
+    if target.content_hash is None:
+        target.content_hash = stored_content_hash(target.content, target.url, target.file_path)
+
+
+@event.listens_for(LearningResource, "before_update")
+def _rehash_changed_content(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.content_hash.history.has_changes():
+        # Set explicitly, e.g. to a blob digest when the body moved out of the row
+        return
+    if not any(state.attrs[name].history.has_changes() for name in ("content", "url", "file_path")):
+        return
+    if "content" in state.unloaded:
+        # Reading target.content here would load the whole detail group
+        # inside the flush. The body is unchanged, so only ask whether the
+        # row has one: if it does, the url and file_path do not affect the hash.
+        table = LearningResource.__table__
+        has_body = connection.scalar(
+            select(func.length(func.trim(table.c.content)) > 0).where(table.c.id == target.id)
+        )
+        if has_body:
+            return
+        target.content_hash = stored_content_hash(None, target.url, target.file_path)
+        return
+    # A blob-stored body keeps its digest whatever happens to the url
+    target.content_hash = stored_content_hash(target.content, target.url, target.file_path)
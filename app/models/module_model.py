@@ -1,12 +1,80 @@
+import weakref
 from datetime import datetime
 from typing import Optional, Dict, TYPE_CHECKING
 from sqlalchemy import Integer, ForeignKey, func, JSON
+from sqlalchemy.ext.mutable import Mutable, MutableDict, MutableList
 from sqlalchemy.orm import DeclarativeBase, mapped_column, Mapped, relationship
 from .base import Base
 
 if TYPE_CHECKING:
     from resource import Resource
 
+
+def _track(value, parents):
+    """Wrap dicts and lists, nested ones included, so any in-place change flags the owning column"""
+    if isinstance(value, (TrackedDict, TrackedList)):
+        value._parents = parents
+        return value
+    if isinstance(value, dict):
+        value = TrackedDict({key: _track(item, parents) for key, item in value.items()})
+    elif isinstance(value, list):
+        value = TrackedList(_track(item, parents) for item in value)
+    else:
+        return value
+    # Nested containers share the root's parents, so their changed() flags the same row
+    value._parents = parents
+    return value
+
+
+class TrackedDict(MutableDict):
+    def __setitem__(self, key, value):
+        super().__setitem__(key, _track(value, self._parents))
+
+    def setdefault(self, key, value=None):
+        return super().setdefault(key, _track(value, self._parents))
+
+    def update(self, *args, **kwargs):
+        super().update({key: _track(value, self._parents) for key, value in dict(*args, **kwargs).items()})
+
+
+class TrackedList(MutableList):
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            value = [_track(item, self._parents) for item in value]
+        else:
+            value = _track(value, self._parents)
+        super().__setitem__(index, value)
+
+    def append(self, value):
+        super().append(_track(value, self._parents))
+
+    def extend(self, values):
+        super().extend(_track(value, self._parents) for value in values)
+
+    def insert(self, index, value):
+        super().insert(index, _track(value, self._parents))
+
+    def __iadd__(self, values):
+        self.extend(values)
+        return self
+
+
+class MutableJSON(Mutable):
+    """
+    JSON column type whose value, an object or an array, reports in-place changes.
+
+    A plain JSON column only notices assignment, so appending to
+    prereqs_json["module_ids"] would never be flushed.
+    """
+
+    @classmethod
+    def coerce(cls, key, value):
+        if value is None or isinstance(value, (TrackedDict, TrackedList)):
+            return value
+        if isinstance(value, (dict, list)):
+            return _track(value, weakref.WeakKeyDictionary())
+        return Mutable.coerce(key, value)
+
 class Module(Base):
     """
     Topics Units within a learning path
@@ -19,12 +87,13 @@ class Module(Base):
     __tablename__ = "modules"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    learning_path_id: Mapped[int] = mapped_column(ForeignKey("learning_paths.id", ondelete='CASCADE'), index=True)
+    # active_history keeps the previous path available to the progress rollup listener
+    learning_path_id: Mapped[int] = mapped_column(ForeignKey("learning_paths.id", ondelete='CASCADE'), index=True, active_history=True)
     name: Mapped[str]
     description: Mapped[Optional[str]]
     order_index: Mapped[int] = mapped_column(index=True)
     duration_days: Mapped[Optional[int]]
-    prereqs_json: Mapped[Optional[dict]] = mapped_column(JSON)
+    prereqs_json: Mapped[Optional[dict]] = mapped_column(MutableJSON.as_mutable(JSON))
     learning_objectives: Mapped[Optional[dict]] = mapped_column(JSON,nullable=True,)
     created_at: Mapped[datetime] = mapped_column(insert_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(insert_default=func.now(), onupdate=func.now())
@@ -0,0 +1,271 @@
+from collections import defaultdict
+from datetime import datetime
+from itertools import chain
+from typing import Optional, Iterable
+from sqlalchemy import String, func, event, select, update, insert, case, distinct, inspect, UniqueConstraint
+from sqlalchemy.dialects import sqlite, postgresql
+from sqlalchemy.orm import Mapped, mapped_column, Session
+from .base import Base
+from .module_model import Module
+from .learning_resource_model import LearningResource
+from .resource_progress_model import ResourceProgress
+
+MODULE_SCOPE = "module"
+PATH_SCOPE = "path"
+
+
+class ProgressRollup(Base):
+    """
+    Precomputed progress counts for one module or one learning path.
+
+    Kept current in the same transaction as every ResourceProgress,
+    LearningResource and Module change, so dashboards read a single row
+    instead of scanning resource_progress. BulkLoader refreshes the modules
+    of the resources it writes; other writes that bypass the ORM, such as
+    database-level cascades, need rebuild_rollups to repair the table.
+    """
+
+    __tablename__ = "progress_rollups"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    scope: Mapped[str] = mapped_column(String(16))
+    scope_id: Mapped[int]
+    total_count: Mapped[int] = mapped_column(default=0)
+    completed_count: Mapped[int] = mapped_column(default=0)
+    in_progress_count: Mapped[int] = mapped_column(default=0)
+    time_spent_mins: Mapped[int] = mapped_column(default=0)
+    updated_at: Mapped[datetime] = mapped_column(insert_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('scope', 'scope_id', name='uq_rollup_scope'),
+    )
+
+    def __repr__(self) -> str:
+        return f"<ProgressRollup(scope={self.scope}, scope_id={self.scope_id}, completed={self.completed_count}/{self.total_count})>"
+
+    @property
+    def percent_complete(self) -> float:
+        """Completed resources as a float between 0 and 100"""
+        if not self.total_count:
+            return 0.0
+        return round(100.0 * self.completed_count / self.total_count, 2)
+
+    def to_dict(self) -> dict:
+        return {
+            'scope': self.scope,
+            'scope_id': self.scope_id,
+            'total_count': self.total_count,
+            'completed_count': self.completed_count,
+            'in_progress_count': self.in_progress_count,
+            'time_spent_mins': self.time_spent_mins,
+            'percent_complete': self.percent_complete,
+        }
+
+
+COUNT_COLUMNS = ("total_count", "completed_count", "in_progress_count", "time_spent_mins")
+
+
+def _scope_counts(connection, scope: str, scope_id: int) -> dict:
+    """Counts for one scope computed from the base tables"""
+    scope_column = Module.id if scope == MODULE_SCOPE else Module.learning_path_id
+    completed = case((ResourceProgress.status == "completed", LearningResource.id), else_=None)
+    in_progress = case((ResourceProgress.status == "in_progress", LearningResource.id), else_=None)
+    row = connection.execute(
+        select(
+            func.count(distinct(LearningResource.id)),
+            func.count(distinct(completed)),
+            func.count(distinct(in_progress)),
+            func.coalesce(func.sum(ResourceProgress.time_spent_mins), 0),
+        )
+        .select_from(Module)
+        .join(LearningResource, LearningResource.module_id == Module.id)
+        .outerjoin(ResourceProgress, ResourceProgress.learning_resource_id == LearningResource.id)
+        .where(scope_column == scope_id)
+    ).one()
+    return dict(zip(COUNT_COLUMNS, row))
+
+
+ZERO_COUNTS = dict.fromkeys(COUNT_COLUMNS, 0)
+PROGRESS_COLUMNS = ("learning_resource_id", "status", "time_spent_mins")
+
+
+def _committed(obj, key: str):
+    """Value of an attribute before the pending change"""
+    history = inspect(obj).attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return getattr(obj, key)
+
+
+def _changed(obj, *keys: str) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[key].history.has_changes() for key in keys)
+
+
+def _resource_modules(obj, session) -> set:
+    """Modules a LearningResource change affects: its old and its new module"""
+    if obj in session.new:
+        return {obj.module_id}
+    if obj in session.deleted:
+        return {_committed(obj, "module_id")}
+    if not _changed(obj, "module_id", "module"):
+        return set()
+    modules = {_committed(obj, "module_id"), obj.module_id}
+    # Moved by assigning resource.module rather than module_id
+    old_module = inspect(obj).attrs.module.history.deleted
+    if old_module and old_module[0] is not None:
+        modules.add(old_module[0].id)
+    return modules
+
+
+def _insert_or_add(connection, scope: str, scope_id: int, counts: dict, delta: dict) -> None:
+    """
+    Create a rollup row, or add delta to it when another transaction created it first.
+
+    Only SQLite and PostgreSQL can skip the conflicting insert; elsewhere
+    concurrent first writes to a scope fail on uq_rollup_scope.
+    """
+    table = ProgressRollup.__table__
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        stmt = sqlite.insert(table).on_conflict_do_nothing(index_elements=["scope", "scope_id"])
+    elif dialect == "postgresql":
+        stmt = postgresql.insert(table).on_conflict_do_nothing(constraint="uq_rollup_scope")
+    else:
+        stmt = insert(table)
+    result = connection.execute(stmt.values(scope=scope, scope_id=scope_id, **counts))
+    if result.rowcount == 0:
+        _add(connection, scope, scope_id, delta)
+
+
+def _add(connection, scope: str, scope_id: int, delta: dict) -> int:
+    table = ProgressRollup.__table__
+    return connection.execute(
+        update(table)
+        .where(table.c.scope == scope, table.c.scope_id == scope_id)
+        .values({column: table.c[column] + delta[column] for column in COUNT_COLUMNS})
+    ).rowcount
+
+
+def refresh_module_rollups(connection, module_paths: dict, moved_from: Optional[dict]=None) -> None:
+    """
+    Recompute the rollups of changed modules and pass the difference on to their paths.
+
+    Each module is counted again from the base tables, which already hold
+    the flushed change, so a resource with several progress rows is still
+    counted once. The difference from the stored module row is added to
+    the path row, so a path is never rescanned once it has a row. A module
+    that moved to another path takes its stored counts out of the old
+    path and adds its new counts to the new one.
+
+    Args:
+        connection: Connection of the flushing session
+        module_paths: Module id to learning path id; modules deleted in the
+            flush carry their former path
+        moved_from: Module id to the path it belonged to before the flush,
+            for modules whose learning_path_id changed
+    """
+    moved_from = moved_from or {}
+    if not module_paths:
+        return
+    table = ProgressRollup.__table__
+    stored = {
+        row.scope_id: row
+        for row in connection.execute(
+            select(table).where(table.c.scope == MODULE_SCOPE, table.c.scope_id.in_(list(module_paths)))
+        )
+    }
+    existing = set(connection.scalars(select(Module.id).where(Module.id.in_(list(module_paths)))))
+
+    path_deltas = defaultdict(lambda: dict(ZERO_COUNTS))
+    for module_id, path_id in module_paths.items():
+        counts = _scope_counts(connection, MODULE_SCOPE, module_id) if module_id in existing else dict(ZERO_COUNTS)
+        old = stored.get(module_id)
+        delta = {column: counts[column] - (getattr(old, column) if old is not None else 0) for column in COUNT_COLUMNS}
+        if module_id not in existing:
+            connection.execute(
+                table.delete().where(table.c.scope == MODULE_SCOPE, table.c.scope_id == module_id)
+            )
+        elif old is None:
+            _insert_or_add(connection, MODULE_SCOPE, module_id, counts, delta)
+        elif any(delta.values()):
+            _add(connection, MODULE_SCOPE, module_id, delta)
+        former = moved_from.get(module_id)
+        if former is not None and former != path_id:
+            for column in COUNT_COLUMNS:
+                path_deltas[former][column] -= getattr(old, column) if old is not None else 0
+                if path_id is not None:
+                    path_deltas[path_id][column] += counts[column]
+        elif path_id is not None:
+            for column in COUNT_COLUMNS:
+                path_deltas[path_id][column] += delta[column]
+
+    for path_id, delta in path_deltas.items():
+        if not any(delta.values()):
+            continue
+        if _add(connection, PATH_SCOPE, path_id, delta) == 0:
+            _insert_or_add(connection, PATH_SCOPE, path_id, _scope_counts(connection, PATH_SCOPE, path_id), delta)
+
+
+def _refresh_modules(connection, module_paths: dict, resource_ids: Iterable[int]=(), moved_from: Optional[dict]=None) -> None:
+    """refresh_module_rollups for module_paths plus the modules holding resource_ids, looking up unknown paths"""
+    resource_ids = list(resource_ids)
+    if resource_ids:
+        for module_id in connection.scalars(
+            select(LearningResource.module_id).where(LearningResource.id.in_(resource_ids))
+        ):
+            module_paths.setdefault(module_id, None)
+    module_paths.pop(None, None)
+    lookup = [module_id for module_id, path_id in module_paths.items() if path_id is None]
+    if lookup:
+        module_paths.update(connection.execute(
+            select(Module.id, Module.learning_path_id).where(Module.id.in_(lookup))
+        ).all())
+    refresh_module_rollups(connection, module_paths, moved_from)
+
+
+def refresh_resource_rollups(connection, resource_ids: Iterable[int]) -> None:
+    """
+    Refresh the rollups of the modules holding resource_ids.
+
+    For writes that bypass the ORM and so the flush listener, such as
+    BulkLoader inserts; run it in the same transaction, after the write.
+    """
+    _refresh_modules(connection, {}, [resource_id for resource_id in resource_ids if resource_id is not None])
+
+
+def _moved_from(module: Module):
+    """learning_path_id a module had before the flush, when it moved"""
+    old_path = inspect(module).attrs.learning_path.history.deleted
+    # Moved by assigning module.learning_path rather than learning_path_id
+    if old_path and old_path[0] is not None:
+        return old_path[0].id
+    return _committed(module, "learning_path_id")
+
+
+@event.listens_for(Session, "after_flush")
+def _maintain_progress_rollups(session, flush_context):
+    # Pending-state lists and attribute history still describe the flushed changes here
+    module_paths = {}
+    moved_from = {}
+    resource_ids = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, ResourceProgress):
+            if obj in session.new or obj in session.deleted or _changed(obj, *PROGRESS_COLUMNS):
+                resource_ids.update((_committed(obj, "learning_resource_id"), obj.learning_resource_id))
+        elif isinstance(obj, LearningResource):
+            for module_id in _resource_modules(obj, session):
+                module_paths.setdefault(module_id, None)
+        elif isinstance(obj, Module):
+            if obj in session.deleted:
+                module_paths[obj.id] = _committed(obj, "learning_path_id")
+            elif obj not in session.new and _changed(obj, "learning_path_id", "learning_path"):
+                module_paths[obj.id] = obj.learning_path_id
+                moved_from[obj.id] = _moved_from(obj)
+    # Progress rows of a deleted resource go with it, and its module is already covered
+    resource_ids -= {obj.id for obj in session.deleted if isinstance(obj, LearningResource)} | {None}
+    if not module_paths and not resource_ids:
+        return
+    _refresh_modules(session.connection(), module_paths, resource_ids, moved_from)
@@ -0,0 +1,97 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import ForeignKey, Index, func, event, select, update, insert, or_
+from sqlalchemy.orm import Mapped, mapped_column, Session
+from .base import Base
+from .quiz_attempt_model import QuizAttempt
+
+
+class QuestionReviewState(Base):
+    """
+    Current spaced-repetition state of one quiz question.
+
+    A copy of the SM-2 fields from the question's latest QuizAttempt, kept
+    current in the same transaction as every attempt insert, so finding due
+    questions is an index range scan instead of a latest-attempt-per-question
+    query over the whole attempt history.
+    """
+
+    __tablename__ = "question_review_states"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    question_id: Mapped[int] = mapped_column(ForeignKey("quiz_questions.id", ondelete="CASCADE"), unique=True)
+    last_attempt_id: Mapped[Optional[int]] = mapped_column(ForeignKey("quiz_attempts.id", ondelete="SET NULL"))
+    last_attempted_at: Mapped[datetime]
+    next_review_date: Mapped[datetime]
+    ease_factor: Mapped[str]
+    repetition_count: Mapped[int] = mapped_column(default=0)
+    interval_days: Mapped[int] = mapped_column(default=0)
+    updated_at: Mapped[datetime] = mapped_column(insert_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        # "Next N due" walks this index in (next_review_date, question_id) order
+        Index('ix_review_states_due', 'next_review_date', 'question_id'),
+    )
+
+    def __repr__(self) -> str:
+        return f"<QuestionReviewState(question_id={self.question_id}, next_review={self.next_review_date})>"
+
+    def to_dict(self) -> dict:
+        return {
+            'question_id': self.question_id,
+            'last_attempted_at': self.last_attempted_at.isoformat() if self.last_attempted_at else None,
+            'next_review_date': self.next_review_date.isoformat() if self.next_review_date else None,
+            'ease_factor': self.ease_factor,
+            'repetition_count': self.repetition_count,
+            'interval_days': self.interval_days,
+        }
+
+
+def state_values(attempt: QuizAttempt) -> dict:
+    """Review-state columns copied from an attempt"""
+    return {
+        "last_attempt_id": attempt.id,
+        "last_attempted_at": attempt.attempted_at,
+        "next_review_date": attempt.next_review_date,
+        "ease_factor": attempt.ease_factor,
+        "repetition_count": attempt.repetition_count,
+        "interval_days": attempt.interval_days,
+    }
+
+
+@event.listens_for(Session, "after_flush")
+def _maintain_review_states(session, flush_context):
+    attempts = [obj for obj in session.new if isinstance(obj, QuizAttempt)]
+    if not attempts:
+        return
+
+    # The latest new attempt per question wins; older backfilled attempts never move the state back
+    latest = {}
+    for attempt in attempts:
+        current = latest.get(attempt.question_id)
+        if current is None or (attempt.attempted_at, attempt.id) > (current.attempted_at, current.id):
+            latest[attempt.question_id] = attempt
+
+    connection = session.connection()
+    table = QuestionReviewState.__table__
+    missing = []
+    for question_id, attempt in latest.items():
+        values = state_values(attempt)
+        result = connection.execute(
+            update(table)
+            .where(
+                table.c.question_id == question_id,
+                or_(table.c.last_attempted_at <= attempt.attempted_at, table.c.last_attempt_id.is_(None)),
+            )
+            .values(values)
+        )
+        if result.rowcount == 0:
+            missing.append((question_id, values))
+
+    if missing:
+        existing = set(connection.scalars(
+            select(table.c.question_id).where(table.c.question_id.in_([question_id for question_id, _ in missing]))
+        ))
+        rows = [dict(values, question_id=question_id) for question_id, values in missing if question_id not in existing]
+        if rows:
+            connection.execute(insert(table), rows)
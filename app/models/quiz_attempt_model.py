@@ -27,6 +27,8 @@ class QuizAttempt(Base):
     def create(
         cls,
         question_id: int,
+        user_answer: str,
+        is_correct: bool,
         attempted_at: datetime,
         time_taken_secs: int,
         confidence_level: float,
@@ -41,6 +43,8 @@ class QuizAttempt(Base):
             """
             return cls(
                 question_id=question_id,
+                user_answer=user_answer,
+                is_correct=is_correct,
                 attempted_at=attempted_at,
                 time_taken_secs=time_taken_secs,
                 confidence_level=confidence_level,
@@ -1,6 +1,6 @@
 from datetime import datetime
 from .base import Base
-from typing import Optional
+from typing import Optional, List
 from sqlalchemy import ForeignKey, func, Enum, JSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
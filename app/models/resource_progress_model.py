@@ -9,11 +9,12 @@ class ResourceProgress(Base):
     __tablename__= 'resource_progress'
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    learning_resource_id: Mapped[int] = mapped_column(ForeignKey("learning_resources.id", ondelete="CASCADE"), index=True)
-    status: Mapped[str] = mapped_column(default='not_started')
+    # active_history keeps the previous values available to the progress rollup listener
+    learning_resource_id: Mapped[int] = mapped_column(ForeignKey("learning_resources.id", ondelete="CASCADE"), index=True, active_history=True)
+    status: Mapped[str] = mapped_column(default='not_started', active_history=True)
     started_at: Mapped[Optional[datetime]]
     completed_at: Mapped[Optional[datetime]]
-    time_spent_mins: Mapped[Optional[int]]
+    time_spent_mins: Mapped[Optional[int]] = mapped_column(active_history=True)
     notes: Mapped[Optional[str]]
     rating: Mapped[Optional[int]]
     understand_level: Mapped[Optional[float]]
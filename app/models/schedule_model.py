@@ -1,9 +1,24 @@
 from .base import Base
 from sqlalchemy.orm import mapped_column, Mapped, relationship
-from sqlalchemy import ForeignKey, Boolean, func, UniqueConstraint
-from datetime import datetime, date
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy import ForeignKey, Boolean, func, UniqueConstraint, Index, and_, false
+from datetime import datetime, date, time, timedelta
 from typing import Optional
 
+
+def day_start(day: date) -> datetime:
+    """Midnight at the start of day, for range comparisons against scheduled_date"""
+    return datetime.combine(day, time.min)
+
+
+DEFAULT_DELIVERY_TIME = "07:00"
+
+
+def delivery_datetime(day: date, scheduled_time: str=DEFAULT_DELIVERY_TIME) -> datetime:
+    """Combine a day and an HH:MM time of day into a scheduled_date value"""
+    return datetime.combine(day, time.fromisoformat(scheduled_time))
+
+
 class Schedule(Base):
     """
     Schedules for when resources are delivered
@@ -28,16 +43,26 @@ class Schedule(Base):
 
     __table_args__ = (
         UniqueConstraint('learning_resource_id', 'scheduled_date', name='uq_resource_date'),
+        # Delivery queries filter on delivered, range-scan scheduled_date and page by id
+        Index('ix_schedules_delivery', 'delivered', 'scheduled_date', 'id'),
     )
 
-    @property
+    @hybrid_property
     def is_overdue(self) -> bool:
-        today = date.today()
-        return self.scheduled_date < today and not self.delivered
-    
-    @property
+        return self.scheduled_date < day_start(date.today()) and not self.delivered
+
+    @is_overdue.expression
+    def is_overdue(cls):
+        return and_(cls.scheduled_date < day_start(date.today()), cls.delivered == false())
+
+    @hybrid_property
     def is_today(self) -> bool:
-        return self.scheduled_date == date.today()
+        return self.scheduled_date.date() == date.today()
+
+    @is_today.expression
+    def is_today(cls):
+        today = day_start(date.today())
+        return and_(cls.scheduled_date >= today, cls.scheduled_date < today + timedelta(days=1))
 
     # Helper Functions
 
@@ -46,21 +71,24 @@ class Schedule(Base):
     def create(
         cls,
         learning_resource_id: int,
-        scheduled_date: datetime,
-        scheduled_time: str="07:00"
+        scheduled_date: date,
+        scheduled_time: str=DEFAULT_DELIVERY_TIME
     ) -> "Schedule":
         """
         Creates a schedule for a learning resource
 
         Args:
             learning_resource_id: Foreign key to learning resource
-            scheduled_date: When the resource is scheduled to be delivered
-            scheduled_time: time of day the resources is scheduled to be delivered
+            scheduled_date: Day the resource is scheduled to be delivered
+            scheduled_time: time of day the resources is scheduled to be delivered, as HH:MM
         """
+        if isinstance(scheduled_date, datetime):
+            scheduled_date = scheduled_date.date()
+        scheduled_at = delivery_datetime(scheduled_date, scheduled_time)
         return cls(
             learning_resource_id=learning_resource_id,
-            scheduled_date=scheduled_date,
-            scheduled_time=scheduled_time
+            scheduled_date=scheduled_at,
+            original_scheduled_date=scheduled_at
         )
     
     def mark_delivered(self):
@@ -0,0 +1,56 @@
+from sqlalchemy import DDL, event
+from .learning_resource_model import LearningResource
+
+FTS_TABLE = "learning_resources_fts"
+PG_SEARCH_INDEX = "ix_learning_resources_search"
+
+# Weighted document used by the PostgreSQL backend; queries must repeat this
+# expression exactly for the planner to use the GIN index
+PG_SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(key_concepts::text, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(summary, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(content, '')), 'D')"
+)
+
+# External-content FTS5 table: the text lives only in learning_resources,
+# the triggers keep the index in step with every insert, update and delete
+SQLITE_SEARCH_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, key_concepts, summary, content,
+        content='learning_resources', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS learning_resources_fts_ai AFTER INSERT ON learning_resources BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, key_concepts, summary, content)
+        VALUES (new.id, new.title, new.key_concepts, new.summary, new.content);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS learning_resources_fts_ad AFTER DELETE ON learning_resources BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, key_concepts, summary, content)
+        VALUES ('delete', old.id, old.title, old.key_concepts, old.summary, old.content);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS learning_resources_fts_au
+    AFTER UPDATE OF title, key_concepts, summary, content ON learning_resources BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, key_concepts, summary, content)
+        VALUES ('delete', old.id, old.title, old.key_concepts, old.summary, old.content);
+        INSERT INTO {FTS_TABLE}(rowid, title, key_concepts, summary, content)
+        VALUES (new.id, new.title, new.key_concepts, new.summary, new.content);
+    END""",
+]
+
+POSTGRES_SEARCH_DDL = [
+    f"CREATE INDEX IF NOT EXISTS {PG_SEARCH_INDEX} ON learning_resources USING gin (({PG_SEARCH_VECTOR}))",
+]
+
+SQLITE_DROP_DDL = [
+    "DROP TRIGGER IF EXISTS learning_resources_fts_au",
+    "DROP TRIGGER IF EXISTS learning_resources_fts_ad",
+    "DROP TRIGGER IF EXISTS learning_resources_fts_ai",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+for statement in SQLITE_SEARCH_DDL:
+    event.listen(LearningResource.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+for statement in POSTGRES_SEARCH_DDL:
+    event.listen(LearningResource.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+for statement in SQLITE_DROP_DDL:
+    event.listen(LearningResource.__table__, "before_drop", DDL(statement).execute_if(dialect="sqlite"))
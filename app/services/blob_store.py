@@ -0,0 +1,364 @@
+import codecs
+import hashlib
+import mmap
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional, Iterable, Iterator, Union
+from sqlalchemy import select, update, bindparam, func
+from ..models import LearningResource
+from ..models.learning_resource_model import BLOB_PREFIX
+from .config.settings import settings
+
+CHUNK_SIZE = 1 << 20
+PDF_MAGIC = b"%PDF-"
+
+
+def is_blob_ref(file_path: Optional[str]) -> bool:
+    """True when a LearningResource.file_path points into the blob store"""
+    return bool(file_path) and file_path.startswith(BLOB_PREFIX)
+
+
+def blob_digest(ref: str) -> str:
+    """SHA-256 hex digest named by a blob reference"""
+    if not is_blob_ref(ref):
+        raise ValueError(f"Not a blob reference: {ref!r}")
+    return ref[len(BLOB_PREFIX):]
+
+
+class BlobView:
+    """
+    Read-only memory map of one stored body.
+
+    data is a memoryview over the mapping, so slicing it and iter_bytes
+    copy nothing; pages are read from disk only when touched. Close the
+    view, or use it as a context manager, once done.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        with open(path, "rb") as file:
+            self.size = os.fstat(file.fileno()).st_size
+            # mmap cannot map an empty file
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        self.data = memoryview(self._mmap) if self._mmap is not None else memoryview(b"")
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __enter__(self) -> "BlobView":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.data.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    @property
+    def is_pdf(self) -> bool:
+        return self.data[:len(PDF_MAGIC)] == PDF_MAGIC
+
+    def stream(self):
+        """File-like object over the mapping, for parsers that seek and read"""
+        if self._mmap is None:
+            raise ValueError(f"{self.path} is empty")
+        self._mmap.seek(0)
+        return self._mmap
+
+    def iter_bytes(self, chunk_size: int=CHUNK_SIZE) -> Iterator[memoryview]:
+        """Consecutive zero-copy slices; release each one before closing the view"""
+        for start in range(0, self.size, chunk_size):
+            yield self.data[start:start + chunk_size]
+
+    def iter_text(self, encoding: str="utf-8", chunk_size: int=CHUNK_SIZE) -> Iterator[str]:
+        """Decode the body chunk by chunk; multi-byte characters split across chunks are kept whole"""
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        for chunk in self.iter_bytes(chunk_size):
+            with chunk:
+                text = decoder.decode(chunk)
+            if text:
+                yield text
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+
+class BlobWriter:
+    """
+    Streams one body into the store.
+
+    Bytes go to a temporary file while being hashed, and commit moves the
+    file to its content address, so a partially written body is never
+    visible and storing the same body twice keeps a single copy.
+    """
+
+    def __init__(self, store: "BlobStore"):
+        self.store = store
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._file = tempfile.NamedTemporaryFile(dir=store.tmp_dir, delete=False)
+        self._done = False
+
+    def __enter__(self) -> "BlobWriter":
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        if exc_type is not None:
+            self.abort()
+
+    def write(self, data) -> None:
+        self._file.write(data)
+        self._hash.update(data)
+        self.size += len(data)
+
+    def commit(self) -> str:
+        """
+        Finish the body.
+
+        Returns:
+            Blob reference for LearningResource.file_path
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        digest = self._hash.hexdigest()
+        path = self.store.path(digest)
+        if path.exists():
+            os.unlink(self._file.name)
+            # Counts as a new write, so prune_blobs' grace period covers it too
+            os.utime(path)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(self._file.name, path)
+        self._done = True
+        return BLOB_PREFIX + digest
+
+    def abort(self) -> None:
+        """Discard the body; does nothing after commit"""
+        if self._done:
+            return
+        self._file.close()
+        if os.path.exists(self._file.name):
+            os.unlink(self._file.name)
+        self._done = True
+
+
+class BlobStore:
+    """
+    Content-addressed file store for resource bodies too large to keep in
+    learning_resources.content.
+
+    Each body is saved once under root/ab/cd/<sha256> and referenced from
+    LearningResource.file_path as "blob:<sha256>".
+
+    Args:
+        root: Store directory, defaults to BLOB_STORE_PATH
+    """
+
+    def __init__(self, root: Optional[Union[str, Path]]=None):
+        root = root or settings.BLOB_STORE_PATH
+        if not root:
+            raise ValueError("BLOB_STORE_PATH is not set")
+        self.root = Path(root)
+        self.tmp_dir = self.root / "tmp"
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    def path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest[2:4] / digest
+
+    def writer(self) -> BlobWriter:
+        return BlobWriter(self)
+
+    def put(self, data: Union[bytes, str]) -> str:
+        """Store a body already in memory and return its reference"""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        with self.writer() as writer:
+            writer.write(data)
+            return writer.commit()
+
+    def put_stream(self, chunks: Iterable[bytes]) -> str:
+        """Store a body arriving in chunks, e.g. from a file or download, and return its reference"""
+        with self.writer() as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+            return writer.commit()
+
+    def open(self, ref: str) -> BlobView:
+        return BlobView(self.path(blob_digest(ref)))
+
+    def exists(self, ref: str) -> bool:
+        return self.path(blob_digest(ref)).exists()
+
+    def delete(self, ref: str) -> None:
+        path = self.path(blob_digest(ref))
+        if path.exists():
+            path.unlink()
+
+    def digests(self, older_than: Optional[float]=None) -> Iterator[str]:
+        """Digests of every stored body, or only those last written before the older_than timestamp"""
+        for path in self.root.glob("??/??/*"):
+            if older_than is not None:
+                try:
+                    if path.stat().st_mtime >= older_than:
+                        continue
+                except FileNotFoundError:
+                    continue
+            yield path.name
+
+
+def get_blob_store() -> Optional[BlobStore]:
+    """Store configured by BLOB_STORE_PATH, or None when blob-store mode is off"""
+    return BlobStore() if settings.BLOB_STORE_PATH else None
+
+
+def iter_pdf_text(view: BlobView) -> Iterator[str]:
+    """
+    Extract a PDF's text one page at a time.
+
+    pypdf reads the document through the memory map, so only the page
+    being extracted is parsed into memory.
+    """
+    try:
+        from pypdf import PdfReader
+    except ImportError as e:
+        raise RuntimeError("PDF extraction requires the pypdf package") from e
+    reader = PdfReader(view.stream())
+    for page in reader.pages:
+        text = page.extract_text()
+        if text:
+            yield text + "\n\n"
+
+
+def iter_resource_text(resource, store: Optional[BlobStore]=None, chunk_size: int=CHUNK_SIZE) -> Iterator[str]:
+    """
+    Text of a resource in pieces, whether it is stored in the row or in the blob store.
+
+    PDFs are extracted page by page and other bodies decoded chunk by
+    chunk, so a large body is never read into memory at once.
+    """
+    if resource.content is not None or not is_blob_ref(resource.file_path):
+        if resource.content:
+            yield resource.content
+        return
+    store = store or BlobStore()
+    with store.open(resource.file_path) as view:
+        if view.is_pdf:
+            yield from iter_pdf_text(view)
+        else:
+            yield from view.iter_text(chunk_size=chunk_size)
+
+
+def load_resource_text(resource, store: Optional[BlobStore]=None) -> str:
+    """Whole text of a resource, for callers such as prompts that need it at once"""
+    return "".join(iter_resource_text(resource, store))
+
+
+def store_resource_body(resource, body: Union[bytes, str], store: Optional[BlobStore]=None) -> None:
+    """
+    Set a resource's body, moving it to the blob store when it is over BLOB_THRESHOLD_BYTES.
+
+    Small bodies stay in content. Large ones clear content, point
+    file_path at the stored blob and use its digest as content_hash, so
+    copies of the same file still share an enrichment. Needs blob-store
+    mode for large bodies unless a store is passed.
+    """
+    size = len(body.encode("utf-8")) if isinstance(body, str) else len(body)
+    store = store or get_blob_store()
+    if store is None or size <= settings.BLOB_THRESHOLD_BYTES:
+        resource.content = body if isinstance(body, str) else body.decode("utf-8", errors="replace")
+        if is_blob_ref(resource.file_path):
+            resource.file_path = None
+        return
+    ref = store.put(body)
+    resource.file_path = ref
+    resource.content = None
+    resource.content_hash = blob_digest(ref)
+
+
+def offload_large_contents(session, store: Optional[BlobStore]=None, threshold: Optional[int]=None, batch_size: Optional[int]=None) -> int:
+    """
+    Move content over the threshold out of learning_resources into the blob store.
+
+    Rows are streamed and rewritten in batches with one executemany UPDATE
+    each, committing after every batch.
+
+    Returns:
+        Number of resources moved
+    """
+    store = store or BlobStore()
+    threshold = threshold or settings.BLOB_THRESHOLD_BYTES
+    batch_size = batch_size or settings.BULK_BATCH_SIZE
+    table = LearningResource.__table__
+    # length() counts characters, and a character is at most 4 bytes in UTF-8
+    ids = list(session.scalars(
+        select(LearningResource.id)
+        .where(func.length(LearningResource.content) > threshold // 4)
+        .order_by(LearningResource.id)
+    ))
+    statement = (
+        update(table)
+        .where(table.c.id == bindparam("resource_id"))
+        .values(content=None, file_path=bindparam("ref"), content_hash=bindparam("digest"), updated_at=func.now())
+    )
+
+    moved = 0
+    for start in range(0, len(ids), batch_size):
+        rows = session.execute(
+            select(LearningResource.id, LearningResource.content)
+            .where(LearningResource.id.in_(ids[start:start + batch_size]))
+        )
+        batch = []
+        for resource_id, content in rows:
+            body = content.encode("utf-8")
+            if len(body) <= threshold:
+                continue
+            ref = store.put(body)
+            batch.append({"resource_id": resource_id, "ref": ref, "digest": blob_digest(ref)})
+        if batch:
+            session.execute(statement, batch)
+            session.commit()
+            moved += len(batch)
+    return moved
+
+
+def prune_blobs(session, store: Optional[BlobStore]=None, grace_secs: Optional[float]=None) -> int:
+    """
+    Delete stored bodies no resource references any more.
+
+    Writers store a body before committing the row that references it, so
+    blobs written within the last grace_secs are kept: a prune running
+    alongside offload_large_contents or refresh_resources must not delete
+    a body whose row is not committed yet. The grace period has to exceed
+    the longest such transaction.
+
+    Args:
+        session: Active session
+        store: Blob store, defaults to BLOB_STORE_PATH
+        grace_secs: Minimum age of a deleted blob, defaults to BLOB_PRUNE_GRACE_SECONDS
+
+    Returns:
+        Number of blobs deleted
+    """
+    store = store or BlobStore()
+    grace_secs = settings.BLOB_PRUNE_GRACE_SECONDS if grace_secs is None else grace_secs
+    # Taken before reading the references, so a blob written after the
+    # query started is always inside the grace period
+    cutoff = time.time() - float(grace_secs)
+    referenced = {
+        blob_digest(ref)
+        for ref in session.scalars(
+            select(LearningResource.file_path).where(LearningResource.file_path.like(f"{BLOB_PREFIX}%"))
+        )
+    }
+    deleted = 0
+    for digest in list(store.digests(older_than=cutoff)):
+        if digest not in referenced:
+            store.delete(BLOB_PREFIX + digest)
+            deleted += 1
+    return deleted
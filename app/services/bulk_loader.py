@@ -0,0 +1,167 @@
+from itertools import islice
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Callable, Sequence, Tuple
+from sqlalchemy import insert, func
+from sqlalchemy.dialects import sqlite, postgresql
+from ..models import LearningResource, QuizQuestion
+from ..models.learning_resource_model import stored_content_hash
+from ..models.progress_rollup_model import refresh_resource_rollups
+from .config.settings import settings
+
+# Columns the database fills in and that an upsert must not overwrite
+PROTECTED_COLUMNS = ("id", "created_at")
+
+
+def _chunks(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _group_by_keys(chunk: List[Dict[str, Any]]) -> Iterator[Tuple[List[int], List[Dict[str, Any]]]]:
+    # One executemany needs the same columns in every row; the positions
+    # in chunk let results be put back in input order
+    groups: Dict[frozenset, Tuple[List[int], List[Dict[str, Any]]]] = {}
+    for position, row in enumerate(chunk):
+        positions, group = groups.setdefault(frozenset(row), ([], []))
+        positions.append(position)
+        group.append(row)
+    return iter(groups.values())
+
+
+class BulkLoader:
+    """
+    Chunked executemany loader for large imports.
+
+    Rows are plain dicts consumed lazily from any iterable and written in
+    batches of batch_size through Core INSERT statements (multi-row
+    INSERT ... RETURNING where the dialect supports it), so memory stays
+    constant regardless of import size and no ORM objects are built.
+
+    Args:
+        session: Session whose connection and transaction are used
+        batch_size: Rows per statement, defaults to BULK_BATCH_SIZE
+        commit_every_batch: Commit after each batch so a failed import keeps finished batches
+    """
+
+    def __init__(self, session, batch_size: Optional[int]=None, commit_every_batch: bool=True):
+        self.session = session
+        self.batch_size = batch_size or settings.BULK_BATCH_SIZE
+        self.commit_every_batch = commit_every_batch
+
+    def load(
+        self,
+        model,
+        rows: Iterable[Dict[str, Any]],
+        upsert_on: Optional[Sequence[str]]=None,
+        on_batch: Optional[Callable[[List[int]], None]]=None,
+    ) -> int:
+        """
+        Insert rows into model's table.
+
+        Args:
+            model: Mapped class, e.g. LearningResource
+            rows: Iterable of column-name dicts
+            upsert_on: Natural-key columns backed by a unique constraint; a
+                conflicting row updates the existing one instead of failing
+            on_batch: Called once per batch with the primary keys of its
+                rows, in the order the rows were given
+
+        Returns:
+            Number of rows written
+        """
+        table = model.__table__
+        columns = set(table.columns.keys())
+        written = 0
+
+        for chunk in _chunks(rows, self.batch_size):
+            ids: List[Optional[int]] = [None] * len(chunk)
+            for positions, group in _group_by_keys(chunk):
+                unknown = set(group[0]) - columns
+                if unknown:
+                    raise ValueError(f"Unknown columns for {table.name}: {', '.join(sorted(unknown))}")
+
+                stmt = self._statement(table, list(group[0]), upsert_on)
+                if on_batch is not None:
+                    # Without sort_by_parameter_order the RETURNING rows of an
+                    # executemany may come back in any order
+                    result = self.session.execute(stmt.returning(table.c.id, sort_by_parameter_order=True), group)
+                    for position, row in zip(positions, result):
+                        ids[position] = row[0]
+                else:
+                    self.session.execute(stmt, group)
+                written += len(group)
+
+            if on_batch is not None:
+                on_batch(ids)
+            if self.commit_every_batch:
+                self.session.commit()
+        return written
+
+    def _statement(self, table, keys: List[str], upsert_on: Optional[Sequence[str]]):
+        if not upsert_on:
+            return insert(table)
+
+        dialect = self.session.get_bind().dialect.name
+        if dialect == "sqlite":
+            stmt = sqlite.insert(table)
+        elif dialect == "postgresql":
+            stmt = postgresql.insert(table)
+        else:
+            raise ValueError(f"Upsert is not supported for the {dialect} dialect")
+
+        update_columns = [key for key in keys if key not in upsert_on and key not in PROTECTED_COLUMNS]
+        if not update_columns:
+            return stmt.on_conflict_do_nothing(index_elements=list(upsert_on))
+        set_ = {key: stmt.excluded[key] for key in update_columns}
+        if "updated_at" in table.c and "updated_at" not in set_:
+            set_["updated_at"] = func.now()
+        return stmt.on_conflict_do_update(index_elements=list(upsert_on), set_=set_)
+
+    def load_learning_resources(
+        self,
+        rows: Iterable[Dict[str, Any]],
+        upsert: bool=False,
+        on_batch: Optional[Callable[[List[int]], None]]=None,
+        inherit: bool=True,
+    ) -> int:
+        """
+        Load LearningResource rows; with upsert, (module_id, order_index) identifies a resource.
+
+        content_hash is filled in from content or url when a row does not
+        carry one. Core inserts skip the flush listener, so each batch
+        refreshes the progress rollups of the modules it wrote to. With inherit, each batch's resources whose content was
+        enriched before get that enrichment and its quiz questions through
+        enrichment_store.inherit_enrichments, in the batch's transaction.
+        """
+        # enrichment_store itself writes questions through BulkLoader
+        from .enrichment_store import inherit_enrichments
+
+        def batch_loaded(ids: List[int]) -> None:
+            refresh_resource_rollups(self.session.connection(), ids)
+            if inherit:
+                inherit_enrichments(self.session, resource_ids=ids)
+            if on_batch is not None:
+                on_batch(ids)
+
+        upsert_on = ("module_id", "order_index") if upsert else None
+        hashed = (
+            row if row.get("content_hash") else dict(row, content_hash=stored_content_hash(row.get("content"), row.get("url"), row.get("file_path")))
+            for row in rows
+        )
+        return self.load(
+            LearningResource,
+            hashed,
+            upsert_on=upsert_on,
+            on_batch=batch_loaded,
+        )
+
+    def load_quiz_questions(
+        self,
+        rows: Iterable[Dict[str, Any]],
+        on_batch: Optional[Callable[[List[int]], None]]=None,
+    ) -> int:
+        """Load QuizQuestion rows"""
+        return self.load(QuizQuestion, rows, on_batch=on_batch)
@@ -1,99 +1,542 @@
-import os
-from typing import Optional, Dict, Any
-from config.settings import settings
-from anthropic import Anthropic, Client, RateLimitError, APIConnectionError, APIError
+import json
+import time
+import asyncio
+import logging
+import weakref
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Union, Iterator, Callable
+from .config.settings import settings
+from .response_cache import ResponseCache, make_cache_key, build_default_cache
+from .json_stream import JSONArrayStreamParser
+from .metrics import MetricsRegistry, default_registry
+from .client_registry import get_client, get_async_client
+from .rate_limit import (
+    RateLimiter,
+    CircuitBreaker,
+    DecorrelatedJitterBackoff,
+    get_shared_rate_limiter,
+    get_shared_circuit_breaker,
+    retry_after_seconds,
+    estimate_request_tokens,
+)
+from anthropic import RateLimitError, APIConnectionError, APIStatusError
+
+logger = logging.getLogger(__name__)
+
+
+# Either a plain string or a list of content blocks, e.g. from cached_text_block
+PromptContent = Union[str, List[Dict[str, Any]]]
+
+
+def cached_text_block(text: str) -> Dict[str, Any]:
+    """
+    Text content block marked as a prompt-caching breakpoint.
+
+    Everything up to and including this block is cached by the API and
+    billed at the cache-read rate when a later request repeats it verbatim.
+    """
+    return {"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}
+
+
+def resource_system_blocks(content: str, instructions: Optional[str]=None) -> List[Dict[str, Any]]:
+    """
+    System blocks that put a resource's content in a cacheable prefix.
+
+    Use the same blocks for the summary, key concepts, difficulty and quiz
+    calls of one resource and only vary the prompt, so the content is
+    written to the cache once and read back by every follow-up call.
+    Prefixes shorter than the model's minimum cacheable length are sent
+    uncached by the API.
+
+    Args:
+        content: The resource body
+        instructions: Optional shared instructions placed before the content
+    """
+    blocks = []
+    if instructions:
+        blocks.append({"type": "text", "text": instructions})
+    blocks.append(cached_text_block(f"<resource>\n{content}\n</resource>"))
+    return blocks
+
+
+def parse_json_response(response_text: str) -> Any:
+    """Parse a JSON completion, tolerating a surrounding markdown code fence"""
+    # Try to extract JSON from response
+    cleaned = response_text.strip()
+
+    # Remove markdown code blocks if present
+    if cleaned.startswith("```json"):
+        cleaned = cleaned[7:]
+    elif cleaned.startswith("```"):
+        cleaned = cleaned[3:]
+
+    if cleaned.endswith("```"):
+        cleaned = cleaned[:-3]
+
+    cleaned = cleaned.strip()
+
+    try:
+        return json.loads(cleaned)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Failed to parse JSON response: {str(e)}\nResponse: {cleaned[:200]}...")
+
+
+class ClaudeServiceError(Exception):
+    """Raised when a Claude request fails after all retries"""
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, connection problems, timeouts and 5xx/overloaded responses"""
+    if isinstance(error, (RateLimitError, APIConnectionError, asyncio.TimeoutError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code >= 500
+
+
+@dataclass
+class GenerationResult:
+    """
+    Outcome of a single prompt within a generate_many batch.
+
+    Exactly one of text or error is set, so a failed prompt never hides
+    the results of the others.
+    """
+    prompt: PromptContent
+    text: Optional[str] = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
 
 class ClaudeService:
 
-    def __init__(self, api_key: Optional[str]=None):
-        self.client = Anthropic(api_key=settings.ANTHROPIC_API_KEY)
+    def __init__(
+        self,
+        api_key: Optional[str]=None,
+        max_concurrency: Optional[int]=None,
+        cache: Optional[ResponseCache]=None,
+        metrics: Optional[MetricsRegistry]=None,
+        rate_limiter: Optional[RateLimiter]=None,
+        circuit_breaker: Optional[CircuitBreaker]=None,
+    ):
+        self.api_key = api_key or settings.ANTHROPIC_API_KEY
+        self.client = get_client(self.api_key)
         self.model = settings.ANTHROPIC_MODEL
         self.max_tokens = settings.MAX_TOKENS
         self.temperature = settings.TEMPERATURE
+        self.max_concurrency = max_concurrency or settings.CLAUDE_MAX_CONCURRENCY
+        self.request_timeout = settings.CLAUDE_REQUEST_TIMEOUT
+
+        if cache is None and settings.CLAUDE_CACHE_ENABLED:
+            cache = build_default_cache(
+                path=settings.CLAUDE_CACHE_PATH,
+                memory_entries=settings.CLAUDE_CACHE_MEMORY_ENTRIES,
+                disk_entries=settings.CLAUDE_CACHE_DISK_ENTRIES,
+                ttl_seconds=settings.CLAUDE_CACHE_TTL_SECONDS,
+            )
+        self.cache = cache
+        self.metrics = metrics or default_registry
+        self.rate_limiter = rate_limiter or get_shared_rate_limiter()
+        self.circuit_breaker = circuit_breaker or get_shared_circuit_breaker()
+        self.backoff_base = settings.CLAUDE_BACKOFF_BASE_SECONDS
+        self.backoff_cap = settings.CLAUDE_BACKOFF_CAP_SECONDS
+
+        self._async_client = None
+        self._semaphores = weakref.WeakKeyDictionary()
 
         self.total_input_tokens = 0
         self.total_output_tokens = 0
         self.request_count = 0
+        self.total_cache_read_tokens = 0
+        self.total_cache_write_tokens = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def async_client(self):
+        """Pooled async client for the running event loop, unless one was set explicitly"""
+        if self._async_client is not None:
+            return self._async_client
+        return get_async_client(self.api_key)
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        """Semaphore shared by every async call this service makes on the running event loop"""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    def _build_request(
+        self,
+        prompt: PromptContent,
+        max_tokens: Optional[int],
+        temperature: Optional[float],
+        system: Optional[PromptContent],
+    ) -> Dict[str, Any]:
+        request_params = {
+            "model": self.model,
+            "max_tokens": max_tokens or self.max_tokens,
+            "temperature": self.temperature if temperature is None else temperature,
+            "messages": [
+                {"role":"user", "content":prompt}
+            ]
+        }
+        if system is not None:
+            request_params["system"] = system
+        return request_params
+
+    def _cache_lookup(self, request_params: Dict[str, Any], use_cache: bool):
+        """Return (key, cached text); key is None when caching is off for this call"""
+        if self.cache is None or not use_cache:
+            return None, None
+        key = make_cache_key(
+            model=request_params["model"],
+            system=request_params.get("system"),
+            prompt=request_params["messages"][0]["content"],
+            temperature=request_params["temperature"],
+            max_tokens=request_params["max_tokens"],
+        )
+        cached = self.cache.get(key)
+        if cached is None:
+            self.cache_misses += 1
+        else:
+            self.cache_hits += 1
+        return key, cached
+
+    def _record_usage(self, response) -> None:
+        self.total_input_tokens += response.usage.input_tokens
+        self.total_output_tokens += response.usage.output_tokens
+        self.total_cache_read_tokens += getattr(response.usage, "cache_read_input_tokens", None) or 0
+        self.total_cache_write_tokens += getattr(response.usage, "cache_creation_input_tokens", None) or 0
+        self.request_count += 1
+
+    def _before_attempt(self, request_params: Dict[str, Any]) -> tuple:
+        """
+        Fail fast if the breaker is open.
+
+        Returns:
+            (token estimate to budget for, whether this attempt is the breaker's half-open trial)
+        """
+        trial = self.circuit_breaker.before_call()
+        return estimate_request_tokens(request_params), trial
+
+    def _abandon_attempt(self, trial: bool) -> None:
+        # Cancelled or closed before an outcome was known; the next call takes over the trial
+        if trial:
+            self.circuit_breaker.release_trial()
+
+    def _after_success(self, response, estimate: int) -> None:
+        self.circuit_breaker.record_success()
+        self.rate_limiter.settle(estimate, response.usage.input_tokens)
+        self._record_usage(response)
+
+    def _handle_failure(
+        self,
+        error: Exception,
+        backoff: DecorrelatedJitterBackoff,
+        attempt: int,
+        max_retries: int,
+        label: str,
+    ) -> float:
+        """
+        Decide what to do after a failed attempt.
+
+        Returns the delay before the next attempt, or raises ClaudeServiceError
+        when the error is not retryable or the retries are used up.
+        """
+        if not is_retryable(error):
+            # The API answered, so it is healthy even though the request was bad
+            self.circuit_breaker.record_success()
+            raise ClaudeServiceError(f"Claude API Error: {str(error)}") from error
+
+        self.circuit_breaker.record_failure()
+        if attempt >= max_retries - 1:
+            if isinstance(error, RateLimitError):
+                raise ClaudeServiceError(f"Rate limit exceeded after {max_retries} retries") from error
+            raise ClaudeServiceError(f"Connection failed after {max_retries} attempts") from error
+
+        retry_after = retry_after_seconds(error)
+        if isinstance(error, RateLimitError) and retry_after is not None:
+            # Every service sharing the limiter backs off, not just this one
+            self.rate_limiter.pause(retry_after)
+        wait_time = backoff.next_delay(retry_after)
+        logger.warning(
+            "%s on %s. Retrying in %.2fs, retry %s/%s",
+            type(error).__name__, label, wait_time, attempt + 1, max_retries
+        )
+        return wait_time
+
 
     def generate(
         self,
-        prompt:str,
+        prompt: PromptContent,
         max_tokens: Optional[int]=None,
         temperature: Optional[float]=None,
-        system: Optional[str]=None,
+        system: Optional[PromptContent]=None,
         max_retries: int =3,
+        use_cache: bool=True,
+        label: str="default",
+        cache_if: Optional[Callable[[str], bool]]=None,
+    ) -> str:
+        """
+        Generate a completion.
+
+        Args:
+            cache_if: Only responses for which it returns True are written
+                to the response cache, e.g. ones that pass validation
+        """
+        request_params = self._build_request(prompt, max_tokens, temperature, system)
+        backoff = DecorrelatedJitterBackoff(self.backoff_base, self.backoff_cap)
+
+        with self.metrics.track(label, self.model) as call:
+            cache_key, cached = self._cache_lookup(request_params, use_cache)
+            if cached is not None:
+                call.record.cached = True
+                return cached
+
+            for attempt in range(max_retries):
+                call.record.retries = attempt
+                estimate, trial = self._before_attempt(request_params)
+                try:
+                    self.rate_limiter.acquire(estimate)
+                    call.start()
+                    response = self.client.messages.create(**request_params)
+                    self._after_success(response, estimate)
+                    call.set_usage(response.usage)
+
+                    text = response.content[0].text
+                    if cache_key is not None and (cache_if is None or cache_if(text)):
+                        self.cache.set(cache_key, text)
+                    return text
+
+                except Exception as e:
+                    time.sleep(self._handle_failure(e, backoff, attempt, max_retries, label))
+                except BaseException:
+                    self._abandon_attempt(trial)
+                    raise
+            raise ClaudeServiceError("Failed to get response from Claude")
+
+    def generate_stream(
+        self,
+        prompt: PromptContent,
+        max_tokens: Optional[int]=None,
+        temperature: Optional[float]=None,
+        system: Optional[PromptContent]=None,
+        max_retries: int=3,
+        use_cache: bool=True,
+        label: str="default",
+    ) -> Iterator[str]:
+        """
+        Stream a completion, yielding text deltas as they arrive.
+
+        Retries only happen before the first delta is yielded; once text has
+        been handed to the caller a failure is raised instead of restarting.
+        A cached response is yielded as a single delta.
+
+        Args:
+            prompt: User prompt, a string or a list of content blocks
+            max_tokens: Overrides the configured max tokens
+            temperature: Overrides the configured temperature
+            system: Optional system prompt, a string or a list of system blocks
+            max_retries: Attempts before giving up on rate limit/connection errors
+            use_cache: Set False to bypass the response cache for this call
+            label: Call-site label used to group metrics
+        """
+        request_params = self._build_request(prompt, max_tokens, temperature, system)
+        backoff = DecorrelatedJitterBackoff(self.backoff_base, self.backoff_cap)
+
+        with self.metrics.track(label, self.model) as call:
+            cache_key, cached = self._cache_lookup(request_params, use_cache)
+            if cached is not None:
+                call.record.cached = True
+                call.first_token()
+                yield cached
+                return
+
+            for attempt in range(max_retries):
+                call.record.retries = attempt
+                estimate, trial = self._before_attempt(request_params)
+                chunks = []
+                try:
+                    self.rate_limiter.acquire(estimate)
+                    call.start()
+                    with self.client.messages.stream(**request_params) as stream:
+                        for text in stream.text_stream:
+                            call.first_token()
+                            chunks.append(text)
+                            yield text
+                        response = stream.get_final_message()
+                    self._after_success(response, estimate)
+                    call.set_usage(response.usage)
+
+                    if cache_key is not None:
+                        self.cache.set(cache_key, "".join(chunks))
+                    return
+
+                except Exception as e:
+                    if chunks:
+                        self.circuit_breaker.record_failure()
+                        raise ClaudeServiceError(f"Stream interrupted: {str(e)}") from e
+                    time.sleep(self._handle_failure(e, backoff, attempt, max_retries, label))
+                except BaseException:
+                    # Includes GeneratorExit when the consumer stops reading early
+                    self._abandon_attempt(trial)
+                    raise
+
+    def generate_json_stream(
+        self,
+        prompt: PromptContent,
+        max_tokens: Optional[int]=None,
+        max_retries: int=3,
+        use_cache: bool=True,
+        system: Optional[PromptContent]=None,
+        label: str="default"
+    ) -> Iterator[Any]:
+        """
+        Stream a JSON array response, yielding each element once it has parsed.
+
+        Lets callers persist or display quiz questions while the rest of the
+        array is still being generated.
+        """
+        parser = JSONArrayStreamParser()
+        for delta in self.generate_stream(
+            prompt,
+            max_tokens=max_tokens,
+            system=system,
+            max_retries=max_retries,
+            use_cache=use_cache,
+            label=label
+        ):
+            yield from parser.feed(delta)
+        if not parser.finished:
+            raise ValueError("Streamed response did not contain a complete JSON array")
+
+    async def agenerate(
+        self,
+        prompt: PromptContent,
+        max_tokens: Optional[int]=None,
+        temperature: Optional[float]=None,
+        system: Optional[PromptContent]=None,
+        max_retries: int=3,
+        timeout: Optional[float]=None,
+        use_cache: bool=True,
+        label: str="default",
+        cache_if: Optional[Callable[[str], bool]]=None,
     ) -> str:
-    
-        max_tokens = max_tokens or self.max_tokens
-        temperature = temperature or self.temperature
-
-        for attempt in range(max_retries):
-            try:
-                request_params = {
-                    "model": self.model,
-                    "max_tokens": max_tokens,
-                    "temperature": temperature,
-                    "messages": [
-                        {"role":"user", "content":prompt}
-                    ]
-                }
-                response = self.client.messages.create(**request_params)
-
-                self.total_input_tokens += response.usage.input_tokens
-                self.total_output_tokens += response.usage.output_tokens
-                self.request_count += 1
-
-                return response.content[0].text
-            
-            except RateLimitError as e:
-                if attempt <= max_retries -1:
-                    wait_time = (2 ** attempt)*1
-                    print(f"Rate limit hit. Waiting {wait_time} before retry {attempt}/{max_retries}")
-                    time.sleep(wait_time)
-                else:
-                    raise APIError(f"Rate limit exceeded after {max_retries} retries") from e
-            
-            except APIConnectionError as e:
-                if attempt <= max_retries -1:
-                    wait_time = (2 ** attempt) * 1
-                    print(f"Connection error. Retrying in {wait_time} minutes...attempt {attempt}/{max_retries}")
-                    time.sleep(wait_time)
-                else:
-                    raise APIError(f"Connection failed after {max_retries} attempts") from e
-            
-            except Exception as e:
-                raise APIError(f"Claude API Error: {str(e)}") from e
-        raise APIError("Failed to get response from Claude")
+        """
+        Async counterpart of generate.
+
+        Every call holds the service-wide semaphore while talking to the API,
+        so concurrent callers never exceed max_concurrency in-flight requests.
+
+        Args:
+            prompt: User prompt, a string or a list of content blocks
+            max_tokens: Overrides the configured max tokens
+            temperature: Overrides the configured temperature
+            system: Optional system prompt, a string or a list of system blocks
+            max_retries: Attempts before giving up on rate limit/connection errors
+            timeout: Seconds allowed per attempt, defaults to CLAUDE_REQUEST_TIMEOUT
+            use_cache: Set False to bypass the response cache for this call
+            label: Call-site label used to group metrics
+            cache_if: Only responses for which it returns True are written
+                to the response cache, e.g. ones that pass validation
+
+        Returns:
+            The text of the first content block
+        """
+        request_params = self._build_request(prompt, max_tokens, temperature, system)
+        timeout = timeout or self.request_timeout
+        backoff = DecorrelatedJitterBackoff(self.backoff_base, self.backoff_cap)
+
+        with self.metrics.track(label, self.model) as call:
+            cache_key, cached = self._cache_lookup(request_params, use_cache)
+            if cached is not None:
+                call.record.cached = True
+                return cached
+
+            for attempt in range(max_retries):
+                call.record.retries = attempt
+                estimate, trial = self._before_attempt(request_params)
+                try:
+                    await self.rate_limiter.aacquire(estimate)
+                    async with self.semaphore:
+                        # Rate-limiter and semaphore waits are queueing, not API latency
+                        call.start()
+                        response = await asyncio.wait_for(
+                            self.async_client.messages.create(**request_params),
+                            timeout=timeout
+                        )
+                    self._after_success(response, estimate)
+                    call.set_usage(response.usage)
+
+                    text = response.content[0].text
+                    if cache_key is not None and (cache_if is None or cache_if(text)):
+                        self.cache.set(cache_key, text)
+                    return text
+
+                except Exception as e:
+                    await asyncio.sleep(self._handle_failure(e, backoff, attempt, max_retries, label))
+                except BaseException:
+                    self._abandon_attempt(trial)
+                    raise
+            raise ClaudeServiceError("Failed to get response from Claude")
+
+    async def generate_many(
+        self,
+        prompts: List[PromptContent],
+        concurrency: Optional[int]=None,
+        timeout: Optional[float]=None,
+        **kwargs
+    ) -> List[GenerationResult]:
+        """
+        Run many prompts concurrently.
+
+        Args:
+            prompts: Prompts to send
+            concurrency: Cap for this batch; the service-wide semaphore still applies
+            timeout: Seconds allowed per attempt
+            **kwargs: Passed through to agenerate (max_tokens, temperature, system...)
+
+        Returns:
+            One GenerationResult per prompt, in input order
+        """
+        batch_semaphore = asyncio.Semaphore(concurrency or self.max_concurrency)
+
+        async def run(prompt: PromptContent) -> GenerationResult:
+            async with batch_semaphore:
+                try:
+                    text = await self.agenerate(prompt, timeout=timeout, **kwargs)
+                    return GenerationResult(prompt=prompt, text=text)
+                except Exception as e:
+                    return GenerationResult(prompt=prompt, error=e)
+
+        return await asyncio.gather(*(run(prompt) for prompt in prompts))
 
     def generate_json(
         self,
-        prompt: str,
+        prompt: PromptContent,
         max_tokens: Optional[int]=None,
-        max_retries: int=3
+        max_retries: int=3,
+        use_cache: bool=True,
+        system: Optional[PromptContent]=None,
+        label: str="default",
+        cache_if: Optional[Callable[[str], bool]]=None,
         ) -> Dict[str, Any]:
 
-        response_text = self.generate(prompt, max_tokens, max_retries)
-
-        cleaned = response_text.strip()
-
-        # Try to extract JSON from response
-        cleaned = response_text.strip()
-        
-        # Remove markdown code blocks if present
-        if cleaned.startswith("```json"):
-            cleaned = cleaned[7:] 
-        elif cleaned.startswith("```"):
-            cleaned = cleaned[3:]  
-        
-        if cleaned.endswith("```"):
-            cleaned = cleaned[:-3] 
-        
-        cleaned = cleaned.strip()
-        
-        try:
-            return json.loads(cleaned)
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Failed to parse JSON response: {str(e)}\nResponse: {cleaned[:200]}...")
+        response_text = self.generate(
+            prompt,
+            max_tokens=max_tokens,
+            system=system,
+            max_retries=max_retries,
+            use_cache=use_cache,
+            label=label,
+            cache_if=cache_if,
+        )
+
+        return parse_json_response(response_text)
 
 
 if __name__ == "__main__":
@@ -102,7 +545,7 @@ if __name__ == "__main__":
 
         print("="*50)
         print("Testing Claude Service")
-        
+
         response = claude.generate(
             prompt="Explain what machine learning is in one sentence",
             max_tokens=100
@@ -110,6 +553,6 @@ if __name__ == "__main__":
 
         print("Response", response)
         print("="*50)
-    
+
     except ValueError as e:
-        print(f"Error: {e}")
\ No newline at end of file
+        print(f"Error: {e}")
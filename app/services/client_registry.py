@@ -0,0 +1,145 @@
+import os
+import asyncio
+import threading
+import weakref
+from typing import Optional, Dict, Awaitable, TypeVar
+from anthropic import (
+    Anthropic,
+    AsyncAnthropic,
+    DefaultHttpxClient,
+    DefaultAsyncHttpxClient,
+    Timeout,
+    DEFAULT_CONNECTION_LIMITS,
+)
+from .config.settings import settings
+
+T = TypeVar("T")
+
+# The SDK's own HTTP client types, whichever httpx distribution it is built on
+Limits = type(DEFAULT_CONNECTION_LIMITS)
+
+_lock = threading.Lock()
+_pid = os.getpid()
+_clients: Dict[str, Anthropic] = {}
+# Async connection pools belong to the event loop that created them
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, AsyncAnthropic]]" = weakref.WeakKeyDictionary()
+
+
+def _limits() -> Limits:
+    return Limits(
+        max_connections=settings.CLAUDE_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.CLAUDE_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.CLAUDE_HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout() -> Timeout:
+    return Timeout(
+        settings.CLAUDE_REQUEST_TIMEOUT,
+        connect=settings.CLAUDE_HTTP_CONNECT_TIMEOUT,
+    )
+
+
+def _reset_after_fork() -> None:
+    """
+    Forget clients inherited from the parent process.
+
+    Their sockets and locks are shared with the parent, so the child builds
+    its own pool on first use. The inherited clients are dropped rather than
+    closed so the parent's connections stay intact.
+    """
+    global _lock, _pid
+    _lock = threading.Lock()
+    _pid = os.getpid()
+    _clients.clear()
+    _async_clients.clear()
+
+
+def _check_pid() -> None:
+    # Fallback for platforms without os.register_at_fork
+    if os.getpid() != _pid:
+        _reset_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_client(api_key: Optional[str]=None) -> Anthropic:
+    """
+    Process-wide sync client for an API key, with a pooled HTTP connection.
+
+    Retries are left to ClaudeService so the SDK does not retry underneath
+    the shared rate limiter: with the default CLAUDE_SDK_MAX_RETRIES of 0,
+    a pooled keep-alive connection that was reset surfaces as
+    APIConnectionError, which ClaudeService treats as retryable and retries
+    with backoff on a fresh connection.
+    """
+    _check_pid()
+    api_key = api_key or settings.ANTHROPIC_API_KEY
+    with _lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = Anthropic(
+                api_key=api_key,
+                max_retries=settings.CLAUDE_SDK_MAX_RETRIES,
+                timeout=_timeout(),
+                http_client=DefaultHttpxClient(limits=_limits(), timeout=_timeout()),
+            )
+            _clients[api_key] = client
+        return client
+
+
+def get_async_client(api_key: Optional[str]=None) -> AsyncAnthropic:
+    """
+    Async client for an API key, shared by everything running on the current event loop.
+    """
+    _check_pid()
+    api_key = api_key or settings.ANTHROPIC_API_KEY
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(api_key)
+        if client is None:
+            client = AsyncAnthropic(
+                api_key=api_key,
+                max_retries=settings.CLAUDE_SDK_MAX_RETRIES,
+                timeout=_timeout(),
+                http_client=DefaultAsyncHttpxClient(limits=_limits(), timeout=_timeout()),
+            )
+            clients[api_key] = client
+        return client
+
+
+def close_clients() -> None:
+    """Close the sync clients, e.g. on worker shutdown"""
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+async def shutdown_async_clients() -> None:
+    """Close the async clients bound to the running event loop"""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.pop(loop, {})
+    for client in clients.values():
+        await client.close()
+
+
+def run_sync(awaitable: Awaitable[T]) -> T:
+    """
+    asyncio.run for the synchronous wrappers of async services.
+
+    Every asyncio.run call has a new event loop and therefore new async
+    clients, so they are closed before the loop finishes rather than
+    leaving one connection pool behind per call.
+    """
+    async def main() -> T:
+        try:
+            return await awaitable
+        finally:
+            await shutdown_async_clients()
+
+    return asyncio.run(main())
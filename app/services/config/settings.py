@@ -1,5 +1,6 @@
 import os
 from dotenv import load_dotenv, find_dotenv
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 env_path = find_dotenv()
@@ -7,9 +8,54 @@ env_path = find_dotenv()
 load_dotenv(env_path)
 
 class Settings(BaseSettings):
-    ANTHROPIC_API_KEY: str = os.getenv("ANTHROPIC_API_KEY")
-    ANTHROPIC_MODEL: str = os.getenv("ANTHROPIC_MODEL")
-    MAX_TOKENS: int = os.getenv("MAX_TOKENS")
-    TEMPERATURE: float = os.getenv("TEMPERATURE")
+    ANTHROPIC_API_KEY: Optional[str] = os.getenv("ANTHROPIC_API_KEY")
+    ANTHROPIC_MODEL: Optional[str] = os.getenv("ANTHROPIC_MODEL")
+    MAX_TOKENS: Optional[int] = os.getenv("MAX_TOKENS")
+    TEMPERATURE: Optional[float] = os.getenv("TEMPERATURE")
+    CLAUDE_MAX_CONCURRENCY: int = os.getenv("CLAUDE_MAX_CONCURRENCY", 8)
+    CLAUDE_REQUEST_TIMEOUT: float = os.getenv("CLAUDE_REQUEST_TIMEOUT", 60.0)
+    CLAUDE_CACHE_ENABLED: bool = os.getenv("CLAUDE_CACHE_ENABLED", False)
+    CLAUDE_CACHE_PATH: Optional[str] = os.getenv("CLAUDE_CACHE_PATH")
+    CLAUDE_CACHE_MEMORY_ENTRIES: int = os.getenv("CLAUDE_CACHE_MEMORY_ENTRIES", 1024)
+    CLAUDE_CACHE_DISK_ENTRIES: int = os.getenv("CLAUDE_CACHE_DISK_ENTRIES", 100_000)
+    CLAUDE_CACHE_TTL_SECONDS: Optional[float] = os.getenv("CLAUDE_CACHE_TTL_SECONDS")
+    CLAUDE_INPUT_COST_PER_MTOK: float = os.getenv("CLAUDE_INPUT_COST_PER_MTOK", 3.0)
+    CLAUDE_OUTPUT_COST_PER_MTOK: float = os.getenv("CLAUDE_OUTPUT_COST_PER_MTOK", 15.0)
+    CLAUDE_CACHE_READ_COST_MULTIPLIER: float = os.getenv("CLAUDE_CACHE_READ_COST_MULTIPLIER", 0.1)
+    CLAUDE_CACHE_WRITE_COST_MULTIPLIER: float = os.getenv("CLAUDE_CACHE_WRITE_COST_MULTIPLIER", 1.25)
+    CLAUDE_METRICS_JSONL_PATH: Optional[str] = os.getenv("CLAUDE_METRICS_JSONL_PATH")
+    CLAUDE_METRICS_HOST: str = os.getenv("CLAUDE_METRICS_HOST", "127.0.0.1")
+    CLAUDE_REQUESTS_PER_MINUTE: float = os.getenv("CLAUDE_REQUESTS_PER_MINUTE", 50)
+    CLAUDE_TOKENS_PER_MINUTE: float = os.getenv("CLAUDE_TOKENS_PER_MINUTE", 40_000)
+    CLAUDE_BACKOFF_BASE_SECONDS: float = os.getenv("CLAUDE_BACKOFF_BASE_SECONDS", 1.0)
+    CLAUDE_BACKOFF_CAP_SECONDS: float = os.getenv("CLAUDE_BACKOFF_CAP_SECONDS", 60.0)
+    CLAUDE_BREAKER_FAILURE_THRESHOLD: int = os.getenv("CLAUDE_BREAKER_FAILURE_THRESHOLD", 5)
+    CLAUDE_BREAKER_RESET_SECONDS: float = os.getenv("CLAUDE_BREAKER_RESET_SECONDS", 30.0)
+    CLAUDE_HTTP_MAX_CONNECTIONS: int = os.getenv("CLAUDE_HTTP_MAX_CONNECTIONS", 100)
+    CLAUDE_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = os.getenv("CLAUDE_HTTP_MAX_KEEPALIVE_CONNECTIONS", 20)
+    CLAUDE_HTTP_KEEPALIVE_EXPIRY: float = os.getenv("CLAUDE_HTTP_KEEPALIVE_EXPIRY", 30.0)
+    CLAUDE_HTTP_CONNECT_TIMEOUT: float = os.getenv("CLAUDE_HTTP_CONNECT_TIMEOUT", 5.0)
+    CLAUDE_SDK_MAX_RETRIES: int = os.getenv("CLAUDE_SDK_MAX_RETRIES", 0)
+
+    DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///:memory:")
+    DATABASE_ECHO: bool = os.getenv("DATABASE_ECHO", False)
+    DATABASE_POOL_SIZE: int = os.getenv("DATABASE_POOL_SIZE", 10)
+    DATABASE_MAX_OVERFLOW: int = os.getenv("DATABASE_MAX_OVERFLOW", 20)
+    DATABASE_POOL_PRE_PING: bool = os.getenv("DATABASE_POOL_PRE_PING", True)
+    DATABASE_POOL_RECYCLE_SECONDS: int = os.getenv("DATABASE_POOL_RECYCLE_SECONDS", 1800)
+    SQLITE_BUSY_TIMEOUT_MS: int = os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000)
+    SQLITE_MMAP_SIZE: int = os.getenv("SQLITE_MMAP_SIZE", 268_435_456)
+    BULK_BATCH_SIZE: int = os.getenv("BULK_BATCH_SIZE", 5000)
+
+    FETCH_MAX_CONCURRENCY: int = os.getenv("FETCH_MAX_CONCURRENCY", 64)
+    FETCH_MAX_PER_HOST: int = os.getenv("FETCH_MAX_PER_HOST", 4)
+    FETCH_TIMEOUT_SECONDS: float = os.getenv("FETCH_TIMEOUT_SECONDS", 30.0)
+    FETCH_CONNECT_TIMEOUT_SECONDS: float = os.getenv("FETCH_CONNECT_TIMEOUT_SECONDS", 5.0)
+    FETCH_MAX_BYTES: int = os.getenv("FETCH_MAX_BYTES", 50_000_000)
+    FETCH_USER_AGENT: str = os.getenv("FETCH_USER_AGENT", "pathfinder-fetcher/1.0")
+
+    BLOB_STORE_PATH: Optional[str] = os.getenv("BLOB_STORE_PATH")
+    BLOB_THRESHOLD_BYTES: int = os.getenv("BLOB_THRESHOLD_BYTES", 1_000_000)
+    BLOB_PRUNE_GRACE_SECONDS: int = os.getenv("BLOB_PRUNE_GRACE_SECONDS", 3600)
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,169 @@
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Optional, List, Tuple, Iterable, Iterator
+from sqlalchemy import select, update, and_, or_, false
+from sqlalchemy.orm import contains_eager
+from ..models import Schedule, LearningResource
+from ..models.schedule_model import day_start
+
+# (scheduled_date, schedule id) of the last row on a page
+DeliveryCursor = Tuple[datetime, int]
+
+
+@dataclass(frozen=True)
+class DeliveryItem:
+    """One undelivered schedule row with the resource fields a notification needs"""
+    schedule_id: int
+    learning_resource_id: int
+    scheduled_date: datetime
+    title: str
+    resource_type: str
+    url: Optional[str]
+    is_overdue: bool
+
+
+@dataclass
+class DeliveryPage:
+    """A page of deliveries; pass next_cursor back as after to fetch the next page"""
+    items: List[DeliveryItem]
+    next_cursor: Optional[DeliveryCursor]
+
+
+def _pending_window(day: date, include_overdue: bool):
+    """Undelivered rows up to the end of day, matching ix_schedules_delivery"""
+    conditions = [
+        Schedule.delivered == false(),
+        Schedule.scheduled_date < day_start(day + timedelta(days=1)),
+    ]
+    if not include_overdue:
+        conditions.append(Schedule.scheduled_date >= day_start(day))
+    return conditions
+
+
+def _after(cursor: Optional[DeliveryCursor]):
+    if cursor is None:
+        return None
+    scheduled_date, schedule_id = cursor
+    return or_(
+        Schedule.scheduled_date > scheduled_date,
+        and_(Schedule.scheduled_date == scheduled_date, Schedule.id > schedule_id),
+    )
+
+
+def get_due_deliveries(
+    session,
+    day: Optional[date]=None,
+    limit: int=100,
+    after: Optional[DeliveryCursor]=None,
+    include_overdue: bool=True,
+) -> DeliveryPage:
+    """
+    Undelivered items scheduled for day, plus overdue ones, oldest first.
+
+    Walks ix_schedules_delivery with keyset pagination, so each page costs
+    the same regardless of how deep it is, and joins the resource title,
+    type and URL in the same query without loading ORM objects.
+
+    Args:
+        session: Active session
+        day: Delivery day, defaults to today
+        limit: Maximum items per page
+        after: next_cursor from the previous page
+        include_overdue: Also return items scheduled before day
+
+    Returns:
+        DeliveryPage with next_cursor None on the last page
+    """
+    day = day or date.today()
+    stmt = (
+        select(
+            Schedule.id,
+            Schedule.learning_resource_id,
+            Schedule.scheduled_date,
+            LearningResource.title,
+            LearningResource.resource_type,
+            LearningResource.url,
+        )
+        .join(LearningResource, LearningResource.id == Schedule.learning_resource_id)
+        .where(*_pending_window(day, include_overdue))
+        .order_by(Schedule.scheduled_date, Schedule.id)
+        .limit(limit)
+    )
+    keyset = _after(after)
+    if keyset is not None:
+        stmt = stmt.where(keyset)
+
+    start = day_start(day)
+    items = [
+        DeliveryItem(*row, is_overdue=row.scheduled_date < start)
+        for row in session.execute(stmt)
+    ]
+    next_cursor = (items[-1].scheduled_date, items[-1].schedule_id) if len(items) == limit else None
+    return DeliveryPage(items, next_cursor)
+
+
+def iter_due_deliveries(
+    session,
+    day: Optional[date]=None,
+    page_size: int=1000,
+    include_overdue: bool=True,
+) -> Iterator[DeliveryItem]:
+    """Yield every due item page by page, holding one page in memory at a time"""
+    cursor = None
+    while True:
+        page = get_due_deliveries(session, day, page_size, cursor, include_overdue)
+        yield from page.items
+        if page.next_cursor is None:
+            return
+        cursor = page.next_cursor
+
+
+def get_daily_resources(
+    session,
+    day: Optional[date]=None,
+    limit: int=100,
+    after: Optional[DeliveryCursor]=None,
+    include_overdue: bool=True,
+) -> List[Schedule]:
+    """
+    Same window and ordering as get_due_deliveries, as Schedule objects.
+
+    learning_resource is populated from the join with only title,
+    resource_type and url loaded, so touching it issues no extra queries.
+    """
+    day = day or date.today()
+    stmt = (
+        select(Schedule)
+        .join(Schedule.learning_resource)
+        .options(
+            contains_eager(Schedule.learning_resource).load_only(
+                LearningResource.title, LearningResource.resource_type, LearningResource.url
+            )
+        )
+        .where(*_pending_window(day, include_overdue))
+        .order_by(Schedule.scheduled_date, Schedule.id)
+        .limit(limit)
+    )
+    keyset = _after(after)
+    if keyset is not None:
+        stmt = stmt.where(keyset)
+    return list(session.scalars(stmt))
+
+
+def mark_delivered(session, schedule_ids: Iterable[int], delivered_at: Optional[datetime]=None) -> int:
+    """
+    Mark many schedules delivered with one UPDATE; the caller commits.
+
+    Returns:
+        Number of rows updated
+    """
+    schedule_ids = list(schedule_ids)
+    if not schedule_ids:
+        return 0
+    result = session.execute(
+        update(Schedule)
+        .where(Schedule.id.in_(schedule_ids), Schedule.delivered == false())
+        .values(delivered=True, delivered_at=delivered_at or datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
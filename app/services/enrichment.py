@@ -0,0 +1,219 @@
+from typing import Optional, List, Dict, Any, Tuple
+from sqlalchemy.orm import object_session
+from .claude_service import ClaudeService, resource_system_blocks, parse_json_response
+from ..models.learning_resource_model import stored_content_hash
+from .quiz_pipeline import question_from_dict
+from .question_dedup import QuestionSimilarityIndex
+from .enrichment_store import get_enrichment, save_enrichment, apply_enrichment
+from .blob_store import load_resource_text
+
+DIFFICULTY_LEVELS = ("beginner", "intermediate", "advanced")
+QUESTION_TYPES = ("multiple_choice", "true_false", "short_answer")
+QUESTION_REQUIRED_KEYS = ("question_type", "question_text", "correct_answer", "explanation", "difficulty", "concept_tested")
+
+FIELD_DESCRIPTIONS = {
+    "summary": "summary: string, a summary of the resource in at most 200 words",
+    "key_concepts": "key_concepts: list of strings, the main concepts as short phrases",
+    "difficulty": "difficulty: one of beginner, intermediate, advanced",
+    "estimated_time_mins": "estimated_time_mins: integer, minutes a learner needs to work through the resource",
+    "quiz_questions": (
+        "quiz_questions: list of {num_questions} objects with the keys question_type "
+        "(multiple_choice, true_false or short_answer), question_text, correct_answer, "
+        "options (list of choices, or null), explanation, difficulty and concept_tested"
+    ),
+}
+
+ENRICHMENT_PROMPT = """Analyze the {resource_type} "{title}" above for a learner.
+
+Return only a JSON object with exactly these keys:
+{fields}"""
+
+FOLLOWUP_PROMPT = """Your previous answer was missing or had invalid values for some fields.
+Analyze the {resource_type} "{title}" above again and return only a JSON object with exactly these keys:
+{fields}"""
+
+
+def _valid_question(question: Any) -> bool:
+    if not isinstance(question, dict):
+        return False
+    if any(not question.get(key) for key in QUESTION_REQUIRED_KEYS):
+        return False
+    return question["question_type"] in QUESTION_TYPES
+
+
+def validate_enrichment(data: Any, fields: List[str]) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Check an enrichment response against the schema.
+
+    Args:
+        data: Parsed JSON response
+        fields: Fields that were requested
+
+    Returns:
+        (valid fields, names of fields that are missing or invalid)
+    """
+    if not isinstance(data, dict):
+        return {}, list(fields)
+
+    valid = {}
+    for name in fields:
+        value = data.get(name)
+        if name == "summary":
+            ok = isinstance(value, str) and bool(value.strip())
+        elif name == "key_concepts":
+            ok = isinstance(value, list) and bool(value) and all(isinstance(item, str) for item in value)
+        elif name == "difficulty":
+            ok = isinstance(value, str) and value.lower() in DIFFICULTY_LEVELS
+            value = value.lower() if ok else value
+        elif name == "estimated_time_mins":
+            ok = isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0
+            value = int(round(value)) if ok else value
+        elif name == "quiz_questions":
+            ok = isinstance(value, list) and bool(value) and all(_valid_question(q) for q in value)
+        else:
+            ok = value is not None
+        if ok:
+            valid[name] = value
+
+    return valid, [name for name in fields if name not in valid]
+
+
+class ResourceEnricher:
+    """
+    Fills every enrichment field of a LearningResource in one Claude call.
+
+    The resource content is sent as a cacheable system prefix, so when the
+    response is partial the follow-up call that re-asks for only the
+    missing fields reads the content from the prompt cache.
+
+    Args:
+        claude: ClaudeService used for the calls
+        max_followups: Re-asks allowed for missing or invalid fields
+        dedup_index: QuestionSimilarityIndex that enrich_resource checks its
+            questions against; a fresh index is used when None
+        dedup: Set False to return every generated question
+    """
+
+    def __init__(
+        self,
+        claude: ClaudeService,
+        max_followups: int=2,
+        dedup_index: Optional[QuestionSimilarityIndex]=None,
+        dedup: bool=True,
+    ):
+        self.claude = claude
+        self.max_followups = max_followups
+        self.dedup_index = (dedup_index or QuestionSimilarityIndex()) if dedup else None
+
+    def enrich(
+        self,
+        title: str,
+        content: str,
+        resource_type: Optional[str]=None,
+        num_questions: int=0,
+    ) -> Dict[str, Any]:
+        """
+        Generate summary, key_concepts, difficulty, estimated_time_mins and,
+        when num_questions > 0, quiz_questions.
+
+        Returns:
+            dict holding every requested field
+
+        Raises:
+            ValueError: if fields are still missing after the follow-ups
+        """
+        fields = ["summary", "key_concepts", "difficulty", "estimated_time_mins"]
+        if num_questions > 0:
+            fields.append("quiz_questions")
+
+        system = resource_system_blocks(content)
+        resource_type = resource_type or "resource"
+        result: Dict[str, Any] = {}
+        missing = fields
+        template = ENRICHMENT_PROMPT
+
+        def complete(text: str) -> bool:
+            # Only a response holding every field is worth caching; a partial
+            # one would be served again and pay for the follow-ups every time
+            try:
+                return not validate_enrichment(parse_json_response(text), fields)[1]
+            except ValueError:
+                return False
+
+        for _ in range(self.max_followups + 1):
+            prompt = template.format(
+                resource_type=resource_type,
+                title=title,
+                fields=self._describe(missing, num_questions),
+            )
+            try:
+                data = self.claude.generate_json(
+                    prompt,
+                    system=system,
+                    label="enrich",
+                    use_cache=template is ENRICHMENT_PROMPT,
+                    cache_if=complete,
+                )
+            except ValueError:
+                data = {}
+            valid, missing = validate_enrichment(data, missing)
+            result.update(valid)
+            if not missing:
+                return result
+            template = FOLLOWUP_PROMPT
+
+        raise ValueError(f"Enrichment for '{title}' is missing fields: {', '.join(missing)}")
+
+    def enrich_resource(self, resource, num_questions: int=0, session=None) -> list:
+        """
+        Enrich a LearningResource in place with a single update_learning_resource call.
+
+        When the resource's content was enriched before, the stored result
+        from content_enrichments is reused without calling Claude; a fresh
+        result is stored there for the next copy. Pass session for a
+        resource that is not attached to one.
+
+        Questions that are near-duplicates of the resource's stored
+        questions, or of ones returned by an earlier call, are dropped.
+
+        Returns:
+            Unsaved QuizQuestion instances for the generated questions
+        """
+        session = session or object_session(resource)
+        content_hash = resource.content_hash or stored_content_hash(resource.content, resource.url, resource.file_path)
+        resource.content_hash = content_hash
+        if session is not None and content_hash:
+            stored = get_enrichment(session, content_hash)
+            if stored is not None and stored.summary and stored.question_count >= num_questions:
+                return self._dedup(session, resource, apply_enrichment(resource, stored, num_questions))
+
+        result = self.enrich(
+            resource.title,
+            load_resource_text(resource),
+            resource_type=resource.resource_type,
+            num_questions=num_questions,
+        )
+        resource.update_learning_resource(
+            summary=result["summary"],
+            key_concepts=result["key_concepts"],
+            difficulty=result["difficulty"],
+            estimated_time_mins=result["estimated_time_mins"],
+        )
+        if session is not None and content_hash:
+            save_enrichment(session, content_hash, result)
+        questions = [question_from_dict(resource.id, data) for data in result.get("quiz_questions", [])]
+        return self._dedup(session, resource, questions)
+
+    def _dedup(self, session, resource, questions: list) -> list:
+        if self.dedup_index is None or not questions:
+            return questions
+        if session is not None and resource.id is not None:
+            self.dedup_index.load(session, [resource.id])
+        return self.dedup_index.filter_new(questions)[0]
+
+    @staticmethod
+    def _describe(fields: List[str], num_questions: int) -> str:
+        return "\n".join(
+            "- " + FIELD_DESCRIPTIONS[name].format(num_questions=num_questions)
+            for name in fields
+        )
@@ -0,0 +1,158 @@
+from typing import Optional, List, Dict, Any, Iterable
+from sqlalchemy import select, update, insert, bindparam, exists, func
+from sqlalchemy.dialects import sqlite, postgresql
+from sqlalchemy.exc import IntegrityError
+from ..models import LearningResource, Module, QuizQuestion, ContentEnrichment
+from .bulk_loader import BulkLoader
+from .quiz_pipeline import question_from_dict
+
+ENRICHMENT_FIELDS = ("summary", "key_concepts", "difficulty", "estimated_time_mins")
+
+
+def get_enrichment(session, content_hash: Optional[str]) -> Optional[ContentEnrichment]:
+    """Stored enrichment for a content hash, if any"""
+    if not content_hash:
+        return None
+    return session.scalar(select(ContentEnrichment).where(ContentEnrichment.content_hash == content_hash))
+
+
+def save_enrichment(session, content_hash: str, result: Dict[str, Any]) -> ContentEnrichment:
+    """
+    Store an enrichment result under content_hash; the caller commits.
+
+    An existing entry is updated, keeping its questions unless the new
+    result has more. That includes an entry another transaction stored
+    while this result was generated: the insert skips the conflicting
+    row and the result is merged into it instead of failing on the
+    unique content_hash.
+    """
+    enrichment = get_enrichment(session, content_hash)
+    questions = result.get("quiz_questions") or None
+    if enrichment is None:
+        values = dict(
+            content_hash=content_hash,
+            quiz_questions_json=questions,
+            **{name: result.get(name) for name in ENRICHMENT_FIELDS},
+        )
+        inserted = _insert_if_absent(session, values)
+        enrichment = get_enrichment(session, content_hash)
+        if inserted:
+            return enrichment
+
+    for name in ENRICHMENT_FIELDS:
+        if result.get(name) is not None:
+            setattr(enrichment, name, result[name])
+    if questions and len(questions) > enrichment.question_count:
+        enrichment.quiz_questions_json = questions
+    return enrichment
+
+
+def _insert_if_absent(session, values: Dict[str, Any]) -> bool:
+    """Insert an enrichment row unless its content_hash exists; True when inserted"""
+    table = ContentEnrichment.__table__
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        stmt = sqlite.insert(table).on_conflict_do_nothing(index_elements=["content_hash"])
+    elif dialect == "postgresql":
+        stmt = postgresql.insert(table).on_conflict_do_nothing(index_elements=["content_hash"])
+    else:
+        try:
+            with session.begin_nested():
+                session.execute(insert(table).values(**values))
+            return True
+        except IntegrityError:
+            return False
+    return session.execute(stmt.values(**values)).rowcount > 0
+
+
+def apply_enrichment(resource: LearningResource, enrichment: ContentEnrichment, num_questions: int=0) -> List[QuizQuestion]:
+    """
+    Copy a stored enrichment onto a resource.
+
+    Returns:
+        Unsaved QuizQuestion instances, at most num_questions of them
+    """
+    resource.update_learning_resource(**{name: getattr(enrichment, name) for name in ENRICHMENT_FIELDS})
+    stored = (enrichment.quiz_questions_json or [])[:num_questions]
+    return [question_from_dict(resource.id, data) for data in stored]
+
+
+def inherit_enrichments(
+    session,
+    learning_path_id: Optional[int]=None,
+    resource_ids: Optional[Iterable[int]]=None,
+    with_questions: bool=True,
+) -> int:
+    """
+    Give every unenriched resource whose content is already known its stored enrichment.
+
+    BulkLoader.load_learning_resources and refresh_resources run it for
+    every batch they write; call it directly after resources arrive any
+    other way. Matching resources are found with one join on content_hash,
+    updated with a single executemany UPDATE and, when they have no
+    questions yet, get copies of the stored quiz questions through
+    BulkLoader. No model calls are made; the caller commits.
+
+    Args:
+        session: Active session
+        learning_path_id: Only resources in this path
+        resource_ids: Only these resources
+        with_questions: Also copy stored quiz questions
+
+    Returns:
+        Number of resources that inherited an enrichment
+    """
+    stmt = (
+        select(
+            LearningResource.id,
+            ContentEnrichment.summary,
+            ContentEnrichment.key_concepts,
+            ContentEnrichment.difficulty,
+            ContentEnrichment.estimated_time_mins,
+            ContentEnrichment.quiz_questions_json,
+        )
+        .join(ContentEnrichment, ContentEnrichment.content_hash == LearningResource.content_hash)
+        .where(LearningResource.summary.is_(None))
+    )
+    if learning_path_id is not None:
+        stmt = stmt.join(Module, Module.id == LearningResource.module_id).where(
+            Module.learning_path_id == learning_path_id
+        )
+    if resource_ids is not None:
+        stmt = stmt.where(LearningResource.id.in_(list(resource_ids)))
+    rows = session.execute(stmt).all()
+    if not rows:
+        return 0
+
+    table = LearningResource.__table__
+    session.execute(
+        update(table)
+        .where(table.c.id == bindparam("resource_id"))
+        .values(
+            updated_at=func.now(),
+            **{name: bindparam(f"new_{name}") for name in ENRICHMENT_FIELDS},
+        ),
+        [
+            {"resource_id": row.id, **{f"new_{name}": getattr(row, name) for name in ENRICHMENT_FIELDS}}
+            for row in rows
+        ],
+    )
+
+    if with_questions:
+        with_stored = {row.id: row.quiz_questions_json for row in rows if row.quiz_questions_json}
+        has_questions = set(session.scalars(
+            select(LearningResource.id)
+            .where(LearningResource.id.in_(list(with_stored)))
+            .where(exists().where(QuizQuestion.learning_resource_id == LearningResource.id))
+        )) if with_stored else set()
+        question_rows = (
+            {
+                column: getattr(question, column)
+                for column in ("learning_resource_id", "question_type", "question_text", "correct_answer",
+                               "explanation", "difficulty", "concept_tested", "options_json")
+            }
+            for resource_id, stored in with_stored.items() if resource_id not in has_questions
+            for question in (question_from_dict(resource_id, data) for data in stored)
+        )
+        BulkLoader(session, commit_every_batch=False).load_quiz_questions(question_rows)
+    return len(rows)
@@ -0,0 +1,107 @@
+import json
+from typing import Any, List
+
+
+class JSONArrayStreamParser:
+    """
+    Incremental parser for a JSON array arriving in text fragments.
+
+    Feed it text as it streams in and it returns every array element that
+    has been fully received so far. Anything before the opening bracket,
+    such as a markdown code fence, and anything after the closing bracket
+    is ignored.
+
+    Example:
+        parser = JSONArrayStreamParser()
+        for delta in deltas:
+            for question in parser.feed(delta):
+                save(question)
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._element_start = None
+
+    @property
+    def finished(self) -> bool:
+        """True once the closing bracket of the top-level array has been seen"""
+        return self._finished
+
+    def feed(self, text: str) -> List[Any]:
+        """
+        Add a text fragment.
+
+        Returns:
+            Elements completed by this fragment, in order
+        """
+        if self._finished:
+            return []
+        self._buffer += text
+        elements = []
+
+        while self._pos < len(self._buffer):
+            char = self._buffer[self._pos]
+
+            if not self._started:
+                if char == "[":
+                    self._started = True
+                self._pos += 1
+                continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+                self._mark_element_start()
+            elif char in "[{":
+                self._mark_element_start()
+                self._depth += 1
+            elif char in "]}":
+                if self._depth == 0:
+                    self._emit(elements)
+                    self._finished = True
+                    break
+                self._depth -= 1
+            elif char == "," and self._depth == 0:
+                self._emit(elements)
+            elif not char.isspace():
+                self._mark_element_start()
+
+            self._pos += 1
+
+        self._compact()
+        return elements
+
+    def _mark_element_start(self) -> None:
+        if self._depth == 0 and self._element_start is None:
+            self._element_start = self._pos
+
+    def _emit(self, elements: List[Any]) -> None:
+        if self._element_start is None:
+            return
+        raw = self._buffer[self._element_start:self._pos]
+        self._element_start = None
+        try:
+            elements.append(json.loads(raw))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Failed to parse streamed JSON element: {str(e)}\nElement: {raw[:200]}...")
+
+    def _compact(self) -> None:
+        # Drop text that can no longer be part of an element
+        cut = self._pos if self._element_start is None else self._element_start
+        if cut:
+            self._buffer = self._buffer[cut:]
+            self._pos -= cut
+            if self._element_start is not None:
+                self._element_start -= cut
@@ -0,0 +1,316 @@
+import json
+import time
+import bisect
+import logging
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field, asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, List, Dict, Any
+from .config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers cache hits through long quiz generations
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80, 160)
+
+
+def estimate_cost(
+    input_tokens: int,
+    output_tokens: int,
+    cache_read_tokens: int=0,
+    cache_write_tokens: int=0,
+) -> float:
+    """
+    Estimated USD cost of one call from the per-million-token rates in settings.
+
+    Cache reads and writes are priced as multiples of the input rate.
+    """
+    input_rate = settings.CLAUDE_INPUT_COST_PER_MTOK / 1_000_000
+    output_rate = settings.CLAUDE_OUTPUT_COST_PER_MTOK / 1_000_000
+    return (
+        input_tokens * input_rate
+        + output_tokens * output_rate
+        + cache_read_tokens * input_rate * settings.CLAUDE_CACHE_READ_COST_MULTIPLIER
+        + cache_write_tokens * input_rate * settings.CLAUDE_CACHE_WRITE_COST_MULTIPLIER
+    )
+
+
+@dataclass
+class CallRecord:
+    """Metrics for a single Claude call"""
+    label: str
+    model: str
+    started_at: float
+    # The last attempt's request alone, and the whole call including
+    # rate-limit and semaphore queueing, earlier attempts and backoff
+    latency_secs: float = 0.0
+    total_latency_secs: float = 0.0
+    time_to_first_token_secs: Optional[float] = None
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+    retries: int = 0
+    cached: bool = False
+    cost_usd: float = 0.0
+    error: Optional[str] = None
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th quantile"""
+        if self.count == 0:
+            return None
+        target = q * self.count
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            if running >= target:
+                return bound
+        return float("inf")
+
+    def cumulative(self) -> List[tuple]:
+        running = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            running += count
+            pairs.append((bound, running))
+        return pairs
+
+
+@dataclass
+class LabelStats:
+    """Aggregated metrics for one call-site label"""
+    calls: int = 0
+    errors: int = 0
+    cache_hits: int = 0
+    retries: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+    cost_usd: float = 0.0
+    latency: Histogram = field(default_factory=Histogram)
+    total_latency: Histogram = field(default_factory=Histogram)
+    time_to_first_token: Histogram = field(default_factory=Histogram)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "cache_hits": self.cache_hits,
+            "retries": self.retries,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cache_read_tokens": self.cache_read_tokens,
+            "cache_write_tokens": self.cache_write_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+            "latency_p50_secs": self.latency.quantile(0.5),
+            "latency_p95_secs": self.latency.quantile(0.95),
+            "total_latency_p50_secs": self.total_latency.quantile(0.5),
+            "total_latency_p95_secs": self.total_latency.quantile(0.95),
+            "ttft_p50_secs": self.time_to_first_token.quantile(0.5),
+        }
+
+
+class MetricsExporter(ABC):
+    """Receives every CallRecord as it is recorded"""
+
+    @abstractmethod
+    def export(self, record: CallRecord) -> None:
+        """Handle one record; exceptions are logged and do not fail the call"""
+
+
+class JSONLinesExporter(MetricsExporter):
+    """Appends one JSON object per call to a file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, record: CallRecord) -> None:
+        line = json.dumps(asdict(record))
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+
+
+class MetricsRegistry:
+    """
+    Thread-safe aggregation of CallRecords by label, plus fan-out to exporters.
+    """
+
+    def __init__(self, exporters: Optional[List[MetricsExporter]]=None):
+        self.exporters = list(exporters or [])
+        self._stats: Dict[str, LabelStats] = {}
+        self._lock = threading.Lock()
+
+    def add_exporter(self, exporter: MetricsExporter) -> None:
+        self.exporters.append(exporter)
+
+    def record(self, record: CallRecord) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(record.label, LabelStats())
+            stats.calls += 1
+            stats.errors += record.error is not None
+            stats.cache_hits += record.cached
+            stats.retries += record.retries
+            stats.input_tokens += record.input_tokens
+            stats.output_tokens += record.output_tokens
+            stats.cache_read_tokens += record.cache_read_tokens
+            stats.cache_write_tokens += record.cache_write_tokens
+            stats.cost_usd += record.cost_usd
+            stats.latency.observe(record.latency_secs)
+            stats.total_latency.observe(record.total_latency_secs)
+            if record.time_to_first_token_secs is not None:
+                stats.time_to_first_token.observe(record.time_to_first_token_secs)
+
+        for exporter in self.exporters:
+            try:
+                exporter.export(record)
+            except Exception:
+                logger.exception("Metrics exporter %r failed", exporter)
+
+    def track(self, label: str, model: str) -> "CallTracker":
+        return CallTracker(self, label, model)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Per-label summary suitable for logging or a JSON endpoint"""
+        with self._lock:
+            return {label: stats.to_dict() for label, stats in self._stats.items()}
+
+    def render_prometheus(self) -> str:
+        """Current metrics in the Prometheus text exposition format"""
+        lines = []
+        counters = (
+            ("calls", "Claude calls"),
+            ("errors", "Claude calls that failed after retries"),
+            ("cache_hits", "Claude calls served from the response cache"),
+            ("retries", "Claude call retries"),
+            ("input_tokens", "Input tokens"),
+            ("output_tokens", "Output tokens"),
+            ("cache_read_tokens", "Prompt-cache read tokens"),
+            ("cache_write_tokens", "Prompt-cache write tokens"),
+            ("cost_usd", "Estimated cost in USD"),
+        )
+        with self._lock:
+            for name, help_text in counters:
+                metric = f"claude_{name}_total"
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} counter")
+                for label, stats in self._stats.items():
+                    lines.append(f'{metric}{{label="{label}"}} {getattr(stats, name)}')
+
+            histograms = (
+                ("latency_seconds", "latency"),
+                ("total_latency_seconds", "total_latency"),
+                ("time_to_first_token_seconds", "time_to_first_token"),
+            )
+            for name, attr in histograms:
+                metric = f"claude_{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                for label, stats in self._stats.items():
+                    histogram = getattr(stats, attr)
+                    for bound, count in histogram.cumulative():
+                        le = "+Inf" if bound == float("inf") else bound
+                        lines.append(f'{metric}_bucket{{label="{label}",le="{le}"}} {count}')
+                    lines.append(f'{metric}_sum{{label="{label}"}} {histogram.sum}')
+                    lines.append(f'{metric}_count{{label="{label}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+class CallTracker:
+    """
+    Context manager that times one call and records it on exit.
+
+    Callers fill in usage, retries and first-token time as the call
+    progresses; an exception leaving the block is recorded as an error.
+    latency_secs runs from the last start() and total_latency_secs from
+    entering the block.
+    """
+
+    def __init__(self, registry: MetricsRegistry, label: str, model: str):
+        self.registry = registry
+        self.record = CallRecord(label=label, model=model, started_at=time.time())
+        self._entered = None
+        self._start = None
+
+    def __enter__(self) -> "CallTracker":
+        self._entered = self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        now = time.perf_counter()
+        self.record.latency_secs = now - self._start
+        self.record.total_latency_secs = now - self._entered
+        if exc is not None:
+            self.record.error = f"{exc_type.__name__}: {exc}"
+        self.registry.record(self.record)
+
+    def start(self) -> None:
+        """Restart the attempt clock once queueing is over, so latency and first-token time cover only the request"""
+        self._start = time.perf_counter()
+
+    def first_token(self) -> None:
+        if self.record.time_to_first_token_secs is None:
+            self.record.time_to_first_token_secs = time.perf_counter() - self._start
+
+    def set_usage(self, usage) -> None:
+        record = self.record
+        record.input_tokens = usage.input_tokens
+        record.output_tokens = usage.output_tokens
+        record.cache_read_tokens = getattr(usage, "cache_read_input_tokens", None) or 0
+        record.cache_write_tokens = getattr(usage, "cache_creation_input_tokens", None) or 0
+        record.cost_usd = estimate_cost(
+            record.input_tokens,
+            record.output_tokens,
+            record.cache_read_tokens,
+            record.cache_write_tokens,
+        )
+
+
+def start_prometheus_server(registry: MetricsRegistry, port: int, host: Optional[str]=None) -> ThreadingHTTPServer:
+    """
+    Serve registry.render_prometheus() at /metrics from a daemon thread.
+
+    Binds to CLAUDE_METRICS_HOST, loopback by default, unless host is given;
+    set it to 0.0.0.0 only where the port is not reachable from outside.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host or settings.CLAUDE_METRICS_HOST, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# Shared by every ClaudeService that is not given its own registry
+default_registry = MetricsRegistry()
+if settings.CLAUDE_METRICS_JSONL_PATH:
+    default_registry.add_exporter(JSONLinesExporter(settings.CLAUDE_METRICS_JSONL_PATH))
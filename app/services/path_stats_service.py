@@ -0,0 +1,67 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, List
+from sqlalchemy import select, func, case, distinct
+from ..models import LearningPath, Module, LearningResource, ResourceProgress
+
+
+@dataclass
+class PathStats:
+    """Aggregate counts for one learning path"""
+    module_count: int = 0
+    total_resources: int = 0
+    completed_resources: int = 0
+
+    @property
+    def percent_complete(self) -> float:
+        """Completed resources as a float between 0 and 100"""
+        if not self.total_resources:
+            return 0.0
+        return round(100.0 * self.completed_resources / self.total_resources, 2)
+
+
+def get_path_stats(session, path_ids: Iterable[int]) -> Dict[int, PathStats]:
+    """
+    Module, resource and completion counts for many paths in one grouped query.
+
+    Args:
+        session: Active session
+        path_ids: Ids of the learning paths
+
+    Returns:
+        dict of path id to PathStats; every requested id is present
+    """
+    path_ids = list(set(path_ids))
+    if not path_ids:
+        return {}
+
+    completed_resource = case(
+        (ResourceProgress.status == "completed", LearningResource.id),
+        else_=None,
+    )
+    stmt = (
+        select(
+            LearningPath.id,
+            func.count(distinct(Module.id)),
+            func.count(distinct(LearningResource.id)),
+            func.count(distinct(completed_resource)),
+        )
+        .select_from(LearningPath)
+        .outerjoin(Module, Module.learning_path_id == LearningPath.id)
+        .outerjoin(LearningResource, LearningResource.module_id == Module.id)
+        .outerjoin(ResourceProgress, ResourceProgress.learning_resource_id == LearningResource.id)
+        .where(LearningPath.id.in_(path_ids))
+        .group_by(LearningPath.id)
+    )
+
+    stats = {path_id: PathStats() for path_id in path_ids}
+    for path_id, module_count, total_resources, completed_resources in session.execute(stmt):
+        stats[path_id] = PathStats(module_count, total_resources, completed_resources)
+    return stats
+
+
+def serialize_paths(session, paths: List[LearningPath]) -> List[dict]:
+    """
+    to_dict for a page of paths with their stats, using a single stats query.
+    """
+    stats = get_path_stats(session, [path.id for path in paths])
+    return [path.to_dict(stats=stats[path.id]) for path in paths]
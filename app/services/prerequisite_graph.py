@@ -0,0 +1,421 @@
+import heapq
+import threading
+import weakref
+from typing import Optional, Dict, List, Iterable, Set, Any
+from sqlalchemy import select, event, inspect
+from sqlalchemy.orm import Session
+from ..models import Module
+
+# Keys accepted for the prerequisite list when prereqs_json is an object
+PREREQ_KEYS = ("module_ids", "modules", "requires", "prerequisites")
+
+
+class PrerequisiteCycleError(ValueError):
+    """Raised when module prerequisites would form a cycle"""
+
+    def __init__(self, cycle: List[int]):
+        self.cycle = cycle
+        super().__init__(f"Prerequisite cycle between modules: {' -> '.join(str(module_id) for module_id in cycle)}")
+
+
+def parse_prereqs(prereqs_json: Any) -> List[int]:
+    """
+    Module ids listed in Module.prereqs_json.
+
+    Accepts a plain list of ids or an object holding one under a key from
+    PREREQ_KEYS, e.g. {"module_ids": [3, 4]}. Anything else means no
+    prerequisites.
+    """
+    if isinstance(prereqs_json, dict):
+        prereqs_json = next((prereqs_json[key] for key in PREREQ_KEYS if key in prereqs_json), None)
+    if not isinstance(prereqs_json, (list, tuple)):
+        return []
+    ids = []
+    for value in prereqs_json:
+        try:
+            ids.append(int(value))
+        except (TypeError, ValueError):
+            continue
+    return ids
+
+
+def _bits(mask: int) -> Iterable[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class PrerequisiteGraph:
+    """
+    Prerequisite DAG for the modules of one learning path.
+
+    Every module gets a bit, and both the direct prerequisites and the
+    transitive closure of each module are stored as integer bitmasks, so
+    "is everything before this module done" is a single AND against the
+    completed set. Prerequisites pointing outside the path are ignored.
+
+    Args:
+        prereqs: Module id to the ids of its direct prerequisites
+        order_index: Module id to order_index, used to break ties in the topological order
+    """
+
+    def __init__(self, prereqs: Dict[int, Iterable[int]], order_index: Optional[Dict[int, int]]=None):
+        self._order_index = dict(order_index or {})
+        self._bit: Dict[int, int] = {}
+        self._module_at: Dict[int, int] = {}
+        self._next_bit = 0
+        for module_id in prereqs:
+            self._assign_bit(module_id)
+        self._prereq_ids: Dict[int, Set[int]] = {
+            module_id: set(prereq_ids) for module_id, prereq_ids in prereqs.items()
+        }
+        self._direct: Dict[int, int] = {}
+        self._closure: Dict[int, int] = {}
+        self._order: List[int] = []
+        self._position: Dict[int, int] = {}
+        self._rebuild()
+
+    @classmethod
+    def from_modules(cls, modules: Iterable) -> "PrerequisiteGraph":
+        """Build from Module objects or (id, order_index, prereqs_json) rows"""
+        prereqs, order_index = {}, {}
+        for module in modules:
+            if isinstance(module, Module):
+                module = (module.id, module.order_index, module.prereqs_json)
+            module_id, index, prereqs_json = module
+            prereqs[module_id] = parse_prereqs(prereqs_json)
+            order_index[module_id] = index
+        return cls(prereqs, order_index)
+
+    def _assign_bit(self, module_id: int) -> None:
+        if module_id not in self._bit:
+            self._bit[module_id] = self._next_bit
+            self._module_at[self._next_bit] = module_id
+            self._next_bit += 1
+
+    def _mask(self, module_ids: Iterable[int]) -> int:
+        mask = 0
+        for module_id in module_ids:
+            bit = self._bit.get(module_id)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def _ids(self, mask: int) -> Set[int]:
+        return {self._module_at[bit] for bit in _bits(mask)}
+
+    def _sort_key(self, module_id: int):
+        return (self._order_index.get(module_id, 0), module_id)
+
+    def _rebuild(self) -> None:
+        """Recompute the topological order and every closure, raising on a cycle"""
+        self._direct = {module_id: self._mask(prereq_ids) for module_id, prereq_ids in self._prereq_ids.items()}
+        dependents: Dict[int, List[int]] = {module_id: [] for module_id in self._direct}
+        waiting = {}
+        for module_id, mask in self._direct.items():
+            prereq_ids = self._ids(mask)
+            waiting[module_id] = len(prereq_ids)
+            for prereq_id in prereq_ids:
+                dependents[prereq_id].append(module_id)
+
+        ready = [self._sort_key(module_id) for module_id, count in waiting.items() if count == 0]
+        heapq.heapify(ready)
+        order = []
+        while ready:
+            _, module_id = heapq.heappop(ready)
+            order.append(module_id)
+            for dependent in dependents[module_id]:
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    heapq.heappush(ready, self._sort_key(dependent))
+
+        if len(order) < len(self._direct):
+            raise PrerequisiteCycleError(self._find_cycle({m for m, count in waiting.items() if count}))
+
+        self._order = order
+        self._position = {module_id: position for position, module_id in enumerate(order)}
+        self._closure = {}
+        for module_id in order:
+            self._closure[module_id] = self._closure_of(module_id)
+
+    def _closure_of(self, module_id: int) -> int:
+        mask = self._direct[module_id]
+        closure = mask
+        for bit in _bits(mask):
+            closure |= self._closure[self._module_at[bit]]
+        return closure
+
+    def _find_cycle(self, candidates: Set[int]) -> List[int]:
+        start = min(candidates)
+        path, seen = [start], {start: 0}
+        while True:
+            prereq_ids = self._ids(self._direct[path[-1]]) & candidates
+            next_id = min(prereq_ids)
+            if next_id in seen:
+                return path[seen[next_id]:] + [next_id]
+            seen[next_id] = len(path)
+            path.append(next_id)
+
+    def __contains__(self, module_id: int) -> bool:
+        return module_id in self._direct
+
+    def __len__(self) -> int:
+        return len(self._direct)
+
+    def copy(self) -> "PrerequisiteGraph":
+        clone = object.__new__(PrerequisiteGraph)
+        clone._order_index = dict(self._order_index)
+        clone._bit = dict(self._bit)
+        clone._module_at = dict(self._module_at)
+        clone._next_bit = self._next_bit
+        clone._prereq_ids = {module_id: set(ids) for module_id, ids in self._prereq_ids.items()}
+        clone._direct = dict(self._direct)
+        clone._closure = dict(self._closure)
+        clone._order = list(self._order)
+        clone._position = dict(self._position)
+        return clone
+
+    @property
+    def topological_order(self) -> List[int]:
+        """Module ids with every module after all of its prerequisites"""
+        return list(self._order)
+
+    def prerequisites(self, module_id: int) -> Set[int]:
+        """Direct prerequisites within the path"""
+        return self._ids(self._direct[module_id])
+
+    def ancestors(self, module_id: int) -> Set[int]:
+        """Every module that must be completed before module_id"""
+        return self._ids(self._closure[module_id])
+
+    def descendants(self, module_id: int) -> Set[int]:
+        """Every module that directly or indirectly requires module_id"""
+        bit = 1 << self._bit[module_id]
+        return {other for other, closure in self._closure.items() if closure & bit}
+
+    def is_unlocked(self, module_id: int, completed: Iterable[int]) -> bool:
+        return self._direct[module_id] & ~self._mask(completed) == 0
+
+    def unlocked(self, completed: Iterable[int]) -> List[int]:
+        """
+        Modules not yet completed whose prerequisites are all completed, in topological order.
+        """
+        done = self._mask(completed)
+        direct, bit = self._direct, self._bit
+        return [
+            module_id for module_id in self._order
+            if not done >> bit[module_id] & 1 and not direct[module_id] & ~done
+        ]
+
+    def update_module(self, module_id: int, prereq_ids: Iterable[int], order_index: Optional[int]=None) -> None:
+        """
+        Add a module or replace its prerequisites, updating only affected closures.
+
+        Raises:
+            PrerequisiteCycleError: The new prerequisites would form a cycle; the graph is unchanged
+        """
+        prereq_ids = set(prereq_ids)
+        if module_id in prereq_ids:
+            raise PrerequisiteCycleError([module_id, module_id])
+
+        if module_id not in self._direct:
+            self._assign_bit(module_id)
+            if order_index is not None:
+                self._order_index[module_id] = order_index
+            self._prereq_ids[module_id] = prereq_ids
+            if any(module_id in ids for ids in self._prereq_ids.values() if ids is not prereq_ids):
+                # Existing modules already name this id, so their edges take effect now
+                self._rebuild_or_restore(module_id)
+                return
+            self._direct[module_id] = self._mask(prereq_ids)
+            self._closure[module_id] = self._closure_of(module_id)
+            self._position[module_id] = len(self._order)
+            self._order.append(module_id)
+            return
+
+        # A new edge closes a cycle exactly when the module already sits below the prerequisite
+        bit = 1 << self._bit[module_id]
+        for prereq_id in prereq_ids:
+            if prereq_id in self._closure and self._closure[prereq_id] & bit:
+                raise PrerequisiteCycleError([module_id] + self._path_to(prereq_id, module_id))
+
+        if order_index is not None:
+            self._order_index[module_id] = order_index
+        self._prereq_ids[module_id] = prereq_ids
+        self._direct[module_id] = self._mask(prereq_ids)
+        position = self._position[module_id]
+        if any(self._position[prereq_id] > position for prereq_id in self.prerequisites(module_id)):
+            self._rebuild()
+            return
+        affected = [module_id] + sorted(self.descendants(module_id), key=self._position.__getitem__)
+        for affected_id in affected:
+            self._closure[affected_id] = self._closure_of(affected_id)
+
+    def _rebuild_or_restore(self, module_id: int) -> None:
+        snapshot = self.copy()
+        try:
+            self._rebuild()
+        except PrerequisiteCycleError:
+            self.__dict__.update(snapshot.__dict__)
+            del self._module_at[self._bit.pop(module_id)]
+            self._prereq_ids.pop(module_id)
+            self._order_index.pop(module_id, None)
+            raise
+
+    def _path_to(self, start: int, target: int) -> List[int]:
+        """Prerequisite chain from start down to target"""
+        path = [start]
+        target_bit = 1 << self._bit[target]
+        while path[-1] != target:
+            for prereq_id in self.prerequisites(path[-1]):
+                if prereq_id == target or self._closure[prereq_id] & target_bit:
+                    path.append(prereq_id)
+                    break
+        return path
+
+    def remove_module(self, module_id: int) -> None:
+        """Drop a module; modules that required it no longer do"""
+        if module_id not in self._direct:
+            return
+        dependents = sorted(self.descendants(module_id), key=self._position.__getitem__)
+        bit = 1 << self._bit[module_id]
+        for table in (self._direct, self._closure, self._prereq_ids, self._position, self._order_index):
+            table.pop(module_id, None)
+        self._order.remove(module_id)
+        self._position = {other: position for position, other in enumerate(self._order)}
+        for other in self._direct:
+            self._direct[other] &= ~bit
+        del self._module_at[self._bit.pop(module_id)]
+        for dependent in dependents:
+            self._closure[dependent] = self._closure_of(dependent)
+
+
+class PrerequisiteGraphCache:
+    """
+    Graphs per (engine, learning path), kept current as modules change.
+
+    Committed Module inserts, deletes and prereqs_json changes are applied
+    incrementally to cached graphs. Changes are checked at flush time, so
+    a flush that would introduce a cycle raises PrerequisiteCycleError and
+    rolls back instead of being written. A path with no cached graph is
+    built from the flushed rows for the check, so this holds on a cold
+    cache too.
+    """
+
+    def __init__(self):
+        self._graphs = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _for_engine(self, engine) -> Dict[int, PrerequisiteGraph]:
+        with self._lock:
+            return self._graphs.setdefault(engine, {})
+
+    def get(self, session, learning_path_id: int) -> PrerequisiteGraph:
+        graphs = self._for_engine(session.get_bind())
+        graph = graphs.get(learning_path_id)
+        if graph is None:
+            graph = graphs[learning_path_id] = self._load(session, learning_path_id)
+        return graph
+
+    @staticmethod
+    def _load(session, learning_path_id: int) -> PrerequisiteGraph:
+        rows = session.execute(
+            select(Module.id, Module.order_index, Module.prereqs_json)
+            .where(Module.learning_path_id == learning_path_id)
+        ).all()
+        return PrerequisiteGraph.from_modules(rows)
+
+    def cached(self, session, learning_path_id: int) -> Optional[PrerequisiteGraph]:
+        return self._for_engine(session.get_bind()).get(learning_path_id)
+
+    def invalidate(self, learning_path_id: Optional[int]=None) -> None:
+        with self._lock:
+            for graphs in self._graphs.values():
+                if learning_path_id is None:
+                    graphs.clear()
+                else:
+                    graphs.pop(learning_path_id, None)
+
+    def stage(self, session, modules: List[Module], deleted: List[Module]) -> None:
+        """Apply pending module changes to copies of the cached graphs"""
+        staged = session.info.setdefault("prerequisite_graphs", {})
+        changes = [(module.learning_path_id, module, False) for module in modules]
+        changes += [(module.learning_path_id, module, True) for module in deleted]
+        for module in modules:
+            # A module moved to another path leaves its old graph
+            moved_from = inspect(module).attrs.learning_path_id.history.deleted
+            changes += [(path_id, module, True) for path_id in moved_from if path_id is not None]
+
+        loaded = set()
+        for key, module, removed in changes:
+            if key not in staged:
+                graph = self.cached(session, key)
+                if graph is None:
+                    # The flushed rows already hold every change, and building raises on a cycle
+                    staged[key] = self._load(session, key)
+                    loaded.add(key)
+                    continue
+                staged[key] = graph.copy()
+            if key in loaded:
+                continue
+            if removed:
+                staged[key].remove_module(module.id)
+            else:
+                staged[key].update_module(module.id, parse_prereqs(module.prereqs_json), module.order_index)
+
+    def publish(self, session) -> None:
+        staged = session.info.pop("prerequisite_graphs", None)
+        if staged:
+            self._for_engine(session.get_bind()).update(staged)
+
+
+default_cache = PrerequisiteGraphCache()
+
+
+@event.listens_for(Session, "after_flush")
+def _stage_prerequisite_changes(session, flush_context):
+    modules = [
+        obj for obj in session.new | session.dirty
+        if isinstance(obj, Module) and (obj in session.new or session.is_modified(obj, include_collections=False))
+    ]
+    deleted = [obj for obj in session.deleted if isinstance(obj, Module)]
+    if modules or deleted:
+        default_cache.stage(session, modules, deleted)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_prerequisite_changes(session):
+    default_cache.publish(session)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_prerequisite_changes(session, previous_transaction):
+    session.info.pop("prerequisite_graphs", None)
+
+
+def get_prerequisite_graph(session, learning_path_id: int) -> PrerequisiteGraph:
+    """
+    Cached prerequisite graph for a path, built with one query on first use.
+
+    Raises:
+        PrerequisiteCycleError: The stored prerequisites contain a cycle
+    """
+    return default_cache.get(session, learning_path_id)
+
+
+def unlocked_modules(session, learning_path_id: int, completed_module_ids: Iterable[int]) -> List[int]:
+    """Modules of the path that can be started once completed_module_ids are done"""
+    return get_prerequisite_graph(session, learning_path_id).unlocked(completed_module_ids)
+
+
+def set_prerequisites(session, module: Module, prereq_ids: Iterable[int]) -> None:
+    """
+    Replace a module's prerequisites after checking them against the path graph.
+
+    Raises:
+        PrerequisiteCycleError: The change would form a cycle; the module is left as it was
+    """
+    prereq_ids = list(prereq_ids)
+    get_prerequisite_graph(session, module.learning_path_id).copy().update_module(module.id, prereq_ids)
+    module.prereqs_json = {"module_ids": prereq_ids}
@@ -0,0 +1,93 @@
+import sys
+from typing import Optional
+from sqlalchemy import select, delete, insert, func, case, distinct
+from ..models import Module, LearningResource, ResourceProgress, ProgressRollup
+from ..models.progress_rollup_model import MODULE_SCOPE, PATH_SCOPE
+from ..models.base import session_scope
+
+
+def get_module_progress(session, module_id: int) -> Optional[ProgressRollup]:
+    """Rollup row for a module, a single indexed lookup"""
+    return session.scalar(
+        select(ProgressRollup).where(ProgressRollup.scope == MODULE_SCOPE, ProgressRollup.scope_id == module_id)
+    )
+
+
+def get_path_progress(session, learning_path_id: int) -> Optional[ProgressRollup]:
+    """Rollup row for a learning path, a single indexed lookup"""
+    return session.scalar(
+        select(ProgressRollup).where(ProgressRollup.scope == PATH_SCOPE, ProgressRollup.scope_id == learning_path_id)
+    )
+
+
+def rebuild_rollups(session, learning_path_id: Optional[int]=None) -> int:
+    """
+    Recompute rollup rows from resource_progress with two grouped queries.
+
+    Repairs drift after writes that bypass the ORM, such as raw SQL or
+    database-level cascades.
+
+    Args:
+        session: Active session; the caller commits
+        learning_path_id: Only rebuild this path and its modules
+
+    Returns:
+        Number of rollup rows written
+    """
+    if learning_path_id is None:
+        session.execute(delete(ProgressRollup))
+    else:
+        module_ids = select(Module.id).where(Module.learning_path_id == learning_path_id)
+        session.execute(
+            delete(ProgressRollup).where(
+                ((ProgressRollup.scope == MODULE_SCOPE) & ProgressRollup.scope_id.in_(module_ids))
+                | ((ProgressRollup.scope == PATH_SCOPE) & (ProgressRollup.scope_id == learning_path_id))
+            )
+        )
+
+    completed = case((ResourceProgress.status == "completed", LearningResource.id), else_=None)
+    in_progress = case((ResourceProgress.status == "in_progress", LearningResource.id), else_=None)
+    written = 0
+    for scope, scope_column in ((MODULE_SCOPE, Module.id), (PATH_SCOPE, Module.learning_path_id)):
+        stmt = (
+            select(
+                scope_column,
+                func.count(distinct(LearningResource.id)),
+                func.count(distinct(completed)),
+                func.count(distinct(in_progress)),
+                func.coalesce(func.sum(ResourceProgress.time_spent_mins), 0),
+            )
+            .select_from(Module)
+            .outerjoin(LearningResource, LearningResource.module_id == Module.id)
+            .outerjoin(ResourceProgress, ResourceProgress.learning_resource_id == LearningResource.id)
+            .group_by(scope_column)
+        )
+        if learning_path_id is not None:
+            stmt = stmt.where(Module.learning_path_id == learning_path_id)
+
+        rows = [
+            {
+                "scope": scope,
+                "scope_id": scope_id,
+                "total_count": total,
+                "completed_count": done,
+                "in_progress_count": started,
+                "time_spent_mins": minutes,
+            }
+            for scope_id, total, done, started, minutes in session.execute(stmt)
+        ]
+        if rows:
+            session.execute(insert(ProgressRollup), rows)
+        written += len(rows)
+    return written
+
+
+if __name__ == "__main__":
+    # python -m app.services.progress_rollup_service rebuild [learning_path_id]
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild":
+        print("Usage: python -m app.services.progress_rollup_service rebuild [learning_path_id]")
+        sys.exit(1)
+    path_id = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    with session_scope() as session:
+        count = rebuild_rollups(session, path_id)
+    print(f"Rebuilt {count} progress rollup rows")
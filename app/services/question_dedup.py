@@ -0,0 +1,266 @@
+import re
+import zlib
+from dataclasses import dataclass
+from typing import Optional, List, Dict, Tuple, Iterable, Set
+import numpy as np
+from sqlalchemy import select
+from ..models import QuizQuestion
+
+NUM_PERM = 64
+NUM_BANDS = 16
+DEFAULT_THRESHOLD = 0.6
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+GroupKey = Tuple[int, str]
+Slot = Tuple[GroupKey, int]
+
+
+def group_key(resource_id: int, concept_tested: Optional[str]) -> GroupKey:
+    """Questions are only compared within the same resource and concept"""
+    return resource_id, " ".join(_WORD.findall((concept_tested or "").lower()))
+
+
+def _field(question, name: str):
+    """Read a column from a QuizQuestion or from a quiz_questions row dict"""
+    return question.get(name) if isinstance(question, dict) else getattr(question, name)
+
+
+def _set_field(question, name: str, value) -> None:
+    if isinstance(question, dict):
+        question[name] = value
+    else:
+        setattr(question, name, value)
+
+
+def merge_duplicate(kept, duplicate) -> None:
+    """
+    Fold what a near-duplicate adds into the question that is kept.
+
+    The longer explanation wins, and options are taken over only when the
+    kept question has none and both agree on the correct answer, so the
+    merged question never offers options its answer is not among.
+    """
+    explanation = _field(duplicate, "explanation") or ""
+    if len(explanation) > len(_field(kept, "explanation") or ""):
+        _set_field(kept, "explanation", explanation)
+    options = _field(duplicate, "options_json")
+    if (
+        options
+        and not _field(kept, "options_json")
+        and str(_field(duplicate, "correct_answer")) == str(_field(kept, "correct_answer"))
+    ):
+        _set_field(kept, "options_json", options)
+
+
+def shingles(text: str) -> Set[str]:
+    """Words and word pairs of the normalized text, so both a swapped word and a reordering count"""
+    words = _WORD.findall(text.lower())
+    return set(words) | {f"{first} {second}" for first, second in zip(words, words[1:])}
+
+
+@dataclass
+class DuplicateMatch:
+    """An existing question a candidate is too similar to"""
+    question_id: Optional[int]
+    similarity: float
+
+
+class _Group:
+    """
+    Signatures and LSH band hashes of the questions sharing one group key.
+
+    Rows live in arrays that double in capacity when full, so adding n
+    questions copies O(n) rows in total rather than O(n^2).
+    """
+
+    __slots__ = ("question_ids", "_signatures", "_bands")
+
+    def __init__(self, num_perm: int, num_bands: int, capacity: int=8):
+        self.question_ids: List[Optional[int]] = []
+        self._signatures = np.empty((capacity, num_perm), dtype=np.uint16)
+        self._bands = np.empty((capacity, num_bands), dtype=np.uint32)
+
+    @property
+    def signatures(self) -> np.ndarray:
+        return self._signatures[:len(self.question_ids)]
+
+    @property
+    def bands(self) -> np.ndarray:
+        return self._bands[:len(self.question_ids)]
+
+    def add(self, question_id: Optional[int], signature: np.ndarray, bands: np.ndarray) -> int:
+        size = len(self.question_ids)
+        if size == len(self._signatures):
+            self._signatures = np.resize(self._signatures, (size * 2, self._signatures.shape[1]))
+            self._bands = np.resize(self._bands, (size * 2, self._bands.shape[1]))
+        self._signatures[size] = signature
+        self._bands[size] = bands
+        self.question_ids.append(question_id)
+        return size
+
+
+class QuestionSimilarityIndex:
+    """
+    MinHash/LSH index for spotting reworded quiz questions.
+
+    Each question text becomes a MinHash signature over its word shingles;
+    the signature is split into bands, and only questions in the same
+    (resource, concept_tested) group that share a band are compared, by the
+    fraction of equal signature slots, an estimate of Jaccard similarity.
+    Adds are incremental and a lookup touches a single group, so its cost
+    does not grow with the total number of questions.
+
+    Args:
+        threshold: Estimated Jaccard similarity at which a question counts as a duplicate
+        num_perm: MinHash signature length
+        num_bands: LSH bands; num_perm must be a multiple of it
+        seed: Seed for the hash permutations; indexes only agree with the same seed
+    """
+
+    def __init__(self, threshold: float=DEFAULT_THRESHOLD, num_perm: int=NUM_PERM, num_bands: int=NUM_BANDS, seed: int=1):
+        if num_perm % num_bands:
+            raise ValueError("num_perm must be a multiple of num_bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.num_bands = num_bands
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing: (a * x + b) mod 2**64, keeping the high bits
+        self._a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+        self._band_mix = rng.integers(1, 2 ** 63, size=num_perm // num_bands, dtype=np.uint64) | np.uint64(1)
+        self._groups: Dict[GroupKey, _Group] = {}
+        self._loaded_resources: Set[int] = set()
+        self._fully_loaded = False
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of text as num_perm uint16 values"""
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles(text)),
+            dtype=np.uint64,
+        )
+        if not len(hashes):
+            return np.full(self.num_perm, np.iinfo(np.uint16).max, dtype=np.uint16)
+        with np.errstate(over="ignore"):
+            permuted = hashes[:, None] * self._a + self._b
+        # The top 16 bits are enough to compare slots and halve the memory per question
+        return (permuted >> np.uint64(48)).min(axis=0).astype(np.uint16)
+
+    def _band_hashes(self, signature: np.ndarray) -> np.ndarray:
+        rows = signature.reshape(self.num_bands, -1).astype(np.uint64)
+        with np.errstate(over="ignore"):
+            return ((rows * self._band_mix).sum(axis=1, dtype=np.uint64) >> np.uint64(32)).astype(np.uint32)
+
+    def add(self, question_id: Optional[int], resource_id: int, concept_tested: Optional[str], text: str) -> Slot:
+        """
+        Index one question; question_id may be None for questions not stored yet.
+
+        Returns:
+            The question's slot, to pass to assign_ids once it has an id
+        """
+        key = group_key(resource_id, concept_tested)
+        return key, self._add_signature(key, question_id, self.signature(text))
+
+    def _add_signature(self, key: GroupKey, question_id: Optional[int], signature: np.ndarray) -> int:
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = _Group(self.num_perm, self.num_bands)
+        self._size += 1
+        return group.add(question_id, signature, self._band_hashes(signature))
+
+    def _best_match(self, key: GroupKey, signature: np.ndarray) -> Optional[Tuple[int, float]]:
+        group = self._groups.get(key)
+        if group is None:
+            return None
+        candidates = np.flatnonzero((group.bands == self._band_hashes(signature)).any(axis=1))
+        if not len(candidates):
+            return None
+        similarity = (group.signatures[candidates] == signature).mean(axis=1)
+        best = int(np.argmax(similarity))
+        if similarity[best] < self.threshold:
+            return None
+        return int(candidates[best]), float(similarity[best])
+
+    def find_duplicate(self, resource_id: int, concept_tested: Optional[str], text: str) -> Optional[DuplicateMatch]:
+        """Most similar indexed question at or above threshold, if any"""
+        key = group_key(resource_id, concept_tested)
+        match = self._best_match(key, self.signature(text))
+        if match is None:
+            return None
+        position, similarity = match
+        return DuplicateMatch(self._groups[key].question_ids[position], similarity)
+
+    def load(self, session, resource_ids: Optional[Iterable[int]]=None, chunk_size: int=10000) -> int:
+        """
+        Index stored questions, streaming them from the database.
+
+        Resources already loaded are skipped, so calling this before every
+        batch only reads what is new to the index.
+
+        Returns:
+            Number of questions added
+        """
+        stmt = select(
+            QuizQuestion.id,
+            QuizQuestion.learning_resource_id,
+            QuizQuestion.concept_tested,
+            QuizQuestion.question_text,
+        ).execution_options(yield_per=chunk_size)
+        if self._fully_loaded:
+            return 0
+        if resource_ids is not None:
+            resource_ids = set(resource_ids) - self._loaded_resources
+            if not resource_ids:
+                return 0
+            stmt = stmt.where(QuizQuestion.learning_resource_id.in_(sorted(resource_ids)))
+
+        added = 0
+        for question_id, resource_id, concept_tested, text in session.execute(stmt):
+            self.add(question_id, resource_id, concept_tested, text)
+            added += 1
+        if resource_ids is None:
+            self._fully_loaded = True
+        else:
+            self._loaded_resources.update(resource_ids)
+        return added
+
+    def filter_new(self, questions: List) -> Tuple[List, List, List[Slot]]:
+        """
+        Split unsaved questions into those to keep and near-duplicates to drop.
+
+        Questions may be QuizQuestion objects or quiz_questions row dicts.
+        Kept questions are indexed immediately, so duplicates within the
+        same batch are caught too. A duplicate of a question kept earlier in
+        the same call is merged into it (see merge_duplicate); a duplicate
+        of a stored question is dropped, leaving the stored row as it is.
+
+        Returns:
+            (kept, duplicates, slots), slots[i] being the index slot of
+            kept[i]; pass them to assign_ids with the stored ids
+        """
+        kept, duplicates, slots = [], [], []
+        pending: Dict[Slot, object] = {}
+        for question in questions:
+            key = group_key(_field(question, "learning_resource_id"), _field(question, "concept_tested"))
+            signature = self.signature(_field(question, "question_text"))
+            match = self._best_match(key, signature)
+            if match is not None:
+                target = pending.get((key, match[0]))
+                if target is not None:
+                    merge_duplicate(target, question)
+                duplicates.append(question)
+                continue
+            slot = (key, self._add_signature(key, _field(question, "id"), signature))
+            pending[slot] = question
+            kept.append(question)
+            slots.append(slot)
+        return kept, duplicates, slots
+
+    def assign_ids(self, slots: Iterable[Slot], question_ids: Iterable[int]) -> None:
+        """Record database ids for the slots filter_new returned, in the same order"""
+        for (key, position), question_id in zip(slots, question_ids):
+            self._groups[key].question_ids[position] = question_id
@@ -0,0 +1,267 @@
+import os
+import json
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, List, Dict, Any, Callable, Iterable, Iterator, Set
+from sqlalchemy import select, exists, tuple_
+from ..models import Module, LearningResource, QuizQuestion
+from ..models.base import SessionLocal
+from .claude_service import resource_system_blocks
+from .question_dedup import QuestionSimilarityIndex
+from .bulk_loader import BulkLoader
+from .blob_store import load_resource_text
+
+QUIZ_PROMPT = """Write {num_questions} quiz questions that test understanding of the learning resource "{title}".
+
+Return only a JSON array. Each element must be an object with the keys:
+question_type (multiple_choice, true_false or short_answer), question_text,
+correct_answer, options (list of choices, or null), explanation,
+difficulty (beginner, intermediate or advanced) and concept_tested."""
+
+# A generator receives (resource_id, title, content) and returns question dicts
+QuestionGenerator = Callable[[int, str, str], List[Dict[str, Any]]]
+
+
+class ClaudeQuizGenerator:
+    """
+    Default question generator backed by ClaudeService.generate_json.
+
+    Args:
+        claude: A ClaudeService instance
+        num_questions: Questions requested per resource
+    """
+
+    def __init__(self, claude, num_questions: int=5):
+        self.claude = claude
+        self.num_questions = num_questions
+
+    def __call__(self, resource_id: int, title: str, content: str) -> List[Dict[str, Any]]:
+        prompt = QUIZ_PROMPT.format(
+            num_questions=self.num_questions,
+            title=title,
+        )
+        questions = self.claude.generate_json(
+            prompt,
+            system=resource_system_blocks(content),
+            label="quiz"
+        )
+        if not isinstance(questions, list):
+            raise ValueError(f"Expected a JSON array of questions for resource {resource_id}")
+        return questions
+
+
+@dataclass
+class PipelineReport:
+    """Summary of one pipeline run"""
+    resources_processed: int = 0
+    questions_created: int = 0
+    duplicates_dropped: int = 0
+    skipped: int = 0
+    failed: Dict[int, str] = field(default_factory=dict)
+
+
+class QuizPipelineCheckpoint:
+    """
+    JSON file of resource ids the pipeline has already finished.
+
+    Resources that produced questions are also skipped through the database,
+    the checkpoint additionally covers resources whose generation returned
+    nothing usable, so a re-run does not pay for them again.
+    """
+
+    def __init__(self, path: Optional[str]=None):
+        self.path = path
+        self.completed: Set[int] = set()
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                self.completed = set(json.load(f).get("completed", []))
+
+    def mark(self, resource_ids: Iterable[int]) -> None:
+        self.completed.update(resource_ids)
+        if self.path is None:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"completed": sorted(self.completed)}, f)
+        os.replace(tmp_path, self.path)
+
+
+def question_row(resource_id: int, data: Dict[str, Any]) -> Dict[str, Any]:
+    """quiz_questions column values for one generated question dict"""
+    return {
+        "learning_resource_id": resource_id,
+        "question_type": data.get("question_type", "short_answer"),
+        "question_text": data["question_text"],
+        "correct_answer": str(data["correct_answer"]),
+        "explanation": data.get("explanation") or "",
+        "difficulty": data.get("difficulty") or "intermediate",
+        "concept_tested": data.get("concept_tested") or "",
+        "options_json": data.get("options") or data.get("options_json"),
+    }
+
+
+def question_from_dict(resource_id: int, data: Dict[str, Any]) -> QuizQuestion:
+    """Build a QuizQuestion from one generated question dict"""
+    return QuizQuestion.create(**question_row(resource_id, data))
+
+
+class QuizGenerationPipeline:
+    """
+    Batch job that turns every resource without questions into QuizQuestion rows.
+
+    Resource ids and titles are read a batch at a time and each body is
+    loaded by the worker that needs it, so memory holds at most one batch
+    of titles and one body per worker. Generation runs on a single thread
+    pool for the whole run, rows are written in batches from the calling
+    thread, and the checkpoint is only advanced after a batch commits, so
+    a crash loses at most one uncommitted batch.
+
+    Args:
+        generator: Callable returning question dicts for a resource
+        session_factory: Creates the session used for reads and writes
+        checkpoint_path: Optional JSON checkpoint file
+        workers: Number of concurrent generator calls
+        batch_size: Resources per insert/commit batch
+        dedup_index: QuestionSimilarityIndex used to drop near-duplicates of
+            stored or already generated questions before insert; a fresh
+            index is used when None
+        dedup: Set False to store every generated question
+    """
+
+    def __init__(
+        self,
+        generator: QuestionGenerator,
+        session_factory=SessionLocal,
+        checkpoint_path: Optional[str]=None,
+        workers: int=4,
+        batch_size: int=50,
+        dedup_index: Optional[QuestionSimilarityIndex]=None,
+        dedup: bool=True,
+    ):
+        self.generator = generator
+        self.session_factory = session_factory
+        self.checkpoint = QuizPipelineCheckpoint(checkpoint_path)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.dedup_index = (dedup_index or QuestionSimilarityIndex()) if dedup else None
+
+    def pending_resources(
+        self,
+        session,
+        learning_path_id: Optional[int]=None,
+        module_id: Optional[int]=None,
+        regenerate: bool=False,
+        page_size: Optional[int]=None,
+    ) -> Iterator[tuple]:
+        """
+        (id, title, module_id, order_index) rows for resources in scope that
+        have no questions yet, or every resource in scope with regenerate.
+
+        Rows are read page_size at a time (batch_size by default), each page
+        a keyset query after the last row of the previous one, so no cursor
+        stays open while the caller commits between pages.
+        """
+        key = (LearningResource.module_id, LearningResource.order_index, LearningResource.id)
+        stmt = (
+            select(LearningResource.id, LearningResource.title, LearningResource.module_id, LearningResource.order_index)
+            .order_by(*key)
+            .limit(page_size or self.batch_size)
+        )
+        if not regenerate:
+            has_questions = exists().where(QuizQuestion.learning_resource_id == LearningResource.id)
+            stmt = stmt.where(~has_questions)
+        if module_id is not None:
+            stmt = stmt.where(LearningResource.module_id == module_id)
+        if learning_path_id is not None:
+            stmt = stmt.join(Module, Module.id == LearningResource.module_id).where(
+                Module.learning_path_id == learning_path_id
+            )
+
+        last = None
+        while True:
+            page = session.execute(stmt if last is None else stmt.where(tuple_(*key) > tuple_(*last))).all()
+            yield from page
+            if len(page) < (page_size or self.batch_size):
+                return
+            last = (page[-1].module_id, page[-1].order_index, page[-1].id)
+
+    def run(
+        self,
+        learning_path_id: Optional[int]=None,
+        module_id: Optional[int]=None,
+        regenerate: bool=False,
+    ) -> PipelineReport:
+        """
+        Generate and store questions for a learning path or module.
+
+        Args:
+            learning_path_id: Restrict to resources in this learning path
+            module_id: Restrict to resources in this module
+            regenerate: Also generate for resources that already have questions
+                or are in the checkpoint
+
+        Returns:
+            PipelineReport with counts and per-resource failures
+        """
+        report = PipelineReport()
+        session = self.session_factory()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                batch = []
+                for row in self.pending_resources(session, learning_path_id, module_id, regenerate):
+                    if row.id in self.checkpoint.completed and not regenerate:
+                        report.skipped += 1
+                        continue
+                    batch.append(row)
+                    if len(batch) >= self.batch_size:
+                        self._run_batch(session, executor, batch, report)
+                        batch = []
+                if batch:
+                    self._run_batch(session, executor, batch, report)
+        finally:
+            session.close()
+        return report
+
+    def _run_batch(self, session, executor: ThreadPoolExecutor, batch: List[tuple], report: PipelineReport) -> None:
+        questions, done = self._generate_batch(executor, batch, report)
+        if self.dedup_index is not None:
+            self.dedup_index.load(session, [row.id for row in batch])
+            questions, duplicates, slots = self.dedup_index.filter_new(questions)
+            report.duplicates_dropped += len(duplicates)
+
+        # Plain rows through INSERT ... RETURNING id, so no ORM object is built or refreshed
+        ids: List[int] = []
+        BulkLoader(session, commit_every_batch=False).load_quiz_questions(questions, on_batch=ids.extend)
+        session.commit()
+        if self.dedup_index is not None:
+            self.dedup_index.assign_ids(slots, ids)
+        self.checkpoint.mark(done)
+
+        report.resources_processed += len(done)
+        report.questions_created += len(questions)
+
+    def _generate(self, row) -> List[Dict[str, Any]]:
+        # The body is loaded here, in the worker thread, with a session of its own
+        with self.session_factory() as session:
+            body = session.execute(
+                select(LearningResource.content, LearningResource.file_path)
+                .where(LearningResource.id == row.id)
+            ).one()
+        return self.generator(row.id, row.title, load_resource_text(body))
+
+    def _generate_batch(self, executor: ThreadPoolExecutor, batch: List[tuple], report: PipelineReport):
+        questions = []
+        done = []
+        futures = {
+            executor.submit(self._generate, row): row.id
+            for row in batch
+        }
+        for future in as_completed(futures):
+            resource_id = futures[future]
+            try:
+                generated = [question_row(resource_id, data) for data in future.result()]
+                questions.extend(generated)
+                done.append(resource_id)
+            except Exception as e:
+                report.failed[resource_id] = str(e)
+        return questions, done
@@ -0,0 +1,230 @@
+import time
+import random
+import asyncio
+import threading
+from typing import Optional
+from .config.settings import settings
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the API while the circuit breaker is open"""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    reserve() always succeeds and returns how long the caller must wait
+    before using the tokens, letting the bucket go into debt. Waiting
+    outside the lock keeps callers in FIFO order without holding it.
+
+    Args:
+        rate: Tokens added per second
+        capacity: Maximum burst size
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float=1) -> float:
+        """Take amount tokens and return the seconds to wait before they are available"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= min(amount, self.capacity)
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def refund(self, amount: float) -> None:
+        """Give back tokens reserved in excess, e.g. after an over-estimate"""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+    def drain(self, seconds: float) -> None:
+        """Empty the bucket so nothing is handed out for roughly the given time"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+class RateLimiter:
+    """
+    Request and token budgets shared by every caller in the process.
+
+    Args:
+        requests_per_minute: Request budget
+        tokens_per_minute: Input token budget
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_minute / 60, requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute / 60, tokens_per_minute)
+
+    def _reserve(self, estimated_tokens: int) -> float:
+        return max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+
+    def acquire(self, estimated_tokens: int=0) -> None:
+        """Block until a request with the given token estimate may be sent"""
+        wait = self._reserve(estimated_tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, estimated_tokens: int=0) -> None:
+        wait = self._reserve(estimated_tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def settle(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Correct the token budget once the real usage is known"""
+        if actual_tokens < estimated_tokens:
+            self.tokens.refund(estimated_tokens - actual_tokens)
+        elif actual_tokens > estimated_tokens:
+            self.tokens.reserve(actual_tokens - estimated_tokens)
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every caller after the server asked us to slow down"""
+        self.requests.drain(seconds)
+
+
+class CircuitBreaker:
+    """
+    Fails fast while the API is degraded.
+
+    After failure_threshold consecutive failures the breaker opens and
+    every call raises CircuitOpenError for reset_timeout seconds. Then one
+    trial call is let through (half-open); success closes the breaker,
+    failure opens it again. A trial that ends without either, e.g. because
+    it was cancelled, must be handed back with release_trial so the next
+    call can become the trial.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int=5, reset_timeout: float=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> bool:
+        """
+        Raise CircuitOpenError unless a call may go ahead.
+
+        Returns:
+            True when this call is the half-open trial
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return False
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            raise CircuitOpenError("Claude API circuit breaker is open; failing fast")
+
+    def release_trial(self) -> None:
+        """Give up the half-open trial without a verdict, letting the next call try"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+
+class DecorrelatedJitterBackoff:
+    """
+    Decorrelated-jitter backoff: each delay is random between base and three
+    times the previous delay, capped. Spreads out retries from many workers
+    that failed at the same moment.
+    """
+
+    def __init__(self, base: float=1.0, cap: float=60.0):
+        self.base = base
+        self.cap = cap
+        self._previous = base
+
+    def next_delay(self, retry_after: Optional[float]=None) -> float:
+        delay = min(self.cap, random.uniform(self.base, self._previous * 3))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        self._previous = delay
+        return delay
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Server retry hint from an API error's retry-after headers, if any"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after") is not None:
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+def estimate_request_tokens(request_params: dict) -> int:
+    """Rough input token count for budgeting, about four characters per token"""
+    size = len(str(request_params.get("system") or "")) + len(str(request_params["messages"]))
+    return max(1, size // 4)
+
+
+_shared_lock = threading.Lock()
+_shared_limiter: Optional[RateLimiter] = None
+_shared_breaker: Optional[CircuitBreaker] = None
+
+
+def get_shared_rate_limiter() -> RateLimiter:
+    """Process-wide limiter used by every ClaudeService by default"""
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter(
+                requests_per_minute=settings.CLAUDE_REQUESTS_PER_MINUTE,
+                tokens_per_minute=settings.CLAUDE_TOKENS_PER_MINUTE,
+            )
+        return _shared_limiter
+
+
+def get_shared_circuit_breaker() -> CircuitBreaker:
+    """Process-wide circuit breaker used by every ClaudeService by default"""
+    global _shared_breaker
+    with _shared_lock:
+        if _shared_breaker is None:
+            _shared_breaker = CircuitBreaker(
+                failure_threshold=settings.CLAUDE_BREAKER_FAILURE_THRESHOLD,
+                reset_timeout=settings.CLAUDE_BREAKER_RESET_SECONDS,
+            )
+        return _shared_breaker
@@ -0,0 +1,421 @@
+import asyncio
+import logging
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional, Dict, Any, Iterable, Iterator, AsyncIterator, Callable, List
+from urllib.parse import urlsplit
+import httpx
+from sqlalchemy import select, update, bindparam, func, case
+from ..models import LearningResource, Module
+from ..models.learning_resource_model import compute_content_hash
+from .blob_store import BlobStore, get_blob_store, is_blob_ref, blob_digest
+from .client_registry import run_sync
+from .enrichment_store import inherit_enrichments
+from .config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+FETCHED = "fetched"
+NOT_MODIFIED = "not_modified"
+FAILED = "failed"
+
+
+@dataclass
+class FetchRequest:
+    """One URL to fetch; etag and last_modified come from the previous fetch"""
+    url: str
+    key: Any = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @classmethod
+    def for_resource(cls, resource_id: int, url: str, metadata: Optional[dict]) -> "FetchRequest":
+        metadata = metadata or {}
+        return cls(url, resource_id, metadata.get("etag"), metadata.get("last_modified"))
+
+
+@dataclass
+class FetchResult:
+    """
+    Outcome of one fetch.
+
+    A FETCHED body is in body, or in the blob store under blob_ref when it
+    was larger than the fetcher's blob threshold.
+    """
+    url: str
+    status: str
+    key: Any = None
+    status_code: Optional[int] = None
+    body: Optional[bytes] = None
+    blob_ref: Optional[str] = None
+    content_type: Optional[str] = None
+    encoding: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    final_url: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        return (self.body or b"").decode(self.encoding or "utf-8", errors="replace")
+
+    def metadata(self) -> Dict[str, Any]:
+        """Fields merged into LearningResource.source_metadata_json"""
+        return {
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "content_type": self.content_type,
+            "http_status": self.status_code,
+            "final_url": self.final_url,
+            "fetched_at": datetime.utcnow().isoformat(),
+        }
+
+
+@dataclass
+class FetchReport:
+    """Summary of one refresh run"""
+    fetched: int = 0
+    not_modified: int = 0
+    failed: Dict[Any, str] = field(default_factory=dict)
+
+
+def interleave_hosts(requests: Iterable[FetchRequest]) -> Iterator[FetchRequest]:
+    """
+    Round-robin requests across hosts.
+
+    Workers wait on a host's cap while holding a global slot, so spreading
+    each host's URLs out keeps all workers busy instead of queueing behind
+    one site.
+    """
+    by_host: Dict[str, deque] = defaultdict(deque)
+    for request in requests:
+        by_host[urlsplit(request.url).netloc.lower()].append(request)
+    queues = deque(by_host.values())
+    while queues:
+        queue = queues.popleft()
+        yield queue.popleft()
+        if queue:
+            queues.append(queue)
+
+
+class ResourceFetcher:
+    """
+    Async HTTP fetcher with global and per-host concurrency caps.
+
+    Bodies are streamed and abandoned once they pass max_bytes, every
+    request has an overall deadline on top of httpx's connect and read
+    timeouts, and requests carrying a previous ETag or Last-Modified are
+    sent as conditional GETs so unchanged pages come back as 304 without a
+    body. Use as an async context manager.
+
+    Args:
+        max_concurrency: Requests in flight across all hosts
+        max_per_host: Requests in flight to any single host
+        timeout: Seconds allowed for a whole request, including the body
+        max_bytes: Largest body accepted
+        client: Optional preconfigured httpx.AsyncClient, e.g. for tests
+        blob_store: Where bodies over blob_threshold are streamed, defaults to the
+            BLOB_STORE_PATH store; without one every body is kept in memory
+        blob_threshold: Body size at which streaming switches to the blob store
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int]=None,
+        max_per_host: Optional[int]=None,
+        timeout: Optional[float]=None,
+        max_bytes: Optional[int]=None,
+        client: Optional[httpx.AsyncClient]=None,
+        blob_store: Optional[BlobStore]=None,
+        blob_threshold: Optional[int]=None,
+    ):
+        self.max_concurrency = max_concurrency or settings.FETCH_MAX_CONCURRENCY
+        self.max_per_host = max_per_host or settings.FETCH_MAX_PER_HOST
+        self.timeout = timeout or settings.FETCH_TIMEOUT_SECONDS
+        self.max_bytes = max_bytes or settings.FETCH_MAX_BYTES
+        self.blob_store = blob_store or get_blob_store()
+        self.blob_threshold = blob_threshold or settings.BLOB_THRESHOLD_BYTES
+        self._client = client
+        self._owns_client = client is None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+
+    async def __aenter__(self) -> "ResourceFetcher":
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                follow_redirects=True,
+                timeout=httpx.Timeout(self.timeout, connect=settings.FETCH_CONNECT_TIMEOUT_SECONDS),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+                headers={"User-Agent": settings.FETCH_USER_AGENT},
+            )
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        if self._owns_client and self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _host_slot(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc.lower()
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(self.max_per_host)
+        return slot
+
+    async def fetch(self, request: FetchRequest) -> FetchResult:
+        """Fetch one URL under its host's cap; errors are returned as FAILED results"""
+        async with self._host_slot(request.url):
+            try:
+                return await asyncio.wait_for(self._download(request), self.timeout)
+            except asyncio.TimeoutError:
+                return FetchResult(request.url, FAILED, request.key, error=f"timed out after {self.timeout}s")
+            except (httpx.HTTPError, httpx.InvalidURL) as e:
+                return FetchResult(request.url, FAILED, request.key, error=f"{type(e).__name__}: {e}")
+            except OSError as e:
+                # e.g. the blob store's disk is full; one URL fails, the run goes on
+                return FetchResult(request.url, FAILED, request.key, error=f"{type(e).__name__}: {e}")
+
+    async def _download(self, request: FetchRequest) -> FetchResult:
+        headers = {}
+        if request.etag:
+            headers["If-None-Match"] = request.etag
+        if request.last_modified:
+            headers["If-Modified-Since"] = request.last_modified
+
+        async with self._client.stream("GET", request.url, headers=headers) as response:
+            result = FetchResult(
+                request.url,
+                FETCHED,
+                request.key,
+                status_code=response.status_code,
+                content_type=response.headers.get("Content-Type"),
+                etag=response.headers.get("ETag") or request.etag,
+                last_modified=response.headers.get("Last-Modified") or request.last_modified,
+                final_url=str(response.url),
+            )
+            if response.status_code == 304:
+                # Reading the empty body lets the connection go back to the pool
+                await response.aread()
+                result.status = NOT_MODIFIED
+                return result
+            if response.status_code >= 400:
+                result.status = FAILED
+                result.error = f"HTTP {response.status_code}"
+                return result
+
+            declared = response.headers.get("Content-Length")
+            if declared and declared.isdigit() and int(declared) > self.max_bytes:
+                result.status, result.error = FAILED, f"body of {declared} bytes exceeds {self.max_bytes}"
+                return result
+
+            body, blob, size = bytearray(), None, 0
+            try:
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        result.status, result.error = FAILED, f"body exceeds {self.max_bytes} bytes"
+                        return result
+                    # File writes and the fsync in commit run in a worker
+                    # thread so a slow disk does not stall the other downloads
+                    if blob is None and self.blob_store is not None and size > self.blob_threshold:
+                        blob = await asyncio.to_thread(self.blob_store.writer)
+                        await asyncio.to_thread(blob.write, body)
+                        body = None
+                    if blob is not None:
+                        await asyncio.to_thread(blob.write, chunk)
+                    else:
+                        body.extend(chunk)
+                if blob is not None:
+                    result.blob_ref = await asyncio.to_thread(blob.commit)
+                else:
+                    result.body = bytes(body)
+            finally:
+                if blob is not None:
+                    # Only an unlink, and it must also run when the download is cancelled
+                    blob.abort()
+            result.encoding = response.charset_encoding
+            return result
+
+    async def fetch_all(self, requests: Iterable[FetchRequest]) -> AsyncIterator[FetchResult]:
+        """
+        Fetch many URLs, yielding results as they complete.
+
+        A fixed pool of max_concurrency workers pulls from the request
+        iterable, so memory stays flat however many URLs are passed.
+        """
+        requests = iter(requests)
+        results: asyncio.Queue = asyncio.Queue(maxsize=self.max_concurrency * 2)
+
+        async def worker():
+            for request in requests:
+                await results.put(await self.fetch(request))
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.max_concurrency)]
+        done = asyncio.ensure_future(asyncio.gather(*workers))
+        try:
+            while not (done.done() and results.empty()):
+                getter = asyncio.ensure_future(results.get())
+                await asyncio.wait({getter, done}, return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    yield getter.result()
+                else:
+                    getter.cancel()
+            done.result()
+        finally:
+            for task in workers:
+                task.cancel()
+
+
+async def afetch_resource(url: str, etag: Optional[str]=None, last_modified: Optional[str]=None) -> FetchResult:
+    """Fetch a single URL"""
+    async with ResourceFetcher(max_concurrency=1) as fetcher:
+        return await fetcher.fetch(FetchRequest(url, etag=etag, last_modified=last_modified))
+
+
+def fetch_resource(url: str, etag: Optional[str]=None, last_modified: Optional[str]=None) -> FetchResult:
+    """Fetch a single URL from synchronous code; use afetch_resource inside an event loop"""
+    return run_sync(afetch_resource(url, etag, last_modified))
+
+
+def _write_batch(session, batch: List[dict]) -> None:
+    table = LearningResource.__table__
+    # SET expressions see the old row, so this compares against the stored hash
+    unchanged = table.c.content_hash.is_not_distinct_from(bindparam("new_content_hash"))
+    session.execute(
+        update(table)
+        .where(table.c.id == bindparam("resource_id"))
+        .values(
+            content=bindparam("new_content"),
+            file_path=bindparam("new_file_path"),
+            content_hash=bindparam("new_content_hash"),
+            source_metadata_json=bindparam("new_metadata"),
+            # Enrichment of the old material is dropped so the resource is enriched again
+            summary=case((unchanged, table.c.summary), else_=None),
+            key_concepts=case((unchanged, table.c.key_concepts), else_=None),
+            difficulty=case((unchanged, table.c.difficulty), else_=None),
+            updated_at=func.now(),
+        ),
+        batch,
+    )
+    # A page that now matches already enriched content reuses that enrichment
+    changed = [row["resource_id"] for row in batch if row["new_content_hash"] is not None]
+    if changed:
+        inherit_enrichments(session, resource_ids=changed)
+    session.commit()
+
+
+def _refresh_targets(session, stmt, page_size: int) -> Iterator[list]:
+    """Rows of stmt page_size at a time, each page a keyset query after the last id of the previous one"""
+    stmt = stmt.order_by(LearningResource.id).limit(page_size)
+    last_id = None
+    while True:
+        page = session.execute(stmt if last_id is None else stmt.where(LearningResource.id > last_id)).all()
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        last_id = page[-1].id
+
+
+async def arefresh_resources(
+    session,
+    learning_path_id: Optional[int]=None,
+    resource_ids: Optional[Iterable[int]]=None,
+    fetcher: Optional[ResourceFetcher]=None,
+    extract: Optional[Callable[[FetchResult], Optional[str]]]=None,
+) -> FetchReport:
+    """
+    Re-fetch resource URLs and store content that changed.
+
+    Target rows are read BULK_BATCH_SIZE at a time as the fetcher asks for
+    more URLs. Validators from the last fetch are sent with each request,
+    so pages answering 304 are skipped without a body or a database write.
+    Changed pages have their content, content_hash and source_metadata_json
+    (ETag, Last-Modified, status, time) written back in batches of
+    BULK_BATCH_SIZE, committing after each batch; when content_hash
+    changes, summary, key_concepts and difficulty are cleared in the same
+    statement, and content that was enriched before gets its stored
+    enrichment back through inherit_enrichments. Bodies the fetcher
+    streamed into the blob store are referenced from file_path instead of
+    being copied into content.
+
+    Args:
+        session: Session used for the reads and writes
+        learning_path_id: Only resources in this path
+        resource_ids: Only these resources
+        fetcher: ResourceFetcher to use, defaults to one built from settings
+        extract: Turns a fetched in-memory body into the stored content, defaults to the decoded text
+
+    Returns:
+        FetchReport with counts and per-resource errors
+    """
+    stmt = select(
+        LearningResource.id, LearningResource.url, LearningResource.file_path, LearningResource.source_metadata_json
+    ).where(LearningResource.url.is_not(None))
+    if learning_path_id is not None:
+        stmt = stmt.join(Module, Module.id == LearningResource.module_id).where(
+            Module.learning_path_id == learning_path_id
+        )
+    if resource_ids is not None:
+        stmt = stmt.where(LearningResource.id.in_(list(resource_ids)))
+    # (metadata, file_path) of requested resources until their result arrives
+    pending: Dict[int, tuple] = {}
+
+    def requests() -> Iterator[FetchRequest]:
+        for page in _refresh_targets(session, stmt, settings.BULK_BATCH_SIZE):
+            for row in page:
+                # Only fetcher-owned blob references are replaced; uploaded file paths are kept
+                pending[row.id] = (row.source_metadata_json or {}, None if is_blob_ref(row.file_path) else row.file_path)
+            yield from interleave_hosts(FetchRequest.for_resource(row.id, row.url, row.source_metadata_json) for row in page)
+
+    extract = extract or (lambda result: result.text)
+
+    report = FetchReport()
+    batch: List[dict] = []
+    async with (fetcher or ResourceFetcher()) as active:
+        async for result in active.fetch_all(requests()):
+            metadata, stored_file_path = pending.pop(result.key)
+            if result.status == NOT_MODIFIED:
+                report.not_modified += 1
+                continue
+            if result.status == FAILED:
+                report.failed[result.key] = result.error
+                continue
+            if result.blob_ref is not None:
+                content, file_path, content_hash = None, result.blob_ref, blob_digest(result.blob_ref)
+            else:
+                try:
+                    content = extract(result)
+                except Exception as e:
+                    report.failed[result.key] = f"extract failed: {e}"
+                    continue
+                file_path, content_hash = stored_file_path, compute_content_hash(content, result.url)
+            report.fetched += 1
+            batch.append({
+                "resource_id": result.key,
+                "new_content": content,
+                "new_file_path": file_path,
+                "new_content_hash": content_hash,
+                "new_metadata": {**metadata, **result.metadata()},
+            })
+            if len(batch) >= settings.BULK_BATCH_SIZE:
+                _write_batch(session, batch)
+                batch = []
+    if batch:
+        _write_batch(session, batch)
+    logger.info("Refreshed %d resources, %d unchanged, %d failed", report.fetched, report.not_modified, len(report.failed))
+    return report
+
+
+def refresh_resources(
+    session,
+    learning_path_id: Optional[int]=None,
+    resource_ids: Optional[Iterable[int]]=None,
+    fetcher: Optional[ResourceFetcher]=None,
+    extract: Optional[Callable[[FetchResult], Optional[str]]]=None,
+) -> FetchReport:
+    """Synchronous arefresh_resources, for scripts and jobs; use arefresh_resources inside an event loop"""
+    return run_sync(arefresh_resources(session, learning_path_id, resource_ids, fetcher, extract))
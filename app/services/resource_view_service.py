@@ -0,0 +1,115 @@
+from dataclasses import dataclass
+from typing import Optional, List, Dict, Iterable, Iterator
+from sqlalchemy import select
+from sqlalchemy.orm import load_only, undefer_group
+from ..models import Module, LearningResource
+from ..models.learning_resource_model import DETAIL_GROUP
+
+
+@dataclass(frozen=True)
+class ResourceSummary:
+    """The fields a resource listing shows, without content, summary or metadata"""
+    id: int
+    module_id: int
+    order_index: int
+    title: str
+    resource_type: str
+    url: Optional[str]
+
+
+# Columns in ResourceSummary field order. All of them precede content in the
+# table, so SQLite reads them without walking the overflow pages of a large
+# body; columns after it, even difficulty, cost as much as reading content.
+SUMMARY_COLUMNS = (
+    LearningResource.id,
+    LearningResource.module_id,
+    LearningResource.order_index,
+    LearningResource.title,
+    LearningResource.resource_type,
+    LearningResource.url,
+)
+
+
+def summary_query():
+    """SELECT of the summary columns, for callers adding their own filters"""
+    return select(*SUMMARY_COLUMNS)
+
+
+def summary_load_options():
+    """
+    Loader option restricting LearningResource entities to the summary columns.
+
+    For code that needs ORM objects rather than ResourceSummary rows, e.g.
+    select(LearningResource).options(summary_load_options()).
+    """
+    return load_only(
+        LearningResource.module_id,
+        LearningResource.order_index,
+        LearningResource.title,
+        LearningResource.resource_type,
+        LearningResource.url,
+    )
+
+
+def list_module_resources(session, module_id: int) -> List[ResourceSummary]:
+    """Summaries of a module's resources in order"""
+    stmt = (
+        summary_query()
+        .where(LearningResource.module_id == module_id)
+        .order_by(LearningResource.order_index)
+    )
+    return [ResourceSummary(*row) for row in session.execute(stmt)]
+
+
+def list_path_resources(session, learning_path_id: int) -> List[ResourceSummary]:
+    """Summaries of every resource in a learning path, in module then resource order"""
+    stmt = (
+        summary_query()
+        .join(Module, Module.id == LearningResource.module_id)
+        .where(Module.learning_path_id == learning_path_id)
+        .order_by(Module.order_index, LearningResource.order_index)
+    )
+    return [ResourceSummary(*row) for row in session.execute(stmt)]
+
+
+def iter_resource_summaries(
+    session,
+    module_ids: Optional[Iterable[int]]=None,
+    learning_path_id: Optional[int]=None,
+    chunk_size: int=1000,
+) -> Iterator[ResourceSummary]:
+    """
+    Stream summaries in module and resource order, chunk_size rows at a time.
+
+    Args:
+        session: Active session
+        module_ids: Only resources in these modules
+        learning_path_id: Only resources in this learning path
+        chunk_size: Rows fetched per round trip
+    """
+    stmt = (
+        summary_query()
+        .join(Module, Module.id == LearningResource.module_id)
+        .order_by(Module.learning_path_id, Module.order_index, LearningResource.order_index)
+        .execution_options(yield_per=chunk_size)
+    )
+    if module_ids is not None:
+        stmt = stmt.where(LearningResource.module_id.in_(list(module_ids)))
+    if learning_path_id is not None:
+        stmt = stmt.where(Module.learning_path_id == learning_path_id)
+    for row in session.execute(stmt):
+        yield ResourceSummary(*row)
+
+
+def get_resource_summaries(session, resource_ids: Iterable[int]) -> Dict[int, ResourceSummary]:
+    """Summaries by id; ids that do not exist are left out"""
+    resource_ids = list(set(resource_ids))
+    if not resource_ids:
+        return {}
+    stmt = summary_query().where(LearningResource.id.in_(resource_ids))
+    return {row.id: ResourceSummary(*row) for row in session.execute(stmt)}
+
+
+def get_resource_detail(session, resource_id: int) -> Optional[LearningResource]:
+    """A full LearningResource with its deferred columns loaded in the same query"""
+    return session.get(LearningResource, resource_id, options=[undefer_group(DETAIL_GROUP)])
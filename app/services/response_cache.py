@@ -0,0 +1,287 @@
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional, List, Union, Dict, Any, Tuple
+
+# (value, created_at) of a cached response, created_at in time.time() seconds
+CacheEntry = Tuple[str, float]
+
+
+def make_cache_key(
+    model: str,
+    system: Optional[Union[str, List[Dict[str, Any]]]],
+    prompt: Union[str, List[Dict[str, Any]]],
+    temperature: float,
+    max_tokens: int,
+) -> str:
+    """
+    Build a stable cache key for a Claude request.
+
+    Every argument that changes the completion is part of the key, so a
+    different model or sampling setting never serves a stale answer.
+    System and prompt may be strings or content-block lists.
+    """
+    payload = json.dumps(
+        [model, system, prompt, temperature, max_tokens],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache(ABC):
+    """
+    Interface for Claude response caches.
+
+    Subclasses store completion text by key and decide their own
+    expiry and eviction policy.
+    """
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.get_entry(key)
+        return None if entry is None else entry[0]
+
+    @abstractmethod
+    def get_entry(self, key: str) -> Optional[CacheEntry]:
+        """The value with the time it was first stored, so a copy can keep its age"""
+
+    @abstractmethod
+    def set(self, key: str, value: str, created_at: Optional[float]=None) -> None:
+        """Store value; created_at defaults to now and is passed when copying an entry between caches"""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Drop every entry"""
+
+
+class LRUResponseCache(ResponseCache):
+    """
+    In-process LRU cache with a TTL.
+
+    Args:
+        max_entries: Least recently used entries are evicted past this size
+        ttl_seconds: Entries older than this are treated as misses, None disables expiry
+    """
+
+    def __init__(self, max_entries: int=1024, ttl_seconds: Optional[float]=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_entry(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self.ttl_seconds is not None and time.time() - entry[1] > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value: str, created_at: Optional[float]=None) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.time() if created_at is None else created_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteResponseCache(ResponseCache):
+    """
+    On-disk cache backed by a single SQLite file, shared across runs.
+
+    Reads do not write: access times of hits are buffered and written in
+    one executemany UPDATE every touch_batch hits, or before eviction
+    needs them. The row count is tracked in memory, and expired and
+    surplus rows are deleted when the count passes max_entries or every
+    maintenance_interval seconds, so a set is a single INSERT.
+
+    Args:
+        path: SQLite file location
+        max_entries: Least recently used rows are deleted past this size
+        ttl_seconds: Rows older than this are treated as misses, None disables expiry
+        touch_batch: Hits buffered before their access times are written
+        maintenance_interval: Seconds between expiry sweeps, which also resync the row count
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int=100_000,
+        ttl_seconds: Optional[float]=None,
+        touch_batch: int=256,
+        maintenance_interval: float=60.0,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.touch_batch = touch_batch
+        self.maintenance_interval = maintenance_interval
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_response_cache_accessed_at ON response_cache (accessed_at)"
+        )
+        self._conn.commit()
+        self._touched: Dict[str, float] = {}
+        self._count = self._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+        self._next_maintenance = time.time() + maintenance_interval
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+    def get_entry(self, key: str) -> Optional[CacheEntry]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self._count -= self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,)).rowcount
+                self._conn.commit()
+                self._touched.pop(key, None)
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= self.touch_batch:
+                self._flush_touched()
+                self._conn.commit()
+            return value, created_at
+
+    def set(self, key: str, value: str, created_at: Optional[float]=None) -> None:
+        now = time.time()
+        created_at = now if created_at is None else created_at
+        with self._lock:
+            inserted = self._conn.execute(
+                "INSERT OR IGNORE INTO response_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, created_at, now)
+            ).rowcount
+            if inserted:
+                self._count += 1
+            else:
+                self._conn.execute(
+                    "UPDATE response_cache SET value = ?, created_at = ?, accessed_at = ? WHERE key = ?",
+                    (value, created_at, now, key)
+                )
+            self._touched.pop(key, None)
+            if self._count > self.max_entries or now >= self._next_maintenance:
+                self._evict(now)
+            self._conn.commit()
+
+    def _flush_touched(self) -> None:
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE response_cache SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def _evict(self, now: float) -> None:
+        # Least recently used needs the buffered access times on disk first
+        self._flush_touched()
+        if self.ttl_seconds is not None:
+            self._conn.execute(
+                "DELETE FROM response_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+            )
+        # Other processes may share the file, so resync rather than trust the running count
+        self._count = self._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+        overflow = self._count - self.max_entries
+        if overflow > 0:
+            # Free an extra 1% so the next sets do not each trigger an eviction
+            overflow += self.max_entries // 100
+            self._count -= self._conn.execute(
+                """
+                DELETE FROM response_cache WHERE key IN (
+                    SELECT key FROM response_cache ORDER BY accessed_at ASC LIMIT ?
+                )
+                """,
+                (overflow,)
+            ).rowcount
+        self._next_maintenance = now + self.maintenance_interval
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM response_cache")
+            self._conn.commit()
+            self._touched.clear()
+            self._count = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+            self._conn.close()
+
+
+class TieredResponseCache(ResponseCache):
+    """
+    Chains caches from fastest to slowest.
+
+    A hit in a slower tier is copied into every faster tier, so repeated
+    reads are served from memory. The copy keeps the original created_at,
+    so it expires when the entry it came from does.
+    """
+
+    def __init__(self, tiers: List[ResponseCache]):
+        self.tiers = tiers
+
+    def get_entry(self, key: str) -> Optional[CacheEntry]:
+        for index, tier in enumerate(self.tiers):
+            entry = tier.get_entry(key)
+            if entry is not None:
+                for faster in self.tiers[:index]:
+                    faster.set(key, *entry)
+                return entry
+        return None
+
+    def set(self, key: str, value: str, created_at: Optional[float]=None) -> None:
+        created_at = time.time() if created_at is None else created_at
+        for tier in self.tiers:
+            tier.set(key, value, created_at)
+
+    def clear(self) -> None:
+        for tier in self.tiers:
+            tier.clear()
+
+
+def build_default_cache(
+    path: Optional[str]=None,
+    memory_entries: int=1024,
+    disk_entries: int=100_000,
+    ttl_seconds: Optional[float]=None,
+) -> ResponseCache:
+    """
+    Build the standard cache: an LRU tier, plus a SQLite tier when a path is given.
+    """
+    memory = LRUResponseCache(max_entries=memory_entries, ttl_seconds=ttl_seconds)
+    if path is None:
+        return memory
+    disk = SQLiteResponseCache(path, max_entries=disk_entries, ttl_seconds=ttl_seconds)
+    return TieredResponseCache([memory, disk])
@@ -0,0 +1,142 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, List, Tuple
+from sqlalchemy import select, delete, insert, func, and_, or_
+from ..models import QuizAttempt, QuizQuestion, LearningResource, Module, QuestionReviewState
+from .bulk_loader import BulkLoader
+
+# (next_review_date, question id) of the last row on a page
+ReviewCursor = Tuple[datetime, int]
+
+
+@dataclass
+class ReviewPage:
+    """A page of due questions; pass next_cursor back as after to fetch the next page"""
+    items: List[QuestionReviewState]
+    next_cursor: Optional[ReviewCursor]
+
+
+def get_due_questions(
+    session,
+    as_of: Optional[datetime]=None,
+    limit: int=50,
+    after: Optional[ReviewCursor]=None,
+    learning_path_id: Optional[int]=None,
+) -> ReviewPage:
+    """
+    Next questions due for review, most overdue first.
+
+    Reads question_review_states through ix_review_states_due with keyset
+    pagination, so the cost depends on the page size and not on attempt
+    history. Questions that were never attempted have no state and are
+    not returned.
+
+    Args:
+        session: Active session
+        as_of: Due cutoff, defaults to now
+        limit: Maximum questions per page
+        after: next_cursor from the previous page
+        learning_path_id: Only questions from this path
+
+    Returns:
+        ReviewPage with next_cursor None on the last page
+    """
+    as_of = as_of or datetime.utcnow()
+    stmt = (
+        select(QuestionReviewState)
+        .where(QuestionReviewState.next_review_date <= as_of)
+        .order_by(QuestionReviewState.next_review_date, QuestionReviewState.question_id)
+        .limit(limit)
+    )
+    if after is not None:
+        next_review_date, question_id = after
+        stmt = stmt.where(or_(
+            QuestionReviewState.next_review_date > next_review_date,
+            and_(QuestionReviewState.next_review_date == next_review_date, QuestionReviewState.question_id > question_id),
+        ))
+    if learning_path_id is not None:
+        stmt = (
+            stmt.join(QuizQuestion, QuizQuestion.id == QuestionReviewState.question_id)
+            .join(LearningResource, LearningResource.id == QuizQuestion.learning_resource_id)
+            .join(Module, Module.id == LearningResource.module_id)
+            .where(Module.learning_path_id == learning_path_id)
+        )
+
+    items = list(session.scalars(stmt))
+    next_cursor = (items[-1].next_review_date, items[-1].question_id) if len(items) == limit else None
+    return ReviewPage(items, next_cursor)
+
+
+def count_due_questions(session, as_of: Optional[datetime]=None) -> int:
+    """Number of questions due at as_of, counted from the due-date index"""
+    as_of = as_of or datetime.utcnow()
+    return session.scalar(
+        select(func.count()).select_from(QuestionReviewState).where(QuestionReviewState.next_review_date <= as_of)
+    )
+
+
+def store_review_states(session, rows: List[dict]) -> int:
+    """
+    Upsert review states keyed on question_id, e.g. after a bulk SM-2 recompute.
+
+    Args:
+        session: Active session; the caller commits
+        rows: Dicts with question_id and the QuestionReviewState columns
+
+    Returns:
+        Number of rows written
+    """
+    loader = BulkLoader(session, commit_every_batch=False)
+    return loader.load(QuestionReviewState, rows, upsert_on=("question_id",))
+
+
+def rebuild_review_states(session) -> int:
+    """
+    Recompute every review state from attempt history.
+
+    Repairs drift after attempts written outside the ORM. Uses one
+    windowed INSERT ... SELECT over quiz_attempts; the caller commits.
+
+    Returns:
+        Number of review states written
+    """
+    ranked = select(
+        QuizAttempt.id,
+        QuizAttempt.question_id,
+        QuizAttempt.attempted_at,
+        QuizAttempt.next_review_date,
+        QuizAttempt.ease_factor,
+        QuizAttempt.repetition_count,
+        QuizAttempt.interval_days,
+        func.row_number().over(
+            partition_by=QuizAttempt.question_id,
+            order_by=(QuizAttempt.attempted_at.desc(), QuizAttempt.id.desc()),
+        ).label("position"),
+    ).subquery()
+    latest = select(
+        ranked.c.question_id,
+        ranked.c.id,
+        ranked.c.attempted_at,
+        ranked.c.next_review_date,
+        ranked.c.ease_factor,
+        ranked.c.repetition_count,
+        ranked.c.interval_days,
+    ).where(ranked.c.position == 1)
+
+    table = QuestionReviewState.__table__
+    session.execute(delete(table))
+    result = session.execute(
+        insert(table).from_select(
+            [
+                "question_id",
+                "last_attempt_id",
+                "last_attempted_at",
+                "next_review_date",
+                "ease_factor",
+                "repetition_count",
+                "interval_days",
+            ],
+            latest,
+        )
+    )
+    return result.rowcount
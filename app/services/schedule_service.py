@@ -0,0 +1,118 @@
+import math
+from datetime import date, timedelta
+from typing import List, Dict, Any
+from sqlalchemy import select, insert, exists
+from sqlalchemy.dialects import sqlite, postgresql
+from ..models import Module, LearningResource, Schedule
+from ..models.schedule_model import DEFAULT_DELIVERY_TIME, delivery_datetime
+
+
+def plan_schedule(
+    resources: List[tuple],
+    start_date: date,
+    resources_per_day: int,
+    scheduled_time: str=DEFAULT_DELIVERY_TIME,
+) -> List[Dict[str, Any]]:
+    """
+    Lay out resources over days, one module after another.
+
+    Each module starts on a fresh day. A module with duration_days spans
+    exactly that many days: its resources are packed into the window,
+    raising the daily count when resources_per_day would overrun it, and
+    the next module starts once the window ends. That holds for a module
+    without resources too, which still takes up its duration_days.
+
+    Args:
+        resources: (resource id, module id, duration_days) rows in delivery
+            order; a None resource id stands for a module without resources
+        start_date: First delivery day
+        resources_per_day: Resources delivered per day
+        scheduled_time: Time of day for every delivery, as HH:MM
+
+    Returns:
+        Schedule rows as column dicts
+    """
+    if resources_per_day < 1:
+        raise ValueError("resources_per_day must be at least 1")
+
+    modules: Dict[int, List[int]] = {}
+    durations: Dict[int, int] = {}
+    for resource_id, module_id, duration_days in resources:
+        resource_ids = modules.setdefault(module_id, [])
+        if resource_id is not None:
+            resource_ids.append(resource_id)
+        durations[module_id] = duration_days
+
+    rows = []
+    day = start_date
+    for module_id, resource_ids in modules.items():
+        duration = durations[module_id]
+        per_day = resources_per_day
+        if duration:
+            per_day = max(per_day, math.ceil(len(resource_ids) / duration))
+        for index, resource_id in enumerate(resource_ids):
+            scheduled_at = delivery_datetime(day + timedelta(days=index // per_day), scheduled_time)
+            rows.append({
+                "learning_resource_id": resource_id,
+                "scheduled_date": scheduled_at,
+                "original_scheduled_date": scheduled_at,
+            })
+        day += timedelta(days=duration or math.ceil(len(resource_ids) / per_day))
+    return rows
+
+
+def create_schedule(
+    session,
+    learning_path_id: int,
+    start_date: date,
+    resources_per_day: int=1,
+    scheduled_time: str=DEFAULT_DELIVERY_TIME,
+) -> int:
+    """
+    Schedule every resource of a learning path in one pass; the caller commits.
+
+    Resources are read in module order_index then resource order_index with
+    one query and written with a single executemany INSERT. The whole path
+    is laid out every time, so each resource gets the same slot on every
+    run, but only resources without any schedule, delivered or not, are
+    written: running it again only fills in resources added since. Rows
+    that would collide with uq_resource_date are skipped on SQLite and
+    PostgreSQL.
+
+    Args:
+        session: Active session
+        learning_path_id: Path to schedule
+        start_date: First delivery day
+        resources_per_day: Resources delivered per day
+        scheduled_time: Time of day for every delivery, as HH:MM
+
+    Returns:
+        Number of schedule rows submitted
+    """
+    scheduled = exists().where(Schedule.learning_resource_id == LearningResource.id)
+    # Outer join so modules without resources still take up their days
+    resources = session.execute(
+        select(LearningResource.id, Module.id, Module.duration_days, scheduled)
+        .select_from(Module)
+        .outerjoin(LearningResource, LearningResource.module_id == Module.id)
+        .where(Module.learning_path_id == learning_path_id)
+        .order_by(Module.order_index, Module.id, LearningResource.order_index, LearningResource.id)
+    ).all()
+
+    already_scheduled = {resource_id for resource_id, _, _, is_scheduled in resources if is_scheduled}
+    rows = [
+        row for row in plan_schedule([resource[:3] for resource in resources], start_date, resources_per_day, scheduled_time)
+        if row["learning_resource_id"] not in already_scheduled
+    ]
+    if not rows:
+        return 0
+
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        stmt = sqlite.insert(Schedule).on_conflict_do_nothing(index_elements=["learning_resource_id", "scheduled_date"])
+    elif dialect == "postgresql":
+        stmt = postgresql.insert(Schedule).on_conflict_do_nothing(constraint="uq_resource_date")
+    else:
+        stmt = insert(Schedule)
+    session.execute(stmt, rows)
+    return len(rows)
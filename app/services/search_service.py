@@ -0,0 +1,259 @@
+import re
+import html
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Optional, List
+from sqlalchemy import text
+from ..models.search_index import (
+    FTS_TABLE,
+    PG_SEARCH_VECTOR,
+    PG_SEARCH_INDEX,
+    SQLITE_SEARCH_DDL,
+    POSTGRES_SEARCH_DDL,
+)
+
+HIGHLIGHT_START = "<b>"
+HIGHLIGHT_END = "</b>"
+SNIPPET_ELLIPSIS = "…"
+SNIPPET_TOKENS = 16
+# Private-use characters the database marks matches with; the snippet is
+# HTML-escaped before they are swapped for the real highlight tags
+_MARK_START = "\ue000"
+_MARK_END = "\ue001"
+
+# Column weights for bm25(), in FTS table column order: title, key_concepts, summary, content
+SQLITE_BM25_WEIGHTS = (10.0, 6.0, 4.0, 1.0)
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+@dataclass
+class SearchHit:
+    """One ranked search result; higher score is a better match"""
+    resource_id: int
+    module_id: int
+    title: str
+    resource_type: str
+    url: Optional[str]
+    score: float
+    snippet: str
+
+
+def fts5_query(query: str) -> str:
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+
+    Every word must match, operators and punctuation are treated as plain
+    text, and the last word also matches as a prefix so results update
+    while the user is typing.
+    """
+    tokens = _TOKEN.findall(query)
+    if not tokens:
+        return ""
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def pg_tsquery(query: str) -> str:
+    """
+    Turn free text into a safe to_tsquery expression matching fts5_query:
+    every word must match and the last one also matches as a prefix.
+    """
+    tokens = _TOKEN.findall(query)
+    if not tokens:
+        return ""
+    terms = [f"'{token}'" for token in tokens]
+    terms[-1] += ":*"
+    return " & ".join(terms)
+
+
+def highlight(snippet: Optional[str]) -> str:
+    """HTML-escape a marked snippet, then wrap the matches in the highlight tags"""
+    return (
+        html.escape(snippet or "", quote=False)
+        .replace(_MARK_START, HIGHLIGHT_START)
+        .replace(_MARK_END, HIGHLIGHT_END)
+    )
+
+
+def _hits(rows) -> List[SearchHit]:
+    return [SearchHit(*row[:-1], highlight(row[-1])) for row in rows]
+
+
+def _filters(module_id: Optional[int], learning_path_id: Optional[int]):
+    clauses, params = [], {}
+    if module_id is not None:
+        clauses.append("r.module_id = :module_id")
+        params["module_id"] = module_id
+    if learning_path_id is not None:
+        clauses.append("r.module_id IN (SELECT id FROM modules WHERE learning_path_id = :learning_path_id)")
+        params["learning_path_id"] = learning_path_id
+    return "".join(f" AND {clause}" for clause in clauses), params
+
+
+class SearchBackend(ABC):
+    """Full-text search over learning resources for one database dialect"""
+
+    @abstractmethod
+    def search(
+        self,
+        session,
+        query: str,
+        module_id: Optional[int]=None,
+        learning_path_id: Optional[int]=None,
+        limit: int=20,
+        offset: int=0,
+    ) -> List[SearchHit]:
+        """Ranked hits for query; see search_resources"""
+
+    @abstractmethod
+    def create_index(self, session) -> None:
+        """Create the index on a database whose tables already exist"""
+
+    @abstractmethod
+    def rebuild_index(self, session) -> None:
+        """Re-index every resource, e.g. after restoring a backup"""
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """
+    FTS5 backend: an external-content index over learning_resources kept in
+    sync by triggers, ranked with weighted BM25.
+    """
+
+    def search(self, session, query, module_id=None, learning_path_id=None, limit=20, offset=0):
+        match = fts5_query(query)
+        if not match:
+            return []
+        where, params = _filters(module_id, learning_path_id)
+        weights = ", ".join(str(weight) for weight in SQLITE_BM25_WEIGHTS)
+        rows = session.execute(
+            text(
+                f"""
+                SELECT r.id, r.module_id, r.title, r.resource_type, r.url,
+                       -bm25({FTS_TABLE}, {weights}) AS score,
+                       snippet({FTS_TABLE}, -1, :start, :end, :ellipsis, :tokens) AS snippet
+                FROM {FTS_TABLE}
+                JOIN learning_resources r ON r.id = {FTS_TABLE}.rowid
+                WHERE {FTS_TABLE} MATCH :match{where}
+                ORDER BY bm25({FTS_TABLE}, {weights})
+                LIMIT :limit OFFSET :offset
+                """
+            ),
+            dict(
+                params,
+                match=match,
+                start=_MARK_START,
+                end=_MARK_END,
+                ellipsis=SNIPPET_ELLIPSIS,
+                tokens=SNIPPET_TOKENS,
+                limit=limit,
+                offset=offset,
+            ),
+        )
+        return _hits(rows)
+
+    def create_index(self, session):
+        for statement in SQLITE_SEARCH_DDL:
+            session.execute(text(statement))
+        self.rebuild_index(session)
+
+    def rebuild_index(self, session):
+        session.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    tsvector backend: a GIN expression index over the weighted document,
+    ranked with ts_rank_cd and highlighted with ts_headline.
+
+    Only the page of hits is highlighted, since ts_headline re-parses the
+    document text.
+    """
+
+    def search(self, session, query, module_id=None, learning_path_id=None, limit=20, offset=0):
+        tsquery = pg_tsquery(query)
+        if not tsquery:
+            return []
+        where, params = _filters(module_id, learning_path_id)
+        rows = session.execute(
+            text(
+                f"""
+                WITH hits AS (
+                    SELECT r.id, r.module_id, r.title, r.resource_type, r.url,
+                           coalesce(r.summary, '') || ' ' || coalesce(r.content, '') AS body,
+                           ts_rank_cd({PG_SEARCH_VECTOR}, q.query) AS score,
+                           q.query
+                    FROM learning_resources r,
+                         to_tsquery('english', :query) AS q(query)
+                    WHERE ({PG_SEARCH_VECTOR}) @@ q.query{where}
+                    ORDER BY score DESC, r.id
+                    LIMIT :limit OFFSET :offset
+                )
+                SELECT id, module_id, title, resource_type, url, score,
+                       ts_headline('english', body, query, :options) AS snippet
+                FROM hits
+                ORDER BY score DESC, id
+                """
+            ),
+            dict(
+                params,
+                query=tsquery,
+                options=(
+                    f'StartSel="{_MARK_START}", StopSel="{_MARK_END}", '
+                    f"MaxWords={SNIPPET_TOKENS}, MinWords={SNIPPET_TOKENS // 2}, "
+                    f"FragmentDelimiter={SNIPPET_ELLIPSIS}, MaxFragments=2"
+                ),
+                limit=limit,
+                offset=offset,
+            ),
+        )
+        return _hits(rows)
+
+    def create_index(self, session):
+        for statement in POSTGRES_SEARCH_DDL:
+            session.execute(text(statement))
+
+    def rebuild_index(self, session):
+        session.execute(text(f"REINDEX INDEX {PG_SEARCH_INDEX}"))
+
+
+BACKENDS = {
+    "sqlite": SQLiteSearchBackend,
+    "postgresql": PostgresSearchBackend,
+}
+
+
+def get_search_backend(session) -> SearchBackend:
+    """Backend for the session's database dialect"""
+    dialect = session.get_bind().dialect.name
+    if dialect not in BACKENDS:
+        raise ValueError(f"Full-text search is not supported for the {dialect} dialect")
+    return BACKENDS[dialect]()
+
+
+def search_resources(
+    session,
+    query: str,
+    module_id: Optional[int]=None,
+    learning_path_id: Optional[int]=None,
+    limit: int=20,
+    offset: int=0,
+) -> List[SearchHit]:
+    """
+    Ranked full-text search over resource title, key concepts, summary and content.
+
+    Args:
+        session: Active session
+        query: Free text typed by the user
+        module_id: Only resources in this module
+        learning_path_id: Only resources in this learning path
+        limit: Maximum hits
+        offset: Hits to skip, for paging
+
+    Returns:
+        SearchHit list, best match first, with HTML-escaped snippets whose
+        matches are wrapped in HIGHLIGHT_START and HIGHLIGHT_END
+    """
+    return get_search_backend(session).search(session, query, module_id, learning_path_id, limit, offset)
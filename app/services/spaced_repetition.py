@@ -0,0 +1,310 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Iterable
+import numpy as np
+from sqlalchemy import select, update, bindparam, func
+from ..models import QuizAttempt, QuizQuestion, LearningResource, Module
+from .review_state_service import store_review_states
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+# Quality grades at or above this count as a successful recall
+PASSING_QUALITY = 3
+
+
+def format_ease(ease: float) -> str:
+    """QuizAttempt.ease_factor is a string column"""
+    return f"{ease:.2f}"
+
+
+def parse_ease(ease_factor: Optional[str]) -> float:
+    try:
+        return float(ease_factor)
+    except (TypeError, ValueError):
+        return DEFAULT_EASE
+
+
+def attempt_quality(is_correct, confidence_level):
+    """
+    SM-2 quality grade (0-5) from correctness and a 0-1 confidence level.
+
+    Correct answers grade 3-5 with confidence, wrong answers 0-2, so a
+    confident miss still counts as a near recall. Works on scalars and
+    NumPy arrays alike.
+    """
+    confidence = np.clip(np.nan_to_num(np.asarray(confidence_level, dtype=float), nan=0.5), 0.0, 1.0)
+    grade = np.rint(2 * confidence) + np.where(np.asarray(is_correct, dtype=bool), 3, 0)
+    return grade.astype(np.int64)
+
+
+def sm2_step(ease, repetitions, interval, quality):
+    """
+    One SM-2 review applied elementwise.
+
+    Returns:
+        (ease, repetitions, interval) after the review
+    """
+    miss = 5 - quality
+    ease = np.maximum(MIN_EASE, ease + (0.1 - miss * (0.08 + miss * 0.02)))
+    passed = quality >= PASSING_QUALITY
+    repetitions = np.where(passed, repetitions + 1, 0)
+    interval = np.where(
+        repetitions <= 1, 1,
+        np.where(repetitions == 2, 6, np.rint(interval * ease)),
+    ).astype(np.int64)
+    return ease, repetitions, interval
+
+
+@dataclass
+class ReviewState:
+    """Scheduling state after a question's latest attempt"""
+    ease_factor: float = DEFAULT_EASE
+    repetition_count: int = 0
+    interval_days: int = 0
+    next_review_date: Optional[datetime] = None
+
+    @classmethod
+    def from_attempt(cls, attempt: Optional[QuizAttempt]) -> "ReviewState":
+        if attempt is None:
+            return cls()
+        return cls(
+            ease_factor=parse_ease(attempt.ease_factor),
+            repetition_count=attempt.repetition_count or 0,
+            interval_days=attempt.interval_days or 0,
+            next_review_date=attempt.next_review_date,
+        )
+
+    def review(self, is_correct: bool, confidence_level: float, attempted_at: datetime) -> "ReviewState":
+        """State after one more attempt"""
+        quality = attempt_quality(is_correct, confidence_level)
+        ease, repetitions, interval = sm2_step(
+            np.float64(self.ease_factor), np.int64(self.repetition_count), np.int64(self.interval_days), quality
+        )
+        return ReviewState(
+            ease_factor=round(float(ease), 2),
+            repetition_count=int(repetitions),
+            interval_days=int(interval),
+            next_review_date=attempted_at + timedelta(days=int(interval)),
+        )
+
+
+@dataclass
+class DeckReview:
+    """Columnar result of a bulk recompute, one entry per question"""
+    question_ids: np.ndarray
+    ease_factor: np.ndarray
+    repetition_count: np.ndarray
+    interval_days: np.ndarray
+    next_review_date: np.ndarray
+    attempts_updated: int = 0
+
+    def __len__(self) -> int:
+        return len(self.question_ids)
+
+    def due(self, as_of: datetime) -> np.ndarray:
+        """Question ids whose next review is at or before as_of"""
+        return self.question_ids[self.next_review_date <= np.datetime64(as_of)]
+
+
+def compute_reviews(question_ids, attempted_at, is_correct, confidence_level):
+    """
+    Replay SM-2 over attempt history for many questions at once.
+
+    Inputs are parallel arrays sorted by question then attempt time. The
+    recurrence is sequential within a question, so rows are processed one
+    attempt rank at a time: step k updates the k-th attempt of every
+    question together, and the loop runs only as many times as the
+    longest history.
+
+    Returns:
+        (ease, repetitions, interval, next_review) arrays aligned with the inputs
+    """
+    question_ids = np.asarray(question_ids, dtype=np.int64)
+    count = len(question_ids)
+    attempted_at = np.asarray(attempted_at, dtype="datetime64[us]")
+    quality = attempt_quality(is_correct, confidence_level)
+    if count == 0:
+        return np.empty(0), np.empty(0, np.int64), np.empty(0, np.int64), attempted_at
+
+    first = np.r_[True, question_ids[1:] != question_ids[:-1]]
+    starts = np.flatnonzero(first)
+    group = np.cumsum(first) - 1
+    rank = np.arange(count) - starts[group]
+
+    ease = np.full(len(starts), DEFAULT_EASE)
+    repetitions = np.zeros(len(starts), dtype=np.int64)
+    interval = np.zeros(len(starts), dtype=np.int64)
+    out_ease = np.empty(count)
+    out_repetitions = np.empty(count, dtype=np.int64)
+    out_interval = np.empty(count, dtype=np.int64)
+
+    order = np.argsort(rank, kind="stable")
+    bounds = np.searchsorted(rank[order], np.arange(rank.max() + 2))
+    for step in range(len(bounds) - 1):
+        rows = order[bounds[step]:bounds[step + 1]]
+        groups = group[rows]
+        ease[groups], repetitions[groups], interval[groups] = sm2_step(
+            ease[groups], repetitions[groups], interval[groups], quality[rows]
+        )
+        out_ease[rows] = ease[groups]
+        out_repetitions[rows] = repetitions[groups]
+        out_interval[rows] = interval[groups]
+
+    next_review = attempted_at + out_interval.astype("timedelta64[D]")
+    return out_ease, out_repetitions, out_interval, next_review
+
+
+def recompute_deck(
+    session,
+    learning_path_id: Optional[int]=None,
+    question_ids: Optional[Iterable[int]]=None,
+    write_back: bool=True,
+) -> DeckReview:
+    """
+    Recompute ease, interval and next review for every attempt in a deck.
+
+    History is read in one ordered query into NumPy columns, replayed with
+    compute_reviews and, with write_back, rows whose stored values differ
+    are saved with a single executemany UPDATE keyed on the attempt id and
+    the matching question_review_states rows are upserted; the caller
+    commits.
+
+    Args:
+        session: Active session
+        learning_path_id: Limit to questions of this path
+        question_ids: Limit to these questions
+        write_back: Store the computed values on each QuizAttempt row
+
+    Returns:
+        DeckReview with the state after each question's latest attempt
+    """
+    stmt = select(
+        QuizAttempt.id,
+        QuizAttempt.question_id,
+        QuizAttempt.attempted_at,
+        QuizAttempt.is_correct,
+        QuizAttempt.confidence_level,
+        QuizAttempt.ease_factor,
+        QuizAttempt.repetition_count,
+        QuizAttempt.interval_days,
+        QuizAttempt.next_review_date,
+    ).order_by(QuizAttempt.question_id, QuizAttempt.attempted_at, QuizAttempt.id)
+    if learning_path_id is not None:
+        stmt = (
+            stmt.join(QuizQuestion, QuizQuestion.id == QuizAttempt.question_id)
+            .join(LearningResource, LearningResource.id == QuizQuestion.learning_resource_id)
+            .join(Module, Module.id == LearningResource.module_id)
+            .where(Module.learning_path_id == learning_path_id)
+        )
+    if question_ids is not None:
+        stmt = stmt.where(QuizAttempt.question_id.in_(list(question_ids)))
+
+    rows = session.execute(stmt).all()
+    count = len(rows)
+    attempt_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=count)
+    questions = np.fromiter((row[1] for row in rows), dtype=np.int64, count=count)
+    attempted_at = np.array([row[2] for row in rows], dtype="datetime64[us]")
+    is_correct = np.fromiter((bool(row[3]) for row in rows), dtype=bool, count=count)
+    confidence = np.array([row[4] for row in rows], dtype=float)
+
+    ease, repetitions, interval, next_review = compute_reviews(questions, attempted_at, is_correct, confidence)
+
+    last = np.flatnonzero(np.r_[questions[1:] != questions[:-1], True]) if count else np.empty(0, np.int64)
+    updated = 0
+    if write_back and count:
+        # Only rows whose stored state differs are written, so a rerun is nearly free
+        stored_ease = np.array([parse_ease(row[5]) for row in rows])
+        stored_repetitions = np.array([-1 if row[6] is None else row[6] for row in rows], dtype=np.int64)
+        stored_interval = np.array([-1 if row[7] is None else row[7] for row in rows], dtype=np.int64)
+        stored_next = np.array([row[8] for row in rows], dtype="datetime64[us]")
+        changed = np.flatnonzero(
+            (np.abs(stored_ease - np.round(ease, 2)) > 0.001)
+            | (stored_repetitions != repetitions)
+            | (stored_interval != interval)
+            | (stored_next != next_review)
+        )
+        if len(changed):
+            table = QuizAttempt.__table__
+            session.execute(
+                update(table)
+                .where(table.c.id == bindparam("attempt_id"))
+                .values(
+                    ease_factor=bindparam("ease"),
+                    repetition_count=bindparam("repetitions"),
+                    interval_days=bindparam("interval"),
+                    next_review_date=bindparam("next_review"),
+                    updated_at=func.now(),
+                ),
+                [
+                    {"attempt_id": attempt_id, "ease": format_ease(attempt_ease), "repetitions": attempt_repetitions,
+                     "interval": attempt_interval, "next_review": attempt_next}
+                    for attempt_id, attempt_ease, attempt_repetitions, attempt_interval, attempt_next in zip(
+                        attempt_ids[changed].tolist(), ease[changed].tolist(), repetitions[changed].tolist(),
+                        interval[changed].tolist(), next_review[changed].astype(object).tolist(),
+                    )
+                ],
+            )
+            updated = len(changed)
+
+            # Keep question_review_states in step for questions whose latest attempt changed
+            latest_changed = np.intersect1d(changed, last)
+            store_review_states(session, [
+                {"question_id": question_id, "last_attempt_id": attempt_id, "last_attempted_at": attempt_time,
+                 "next_review_date": attempt_next, "ease_factor": format_ease(attempt_ease),
+                 "repetition_count": attempt_repetitions, "interval_days": attempt_interval}
+                for question_id, attempt_id, attempt_time, attempt_next, attempt_ease, attempt_repetitions, attempt_interval in zip(
+                    questions[latest_changed].tolist(), attempt_ids[latest_changed].tolist(),
+                    attempted_at[latest_changed].astype(object).tolist(),
+                    next_review[latest_changed].astype(object).tolist(), ease[latest_changed].tolist(),
+                    repetitions[latest_changed].tolist(), interval[latest_changed].tolist(),
+                )
+            ])
+
+    return DeckReview(
+        question_ids=questions[last],
+        ease_factor=np.round(ease[last], 2),
+        repetition_count=repetitions[last],
+        interval_days=interval[last],
+        next_review_date=next_review[last],
+        attempts_updated=updated,
+    )
+
+
+def record_attempt(
+    session,
+    question_id: int,
+    user_answer: str,
+    is_correct: bool,
+    time_taken_secs: int,
+    confidence_level: float,
+    attempted_at: Optional[datetime]=None,
+) -> QuizAttempt:
+    """
+    Incremental path for live quizzes: schedule one new attempt from the previous one.
+
+    Reads only the question's latest attempt, so the cost is independent of
+    history length. The attempt is added to the session; the caller commits.
+    """
+    # Stored timestamps are naive UTC
+    attempted_at = attempted_at or datetime.now(timezone.utc).replace(tzinfo=None)
+    previous = session.scalar(
+        select(QuizAttempt)
+        .where(QuizAttempt.question_id == question_id)
+        .order_by(QuizAttempt.attempted_at.desc(), QuizAttempt.id.desc())
+        .limit(1)
+    )
+    state = ReviewState.from_attempt(previous).review(is_correct, confidence_level, attempted_at)
+    attempt = QuizAttempt.create(
+        question_id=question_id,
+        user_answer=user_answer,
+        is_correct=is_correct,
+        attempted_at=attempted_at,
+        time_taken_secs=time_taken_secs,
+        confidence_level=confidence_level,
+        next_review_date=state.next_review_date,
+        repetition_count=state.repetition_count,
+        ease_factor=format_ease(state.ease_factor),
+        interval_days=state.interval_days,
+    )
+    session.add(attempt)
+    return attempt
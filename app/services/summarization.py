@@ -0,0 +1,243 @@
+import re
+import hashlib
+from typing import Optional, List, Dict, Any
+from .claude_service import ClaudeService, ClaudeServiceError, parse_json_response
+from .response_cache import ResponseCache, LRUResponseCache
+from .blob_store import load_resource_text
+from .client_registry import run_sync
+
+# Bump when the chunk prompt changes so cached chunk summaries are not reused
+CHUNK_PROMPT_VERSION = "1"
+
+CHUNK_PROMPT = """Summarize this section of the learning resource "{title}" (part {index} of {total}).
+Keep every definition, key idea and example a learner would need. Use plain prose, at most 200 words.
+
+<section>
+{chunk}
+</section>"""
+
+SINGLE_PROMPT = """Summarize the learning resource "{title}".
+
+<resource>
+{content}
+</resource>
+
+Return only a JSON object with the keys:
+summary (a summary of the whole resource, at most 300 words) and
+key_concepts (a list of the main concepts, each a short phrase)."""
+
+REDUCE_PROMPT = """Below are summaries of consecutive sections of the learning resource "{title}".
+
+{summaries}
+
+Return only a JSON object with the keys:
+summary (a single summary of the whole resource, at most 300 words) and
+key_concepts (a list of the main concepts, each a short phrase)."""
+
+MERGE_PROMPT = """Merge these consecutive section summaries of the learning resource "{title}" into one summary
+that keeps every key idea. Use plain prose, at most 300 words.
+
+{summaries}"""
+
+HEADING_PATTERN = re.compile(r"\n(?=#{1,6} )")
+PARAGRAPH_PATTERN = re.compile(r"\n\s*\n")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+
+def _split_oversized(text: str, max_chars: int) -> List[str]:
+    pieces = []
+    current = ""
+    for sentence in SENTENCE_PATTERN.split(text):
+        while len(sentence) > max_chars:
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_content(content: str, max_chars: int=12_000) -> List[str]:
+    """
+    Split content into chunks of at most max_chars on structural boundaries.
+
+    Markdown headings start a new chunk, paragraphs are packed together up
+    to the limit, and only paragraphs longer than the limit are split on
+    sentence boundaries. Unchanged sections therefore produce identical
+    chunks between edits.
+    """
+    chunks = []
+    for section in HEADING_PATTERN.split(content):
+        current = ""
+        for paragraph in PARAGRAPH_PATTERN.split(section):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            parts = [paragraph] if len(paragraph) <= max_chars else _split_oversized(paragraph, max_chars)
+            for part in parts:
+                if current and len(current) + len(part) + 2 > max_chars:
+                    chunks.append(current)
+                    current = part
+                else:
+                    current = f"{current}\n\n{part}" if current else part
+        if current:
+            chunks.append(current)
+    return chunks
+
+
+def _summary_of(text: str) -> Optional[Dict[str, Any]]:
+    """summary and key_concepts from a JSON completion, or None when it has no usable summary"""
+    try:
+        result = parse_json_response(text)
+    except ValueError:
+        return None
+    if not isinstance(result, dict) or not isinstance(result.get("summary"), str) or not result["summary"].strip():
+        return None
+    return {
+        "summary": result["summary"],
+        "key_concepts": list(result.get("key_concepts") or []),
+    }
+
+
+def chunk_cache_key(chunk: str, model: str) -> str:
+    """Cache key of a chunk summary; another model or prompt version never reuses it"""
+    payload = f"{CHUNK_PROMPT_VERSION}\n{model}\n{chunk}"
+    return "chunk:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MapReduceSummarizer:
+    """
+    Chunked summarization for resources too large for a single call.
+
+    Chunks are summarized in parallel (map), then the chunk summaries are
+    combined into the final summary and key concepts (reduce). Chunk
+    summaries are cached by chunk content and model, so editing one
+    section only re-summarizes the chunks that changed. Content that fits
+    in one chunk is summarized with a single call.
+
+    Args:
+        claude: ClaudeService used for every call
+        chunk_cache: Cache for chunk summaries, defaults to the service cache
+        max_chunk_chars: Upper bound on chunk size
+        concurrency: Maximum chunk calls in flight
+    """
+
+    def __init__(
+        self,
+        claude: ClaudeService,
+        chunk_cache: Optional[ResponseCache]=None,
+        max_chunk_chars: int=12_000,
+        concurrency: Optional[int]=None,
+    ):
+        self.claude = claude
+        self.chunk_cache = chunk_cache or claude.cache or LRUResponseCache()
+        self.max_chunk_chars = max_chunk_chars
+        self.concurrency = concurrency
+
+    def summarize(self, content: str, title: str="") -> Dict[str, Any]:
+        """Synchronous asummarize, for scripts and jobs; use asummarize inside an event loop"""
+        return run_sync(self.asummarize(content, title))
+
+    async def asummarize(self, content: str, title: str="") -> Dict[str, Any]:
+        """
+        Summarize content of any length.
+
+        Returns:
+            dict with summary and key_concepts
+        """
+        chunks = split_content(content, self.max_chunk_chars)
+        if len(chunks) <= 1:
+            return await self._complete(SINGLE_PROMPT.format(title=title, content=content), "summarize_single")
+        summaries = await self._map(chunks, title)
+        return await self._reduce(summaries, title)
+
+    def summarize_resource(self, resource) -> Dict[str, Any]:
+        """Synchronous asummarize_resource, for scripts and jobs; use asummarize_resource inside an event loop"""
+        return run_sync(self.asummarize_resource(resource))
+
+    async def asummarize_resource(self, resource) -> Dict[str, Any]:
+        """
+        Summarize a LearningResource's content and store summary and key_concepts on it.
+        Blob-stored bodies are read through the blob store.
+        """
+        result = await self.asummarize(load_resource_text(resource), resource.title)
+        resource.update_learning_resource(
+            summary=result["summary"],
+            key_concepts=result["key_concepts"],
+        )
+        return result
+
+    async def _map(self, chunks: List[str], title: str) -> List[str]:
+        keys = [chunk_cache_key(chunk, self.claude.model) for chunk in chunks]
+        summaries: List[Optional[str]] = [self.chunk_cache.get(key) for key in keys]
+        missing = [index for index, summary in enumerate(summaries) if summary is None]
+        if not missing:
+            return summaries
+
+        prompts = [
+            CHUNK_PROMPT.format(title=title, index=index + 1, total=len(chunks), chunk=chunks[index])
+            for index in missing
+        ]
+        results = await self.claude.generate_many(
+            prompts,
+            concurrency=self.concurrency,
+            label="summarize_chunk",
+        )
+
+        errors = []
+        for index, result in zip(missing, results):
+            if result.ok:
+                summaries[index] = result.text
+                self.chunk_cache.set(keys[index], result.text)
+            else:
+                errors.append(f"chunk {index + 1}: {result.error}")
+        if errors:
+            raise ClaudeServiceError(f"Failed to summarize {len(errors)} chunk(s): {'; '.join(errors)}")
+        return summaries
+
+    async def _reduce(self, summaries: List[str], title: str) -> Dict[str, Any]:
+        # Merge groups of summaries until they fit in a single reduce call
+        while sum(len(summary) for summary in summaries) > self.max_chunk_chars and len(summaries) > 1:
+            groups = self._group(summaries)
+            if len(groups) == len(summaries):
+                break
+            results = await self.claude.generate_many(
+                [MERGE_PROMPT.format(title=title, summaries=self._join(group)) for group in groups],
+                concurrency=self.concurrency,
+                label="summarize_merge",
+            )
+            for result in results:
+                if not result.ok:
+                    raise ClaudeServiceError(f"Failed to merge chunk summaries: {result.error}")
+            summaries = [result.text for result in results]
+
+        return await self._complete(REDUCE_PROMPT.format(title=title, summaries=self._join(summaries)), "summarize_reduce")
+
+    async def _complete(self, prompt: str, label: str) -> Dict[str, Any]:
+        text = await self.claude.agenerate(prompt, label=label, cache_if=lambda text: _summary_of(text) is not None)
+        summary = _summary_of(text)
+        if summary is None:
+            raise ClaudeServiceError(f"Summary response has no summary: {text[:200]}")
+        return summary
+
+    def _group(self, summaries: List[str]) -> List[List[str]]:
+        groups = [[]]
+        size = 0
+        for summary in summaries:
+            if groups[-1] and size + len(summary) > self.max_chunk_chars:
+                groups.append([])
+                size = 0
+            groups[-1].append(summary)
+            size += len(summary)
+        return groups
+
+    @staticmethod
+    def _join(summaries: List[str]) -> str:
+        return "\n\n".join(
+            f"<section index=\"{index + 1}\">\n{summary}\n</section>"
+            for index, summary in enumerate(summaries)
+        )